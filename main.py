@@ -1,8 +1,31 @@
 #!/usr/bin/env python3
 
+import argparse
+import os
 import sys
+import time
+from contextlib import nullcontext
 from pathlib import Path
-from wiki_epub_compiler import process_wikipedia_articles
+from urllib.parse import urlsplit, urlunsplit
+from wiki_epub_compiler import (
+    process_wikipedia_articles, DEFAULT_FETCH_WORKERS, PARSER_BACKENDS, DEFAULT_PARSER_BACKEND,
+    FETCH_BACKENDS, DEFAULT_FETCH_BACKEND, REQUEST_HEADERS, DEFAULT_CLEAN_WORKERS,
+    REQUESTS_PER_SECOND_PER_HOST, REQUEST_BURST, IN_FLIGHT_PER_WORKER, volume_filename, canonicalize_urls, check_parser_backend
+)
+from wiki_http import HttpClient, HostRateLimiter, DEFAULT_MAX_RETRIES
+from wiki_cache import HttpCache, DEFAULT_CACHE_DIR, DEFAULT_CACHE_TTL_SECONDS, DEFAULT_CACHE_MAX_BYTES
+from wiki_chapter_store import ChapterStore, DEFAULT_BUILD_DIR
+from wiki_journal import CheckpointJournal
+from wiki_metrics import PipelineMetrics, RunProfiler
+from wiki_crawler import (
+    ArticleCrawler, is_category, is_list, DEFAULT_CRAWL_DEPTH, DEFAULT_CRAWL_BREADTH, DEFAULT_CRAWL_MAX_ARTICLES
+)
+from wiki_images import (
+    ImagePipeline, DEFAULT_ASSET_DIR, DEFAULT_IMAGE_MAX_WIDTH, DEFAULT_IMAGE_QUALITY, IMAGE_FORMATS,
+    DEFAULT_IMAGE_FORMAT, check_image_support
+)
+from wiki_epub_zip import CompressionPolicy, parse_compression_levels, DEFAULT_COMPRESSION_WORKERS
+import wiki_api
 
 def load_wikipedia_urls(filename='wiki_articles.txt'):
     """Reads Wikipedia URLs from a text file, filtering out invalid entries and comments."""
@@ -26,8 +49,187 @@ def load_wikipedia_urls(filename='wiki_articles.txt'):
         print(f"[!] Error reading {filename}: {e}")
         return []
 
+def rebase_url(url, base_url):
+    """Points an article URL at another MediaWiki host, keeping its path and fragment."""
+    base = urlsplit(base_url)
+    parts = urlsplit(url)
+    return urlunsplit((base.scheme, base.netloc, parts.path, parts.query, parts.fragment))
+
+def compression_policy(args):
+    """
+    Builds the EPUB compression settings from the --compression options.
+    
+    Raises:
+        ValueError: If a --compression setting is malformed
+    """
+    return CompressionPolicy(parse_compression_levels(args.compression), workers=args.compression_workers)
+
+def check_volume_options(args):
+    """
+    Verifies that --volume-max-mb and --volume-max-chapters, where given, are positive.
+    
+    Raises:
+        ValueError: If a volume limit is zero or negative
+    """
+    for name in ('volume_max_mb', 'volume_max_chapters'):
+        value = getattr(args, name)
+        if value is not None and value <= 0:
+            raise ValueError(f"--{name.replace('_', '-')} must be positive")
+
+def check_inputs(urls, args, cache=None):
+    """
+    Validates the options and the URL list of a run without sending a request or writing a book.
+    
+    Reports the URLs that name the same article, the category and list pages that
+    --crawl expands, and, for the html backend, which pages the cache can serve.
+    
+    Args:
+        urls (list): Article URLs in book order
+        args (argparse.Namespace): Parsed command-line options
+        cache (HttpCache): Optional HTTP cache to look the pages up in
+        
+    Returns:
+        bool: True if the run can go ahead
+    """
+    problems = []
+    try:
+        check_parser_backend(args.parser)
+        check_volume_options(args)
+        HostRateLimiter(args.requests_per_second, args.burst)
+        compression_policy(args)
+        if args.images:
+            check_image_support(args.image_format)
+    except ValueError as e:
+        problems.append(str(e))
+    
+    invalid = [url for url in urls if not wiki_api.title_from_url(url)]
+    problems += [f"not an article URL: {url}" for url in invalid]
+    canonical_urls, _ = canonicalize_urls([url for url in urls if url not in invalid])
+    print(f"[*] {len(canonical_urls)} distinct articles and sections")
+    if len(canonical_urls) < len(urls) - len(invalid):
+        print(f"   [*] {len(urls) - len(invalid) - len(canonical_urls)} URLs repeat an article listed before")
+    
+    expandable = [url for url in canonical_urls if not wiki_api.fragment_from_url(url) and
+                  (is_category(wiki_api.title_from_url(url)) or
+                   (args.crawl_lists and is_list(wiki_api.title_from_url(url))))]
+    if expandable and args.crawl:
+        print(f"   [*] {len(expandable)} category or list pages are expanded by the crawl")
+    elif expandable:
+        print(f"   [!] {len(expandable)} category pages would become chapters, use --crawl to expand them")
+    
+    if cache and args.fetch_backend == 'html':
+        counts = {'fresh': 0, 'stale': 0, 'missing': 0}
+        for url in canonical_urls:
+            entry = cache.lookup(url)
+            counts['missing' if entry is None else 'fresh' if entry.fresh else 'stale'] += 1
+        print(f"   [*] Cache: {counts['fresh']} fresh, {counts['stale']} to revalidate, {counts['missing']} to download")
+        if cache.offline and counts['missing']:
+            problems.append(f"{counts['missing']} articles are not cached, which --offline needs")
+    
+    for problem in problems:
+        print(f"[!] {problem}")
+    if not problems:
+        print("[+] Check passed, nothing was downloaded or written")
+    return not problems
+
+def parse_args(argv=None):
+    """Parses command-line options for the compiler."""
+    parser = argparse.ArgumentParser(description="Compile Wikipedia articles into an EPUB.")
+    parser.add_argument('--workers', type=int, default=DEFAULT_FETCH_WORKERS,
+                        help=f"number of articles fetched and cleaned concurrently (default: {DEFAULT_FETCH_WORKERS})")
+    parser.add_argument('--clean-workers', type=int, default=DEFAULT_CLEAN_WORKERS,
+                        help="processes that parse and clean articles in parallel, e.g. the number of cores "
+                             f"({os.cpu_count()} here); 0 cleans in the fetch threads (default: {DEFAULT_CLEAN_WORKERS})")
+    parser.add_argument('--max-in-flight', type=int,
+                        help="most articles downloaded, cleaned or waiting for an earlier article at once, "
+                             f"which bounds memory use (default: {IN_FLIGHT_PER_WORKER} per worker)")
+    parser.add_argument('--fetch-backend', choices=FETCH_BACKENDS, default=DEFAULT_FETCH_BACKEND,
+                        help="'html' scrapes rendered pages, 'api' fetches article bodies through the "
+                             f"MediaWiki Action API with batched revision lookups (default: {DEFAULT_FETCH_BACKEND})")
+    parser.add_argument('--resolve-redirects', action='store_true',
+                        help="resolve redirects with batched API queries first, so an article listed under "
+                             "several names is only downloaded once (implied by --fetch-backend api)")
+    parser.add_argument('--crawl', action='store_true',
+                        help="expand category pages into their member articles with batched API queries; "
+                             "articles are fetched while the crawl is still running")
+    parser.add_argument('--crawl-lists', action='store_true',
+                        help="with --crawl, also expand 'List of ...' articles into the articles they link to")
+    parser.add_argument('--crawl-depth', type=int, default=DEFAULT_CRAWL_DEPTH,
+                        help=f"levels of subcategories followed below a listed category (default: {DEFAULT_CRAWL_DEPTH})")
+    parser.add_argument('--crawl-breadth', type=int, default=DEFAULT_CRAWL_BREADTH,
+                        help=f"members taken from any one category or list (default: {DEFAULT_CRAWL_BREADTH})")
+    parser.add_argument('--crawl-max-articles', type=int, default=DEFAULT_CRAWL_MAX_ARTICLES,
+                        help=f"articles the crawl discovers in total (default: {DEFAULT_CRAWL_MAX_ARTICLES})")
+    parser.add_argument('--base-url',
+                        help="send all requests to this MediaWiki host instead, e.g. a local wiki_stub_server.py")
+    parser.add_argument('--parser', choices=PARSER_BACKENDS, default=DEFAULT_PARSER_BACKEND,
+                        help=f"HTML parser backend (default: {DEFAULT_PARSER_BACKEND})")
+    parser.add_argument('--body-only', action='store_true',
+                        help="only parse the article body (mw-parser-output) instead of the whole page")
+    parser.add_argument('--stream', action='store_true',
+                        help="write each chapter to the EPUB as soon as it is ready (constant memory for huge lists)")
+    parser.add_argument('--volume-max-mb', type=float,
+                        help="split the book into volumes of at most this many MB of chapters and images, "
+                             "written as wiki_compilation_vol1.epub, ... with an index of all volumes in each")
+    parser.add_argument('--volume-max-chapters', type=int,
+                        help="split the book into volumes of at most this many chapters")
+    parser.add_argument('--compression', action='append', metavar='MEDIA_TYPE=LEVEL',
+                        help="deflate level 0-9 (0 stores) of a media type in the EPUB, e.g. image/*=0 or "
+                             "application/xhtml+xml=9; repeatable (default: 9 for XHTML and CSS, images stored)")
+    parser.add_argument('--compression-workers', type=int, default=DEFAULT_COMPRESSION_WORKERS,
+                        help="threads compressing EPUB entries in parallel (default: one per core)")
+    parser.add_argument('--requests-per-second', type=float, default=REQUESTS_PER_SECOND_PER_HOST,
+                        help="requests per second sent to each host (default: one every 1.5 s); raise it only "
+                             "for your own wiki or the local stub server")
+    parser.add_argument('--burst', type=int, default=REQUEST_BURST,
+                        help=f"requests a host may receive back-to-back before the rate applies (default: {REQUEST_BURST})")
+    parser.add_argument('--http2', action='store_true',
+                        help="fetch over HTTP/2, multiplexing requests on one connection per host (needs httpx[http2])")
+    parser.add_argument('--retries', type=int, default=DEFAULT_MAX_RETRIES,
+                        help="retries of a request failing with 429/5xx or a connection error, with "
+                             f"exponential backoff honoring Retry-After (default: {DEFAULT_MAX_RETRIES})")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f"directory of the persistent HTTP cache (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="always download articles from scratch")
+    parser.add_argument('--cache-ttl', type=float, default=DEFAULT_CACHE_TTL_SECONDS / 3600,
+                        help="hours a cached article is used without revalidation (default: %(default)s)")
+    parser.add_argument('--cache-max-mb', type=int, default=DEFAULT_CACHE_MAX_BYTES // (1024 * 1024),
+                        help="size cap of the cache in MB, least recently used entries are evicted (default: %(default)s)")
+    parser.add_argument('--offline', action='store_true',
+                        help="serve articles only from the cache, without network access")
+    parser.add_argument('--incremental', action='store_true',
+                        help="reuse chapters of articles that did not change since the previous build")
+    parser.add_argument('--build-dir', default=DEFAULT_BUILD_DIR,
+                        help=f"where --incremental keeps its manifest and chapters (default: {DEFAULT_BUILD_DIR})")
+    parser.add_argument('--resume', action='store_true',
+                        help="continue an interrupted run, skipping articles it already finished")
+    parser.add_argument('--images', action='store_true',
+                        help="embed article images, downscaled and recompressed for e-readers (needs Pillow)")
+    parser.add_argument('--image-max-width', type=int, default=DEFAULT_IMAGE_MAX_WIDTH,
+                        help=f"scale wider images down to this many pixels (default: {DEFAULT_IMAGE_MAX_WIDTH})")
+    parser.add_argument('--image-quality', type=int, default=DEFAULT_IMAGE_QUALITY,
+                        help=f"JPEG/WebP quality of embedded images, 1-95 (default: {DEFAULT_IMAGE_QUALITY})")
+    parser.add_argument('--image-format', choices=IMAGE_FORMATS, default=DEFAULT_IMAGE_FORMAT,
+                        help=f"format of embedded images (default: {DEFAULT_IMAGE_FORMAT}); "
+                             "not every e-reader shows webp")
+    parser.add_argument('--color-images', action='store_true',
+                        help="keep images in color instead of converting them to grayscale")
+    parser.add_argument('--asset-dir', default=DEFAULT_ASSET_DIR,
+                        help=f"where processed images are kept between builds (default: {DEFAULT_ASSET_DIR})")
+    parser.add_argument('--check', action='store_true',
+                        help="only validate the options and the URL list, without network access or writing a book")
+    parser.add_argument('--metrics', metavar='PATH',
+                        help="write per-stage timings, bytes downloaded, DOM sizes and peak memory with "
+                             "p50/p95 summaries to PATH (JSON, or a Prometheus textfile if PATH ends in .prom)")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="run under cProfile, including the worker threads, and save the stats to PATH")
+    return parser.parse_args(argv)
+
 def main():
     """Entry point that coordinates the entire Wikipedia-to-EPUB conversion process."""
+    args = parse_args()
+    
     print("Wikipedia to EPUB Compiler")
     print("=" * 50)
     
@@ -39,13 +241,104 @@ def main():
     
     print(f"[*] Found {len(urls)} Wikipedia URLs to process")
     
+    if args.base_url:
+        urls = [rebase_url(url, args.base_url) for url in urls]
+        print(f"[*] Sending requests to {args.base_url}")
+    
+    cache = None
+    if args.offline and args.no_cache:
+        print("[!] --offline needs the cache, ignoring --no-cache")
+    if args.offline or not args.no_cache:
+        cache = HttpCache(args.cache_dir, ttl=args.cache_ttl * 3600,
+                          max_bytes=args.cache_max_mb * 1024 * 1024, offline=args.offline)
+    
+    if args.check:
+        sys.exit(0 if check_inputs(urls, args, cache) else 1)
+    
+    try:
+        check_volume_options(args)
+        # The crawler and the article downloads share one request budget per host
+        rate_limiter = HostRateLimiter(args.requests_per_second, args.burst)
+        compression = compression_policy(args)
+    except ValueError as e:
+        print(f"[!] {e}")
+        sys.exit(1)
+    
+    # One pooled client for all workers, so connections to each host are reused
+    try:
+        client = HttpClient(REQUEST_HEADERS, pool_size=max(1, args.workers), http2=args.http2,
+                            max_retries=args.retries)
+    except ValueError as e:
+        print(f"[!] {e}")
+        sys.exit(1)
+    
+    images = None
+    if args.images:
+        try:
+            # Images come from upload.wikimedia.org, which gets its own budget at the same rate
+            images = ImagePipeline(client, args.asset_dir, max_width=args.image_max_width,
+                                   quality=args.image_quality, grayscale=not args.color_images,
+                                   image_format=args.image_format, rate_limiter=rate_limiter)
+        except ValueError as e:
+            print(f"[!] {e}")
+            client.close()
+            sys.exit(1)
+    
+    # Chapters with embedded images differ from plain ones, so each setting has its own entries
+    chapter_store = None
+    if args.incremental:
+        chapter_store = ChapterStore(args.build_dir, variant=images.fingerprint if images else None)
+    
+    if args.crawl:
+        crawler = ArticleCrawler(client, rate_limiter, cache, max_depth=args.crawl_depth,
+                                 max_breadth=args.crawl_breadth, max_articles=args.crawl_max_articles,
+                                 expand_lists=args.crawl_lists)
+        urls = crawler.crawl(urls)
+    
     # Download articles and compile them into an EPUB
     output_file = 'wiki_compilation.epub'
-    success = process_wikipedia_articles(urls, output_file)
+    # Every finished article is checkpointed, so an interrupted run can continue with --resume
+    journal = CheckpointJournal.for_output(output_file, resume=args.resume)
+    started = int(time.time())  # Whole seconds, as some filesystems store mtimes
+    volume_max_bytes = int(args.volume_max_mb * 1024 * 1024) if args.volume_max_mb else None
+    metrics = PipelineMetrics() if args.metrics else None
+    profiler = RunProfiler() if args.profile else None
+    try:
+        with profiler or nullcontext():
+            success = process_wikipedia_articles(urls, output_file, max_workers=args.workers,
+                                                 rate_limiter=rate_limiter, cache=cache,
+                                                 chapter_store=chapter_store, parser=args.parser,
+                                                 body_only=args.body_only, stream=args.stream,
+                                                 fetch_backend=args.fetch_backend, journal=journal,
+                                                 client=client, metrics=metrics, profiler=profiler,
+                                                 clean_workers=args.clean_workers,
+                                                 resolve_redirects=args.resolve_redirects, images=images,
+                                                 volume_max_bytes=volume_max_bytes,
+                                                 volume_max_chapters=args.volume_max_chapters,
+                                                 max_in_flight=args.max_in_flight,
+                                                 compression=compression)
+    finally:
+        journal.close()
+        if images:
+            images.close()
+        client.close()
+    
+    if metrics:
+        metrics.print_summary()
+        metrics.write_report(args.metrics)
+        print(f"[*] Metrics written to {args.metrics}")
+    if profiler:
+        profiler.dump(args.profile)
     
     if success:
-        file_size = Path(output_file).stat().st_size if Path(output_file).exists() else 0
-        print(f"\n🎉 Success! Created {output_file} ({file_size:,} bytes)")
+        journal.discard()
+        # A split book is written as volumes; only list the files this run wrote
+        outputs = [Path(output_file)]
+        while Path(volume_filename(output_file, len(outputs))).exists():
+            outputs.append(Path(volume_filename(output_file, len(outputs))))
+        for path in outputs:
+            if path.exists() and path.stat().st_mtime >= started:
+                print(f"\n🎉 Success! Created {path} ({path.stat().st_size:,} bytes)")
         print(f"📚 Your EPUB is ready for your e-reader!")
     else:
         print(f"\n❌ Failed to create EPUB file")
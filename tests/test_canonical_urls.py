@@ -0,0 +1,25 @@
+from wiki_epub_compiler import canonicalize_urls
+
+WIKI = 'https://en.wikipedia.org/wiki/'
+
+def test_spelling_variants_collapse_without_a_lookup():
+    urls = [WIKI + 'Goodhart%27s_law', WIKI + "Goodhart's law", 'https://EN.wikipedia.org/wiki/Goodhart%27s_law',
+            WIKI + 'Data_dredging#History', WIKI + 'Data_dredging#History', WIKI + 'P-hacking']
+    canonical, revisions = canonicalize_urls(urls)
+    assert canonical == [WIKI + "Goodhart's_law", WIKI + 'Data_dredging#History', WIKI + 'P-hacking']
+    assert revisions is None
+
+def test_redirects_and_sections_collapse_into_the_article():
+    urls = [WIKI + 'Data_dredging#History', WIKI + 'P-hacking', WIKI + 'Zero-knowledge_proof#Definition',
+            WIKI + 'Missing']
+    # P-hacking redirects to Data dredging, whose whole article replaces the section before it
+    page_revisions = {WIKI + 'P-hacking': ('Data dredging', 5), WIKI + 'Missing': None}
+    seen = set()
+    canonical, revisions = canonicalize_urls(urls, page_revisions, seen)
+    assert canonical == [WIKI + 'Data_dredging', WIKI + 'Zero-knowledge_proof#Definition', WIKI + 'Missing']
+    assert revisions == {WIKI + 'Data_dredging': ('Data dredging', 5), WIKI + 'Missing': None}
+
+    # Later batches leave out what earlier ones already hold, sections of those articles included
+    canonical, _ = canonicalize_urls([WIKI + 'P-hacking', WIKI + 'Data_dredging#Examples', WIKI + 'Quine'],
+                                     page_revisions, seen)
+    assert canonical == [WIKI + 'Quine']
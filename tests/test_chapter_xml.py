@@ -0,0 +1,30 @@
+import importlib.util
+import xml.etree.ElementTree as ElementTree
+
+import pytest
+
+from wiki_epub_compiler import PARSER_BACKENDS, clean_article_content, parse_article_html, render_epub_chapter
+
+PAGE = '''<!DOCTYPE html><html><head><meta charset="UTF-8"><title>Markup</title></head><body>
+<h1 class="firstHeading">Markup &amp; more</h1>
+<div class="mw-parser-output">
+<style data-mw-deduplicate="TemplateStyles:r1">.a>b{content:"&"}.c<d{}</style>
+<link rel="mw-deduplicated-inline-style" href="mw-data:TemplateStyles:r1">
+<script>if (a < b && c) { document.write("<p>"); }</script>
+<p>Entities&nbsp;&copy; &lt;tag&gt; "quotes" &amp; ampersands<br>line two</p>
+<table><tr><td nowrap>cell</td><td><input type="checkbox" checked></td></tr></table>
+<p>Unclosed <i>italic <b>bold</p>
+<ul><li>One<li>Two</ul>
+</div></body></html>'''.encode('utf-8')
+
+@pytest.mark.parametrize('parser', PARSER_BACKENDS)
+def test_rendered_chapter_is_well_formed_xml(parser):
+    if parser != 'html.parser' and importlib.util.find_spec(parser) is None:
+        pytest.skip(f"{parser} is not installed")
+    title, soup = parse_article_html(PAGE, parser)
+    content = clean_article_content(soup)
+    _, xhtml = render_epub_chapter(title, content, 1)
+    root = ElementTree.fromstring(xhtml)
+    assert root.tag == '{http://www.w3.org/1999/xhtml}html'
+    assert '<style' not in content and '<script' not in content
+    assert 'Entities' in content
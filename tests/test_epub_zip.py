@@ -0,0 +1,54 @@
+import zipfile
+
+from wiki_epub_zip import PARALLEL_MIN_BYTES, CompressionPolicy, ZipArchiveWriter
+
+def test_round_trip_through_zipfile(tmp_path):
+    path = tmp_path / 'book.epub'
+    entries = [
+        ('mimetype', b'application/epub+zip'),
+        ('EPUB/chapter_1.xhtml', b'<p>Deflated in a compression thread.</p>' * (PARALLEL_MIN_BYTES // 20)),
+        ('EPUB/style.css', b'body { margin: 0 }'),
+        ('EPUB/images/a.jpg', bytes(range(256)) * 64),
+    ]
+    with ZipArchiveWriter(str(path), CompressionPolicy(workers=2)) as archive:
+        archive.writestr(*entries[0], compress_type=zipfile.ZIP_STORED)
+        for name, data in entries[1:]:
+            archive.writestr(name, data)
+
+    with zipfile.ZipFile(path) as archive:
+        assert archive.testzip() is None  # Every CRC matches its data
+        infos = archive.infolist()
+        assert [info.filename for info in infos] == [name for name, _ in entries]
+        assert [archive.read(name) for name, _ in entries] == [data for _, data in entries]
+        assert infos[0].compress_type == zipfile.ZIP_STORED and infos[0].header_offset == 0
+        assert infos[1].compress_type == zipfile.ZIP_DEFLATED
+        # Images default to level 0 and are stored as they are
+        assert infos[3].compress_type == zipfile.ZIP_STORED
+    # EPUB readers look for the uncompressed mimetype right after the first local header
+    assert path.read_bytes()[30:58] == b'mimetypeapplication/epub+zip'
+
+def test_more_than_65535_entries_use_zip64(tmp_path):
+    path = tmp_path / 'many.zip'
+    count = 0xFFFF + 10
+    with ZipArchiveWriter(str(path), CompressionPolicy(workers=1)) as archive:
+        for number in range(count):
+            archive.writestr(f"{number}.txt", b'', compress_type=zipfile.ZIP_STORED)
+
+    assert b'PK\x06\x06' in path.read_bytes()[-200:]  # ZIP64 end of central directory record
+    with zipfile.ZipFile(path) as archive:
+        names = archive.namelist()
+        assert len(names) == count
+        assert names[-1] == f"{count - 1}.txt"
+
+def test_non_ascii_names_are_flagged_utf8(tmp_path):
+    path = tmp_path / 'names.zip'
+    with ZipArchiveWriter(str(path)) as archive:
+        archive.writestr('EPUB/Zoë – α.xhtml', 'Zoë')
+        archive.writestr('EPUB/plain.xhtml', 'plain')
+
+    with zipfile.ZipFile(path) as archive:
+        unicode_name, plain = archive.infolist()
+        assert unicode_name.filename == 'EPUB/Zoë – α.xhtml'
+        assert unicode_name.flag_bits & 0x800
+        assert not plain.flag_bits & 0x800
+        assert archive.read(unicode_name).decode('utf-8') == 'Zoë'
@@ -0,0 +1,91 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import wiki_http
+from wiki_http import HostRateLimiter, HttpClient
+
+class FakeClock:
+    """Stands in for time.monotonic and time.sleep, so waits are measured instead of slept."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(wiki_http.time, 'monotonic', clock.monotonic)
+    monkeypatch.setattr(wiki_http.time, 'sleep', clock.sleep)
+    return clock
+
+def test_rate_limiter_allows_a_burst_then_the_rate_per_host(clock):
+    limiter = HostRateLimiter(rate=2, burst=2)
+    waits = [limiter.acquire('https://en.wikipedia.org/wiki/A') for _ in range(4)]
+    assert waits == [0, 0, 0.5, 0.5]
+
+    # Every host has its own bucket
+    assert limiter.acquire('https://en.wikibooks.org/wiki/B') == 0
+
+    # An idle host refills up to the burst, never beyond it
+    clock.now += 60
+    waits = [limiter.acquire('https://en.wikipedia.org/wiki/C') for _ in range(3)]
+    assert waits == [0, 0, 0.5]
+
+@pytest.fixture
+def flaky_server():
+    """Serves the queued (status, headers) replies in order, then 200 OK."""
+    replies = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            status, headers = replies.pop(0) if replies else (200, {})
+            body = b'ok' if status == 200 else b'busy'
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/", replies
+    server.shutdown()
+    server.server_close()
+
+def test_client_retries_and_honors_retry_after(flaky_server, monkeypatch):
+    url, replies = flaky_server
+    sleeps = []
+    monkeypatch.setattr(wiki_http.time, 'sleep', sleeps.append)
+    replies += [(503, {'Retry-After': '7'}), (429, {}), (502, {'Retry-After': 'soon'})]
+    with HttpClient(max_retries=3, backoff=0.25) as client:
+        response = client.get(url)
+    assert response.status_code == 200 and response.content == b'ok'
+    # Retry-After wins over the backoff; without a usable one the jittered backoff applies
+    assert len(sleeps) == 3 and sleeps[0] == 7
+    assert 0 <= sleeps[1] <= 0.5 and 0 <= sleeps[2] <= 1.0
+
+def test_client_gives_up_after_max_retries_or_a_long_retry_after(flaky_server, monkeypatch):
+    url, replies = flaky_server
+    sleeps = []
+    monkeypatch.setattr(wiki_http.time, 'sleep', sleeps.append)
+    with HttpClient(max_retries=1) as client:
+        replies += [(503, {}), (503, {})]
+        assert client.get(url).status_code == 503
+        assert len(sleeps) == 1
+
+        replies += [(429, {'Retry-After': str(int(wiki_http.MAX_RETRY_AFTER_SECONDS) + 1)})]
+        assert client.get(url).status_code == 429
+        assert len(sleeps) == 1
@@ -0,0 +1,34 @@
+from wiki_journal import CheckpointJournal
+
+def test_resume_skips_a_line_cut_short_by_a_crash(tmp_path):
+    path = tmp_path / 'book.epub.journal'
+    journal = CheckpointJournal(path)
+    journal.record('https://en.wikipedia.org/wiki/A', 'done', title='A')
+    journal.record('https://en.wikipedia.org/wiki/B', 'done', title='B')
+    journal.close()
+    # The crash hit while the last line was being written
+    data = path.read_bytes()
+    path.write_bytes(data[:-10])
+
+    journal = CheckpointJournal(path, resume=True)
+    assert journal.completed('https://en.wikipedia.org/wiki/A')['title'] == 'A'
+    assert journal.completed('https://en.wikipedia.org/wiki/B') is None
+    journal.record('https://en.wikipedia.org/wiki/B', 'done', title='B')
+    journal.close()
+
+    # What the resumed run recorded survives the next resume too
+    journal = CheckpointJournal(path, resume=True)
+    assert journal.completed_count == 2
+    assert journal.completed('https://en.wikipedia.org/wiki/B')['title'] == 'B'
+    journal.close()
+
+def test_starting_over_discards_the_journal_and_its_outputs(tmp_path):
+    journal = CheckpointJournal(tmp_path / 'book.epub.journal')
+    output = journal.output_path('https://en.wikipedia.org/wiki/A', '.html')
+    output.write_text('<p>A</p>')
+    journal.record('https://en.wikipedia.org/wiki/A', 'done', output=str(output))
+    journal.close()
+
+    journal = CheckpointJournal(tmp_path / 'book.epub.journal')
+    assert journal.completed_count == 0 and not output.exists()
+    journal.close()
@@ -0,0 +1,42 @@
+import importlib.util
+
+import pytest
+
+from wiki_epub_compiler import PARSER_BACKENDS, clean_article_content, parse_article_html
+
+PAGE = '''<!DOCTYPE html><html><head><meta charset="UTF-8"><title>Zoë – Wikipedia</title>
+<script>RLCONF={"wgRevisionId":1003};</script></head>
+<body><div id="mw-navigation"><div class="vector-menu"><a href="/wiki/Main_Page">Main page</a></div></div>
+<div id="content"><h1 id="firstHeading" class="firstHeading"><span class="mw-page-title-main">Zoë</span></h1>
+<div id="bodyContent"><div id="mw-content-text" class="mw-body-content">
+<div class="mw-content-ltr mw-parser-output" lang="en" dir="ltr">
+<div class="hatnote">For other uses, see Zoe.</div>
+<table class="infobox"><tr><th>Born</th><td>1900</td></tr></table>
+<p>Zoë is a <b>name</b> with <a href="/wiki/Greek">Greek</a> roots<sup class="reference"><a href="#cite-1">[1]</a></sup>.</p>
+<!-- <div> inside a comment is not markup -->
+<div class="mw-heading mw-heading2"><h2 id="Usage">Usage</h2><span class="mw-editsection">[edit]</span></div>
+<table class="wikitable"><tr><td>α</td><td>β</td></tr><tr><td colspan="2">γ &amp; δ</td></tr></table>
+<div class="thumb"><div class="thumbinner"><p>Nested <i>divs</i> keep their text.</p></div></div>
+<ul><li>Item</li><li><cite class="citation">Ref</cite></li></ul>
+<p>See <sup>[note 1]</sup> also.</p><p> </p>
+<div class="navbox">nav</div>
+</div></div></div></div>
+<div id="footer"><p>Footer text</p></div></body></html>'''.encode('utf-8')
+
+def _installed(parser):
+    module = {'html.parser': 'html', 'lxml': 'lxml', 'selectolax': 'selectolax'}[parser]
+    return importlib.util.find_spec(module) is not None
+
+def _cleaned(parser, body_only):
+    title, soup = parse_article_html(PAGE, parser, body_only)
+    return title, clean_article_content(soup)
+
+@pytest.mark.parametrize('body_only', [False, True])
+@pytest.mark.parametrize('parser', [parser for parser in PARSER_BACKENDS if parser != 'html.parser'])
+def test_backends_clean_to_identical_output(parser, body_only):
+    if not _installed(parser):
+        pytest.skip(f"{parser} is not installed")
+    expected = _cleaned('html.parser', False)
+    assert _cleaned(parser, body_only) == expected
+    assert expected[0] == 'Zoë'
+    assert '<tbody>' not in expected[1] and 'Footer text' not in expected[1]
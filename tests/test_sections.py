@@ -0,0 +1,36 @@
+from wiki_epub_compiler import clean_article_content, clean_article_html, extract_section, parse_article_html
+
+PAGE = b'''<html><body><h1 class="firstHeading">Renaming</h1><div class="mw-parser-output">
+<p>Lead paragraph.</p>
+<div class="mw-heading mw-heading2"><h2 id="History">History</h2></div><p>History text.</p>
+<div class="mw-heading mw-heading2"><h2 id="Naming_disputes">Naming disputes</h2></div><p>Dispute text.</p>
+<div class="mw-heading mw-heading3"><h3 id="Cities">Cities</h3></div><p>City text.</p>
+<h2><span class="mw-headline" id="Old_markup">Old markup</span></h2><p>Old text.</p>
+</div></body></html>'''
+
+def _section(anchor):
+    _, soup = parse_article_html(PAGE, 'html.parser')
+    title = extract_section(soup, anchor)
+    return title, clean_article_content(soup)
+
+def test_section_keeps_its_subsections_up_to_the_next_heading_of_its_level():
+    title, content = _section('Naming_disputes')
+    assert title == 'Naming disputes'
+    assert 'Dispute text.' in content and 'City text.' in content
+    assert 'Lead paragraph.' not in content and 'History text.' not in content and 'Old text.' not in content
+
+def test_section_anchor_of_older_headline_markup():
+    title, content = _section('Old_markup')
+    assert title == 'Old markup'
+    assert 'Old text.' in content and 'City text.' not in content
+
+def test_unknown_section_leaves_the_article_whole():
+    title, content = _section('No_such_section')
+    assert title is None
+    assert 'Lead paragraph.' in content and 'Old text.' in content
+
+def test_chapter_of_an_unknown_section_is_left_out():
+    title, content, _ = clean_article_html(PAGE, 'html.parser', section='Cities')
+    assert title == 'Renaming: Cities' and 'City text.' in content
+    # The whole article instead would repeat what its own chapter or another section holds
+    assert clean_article_html(PAGE, 'html.parser', section='No_such_section')[1] is None
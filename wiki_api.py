@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+
+import json
+from urllib.parse import urlparse, urlencode, quote, unquote
+from wiki_cache import normalize_url
+
+# MediaWiki accepts at most 50 titles per action=query request for regular clients
+API_BATCH_SIZE = 50
+API_PATH = '/w/api.php'
+ARTICLE_NAMESPACE = 0
+CATEGORY_NAMESPACE = 14
+
+def api_endpoint(url):
+    """
+    Returns the MediaWiki Action API endpoint of the wiki an article URL belongs to.
+
+    Args:
+        url (str): Article URL like https://en.wikipedia.org/wiki/Title
+
+    Returns:
+        str: Endpoint URL like https://en.wikipedia.org/w/api.php
+    """
+    parsed = urlparse(url.strip())
+    return f"{parsed.scheme}://{parsed.netloc}{API_PATH}"
+
+def title_from_url(url):
+    """
+    Extracts the page title from an article URL, decoding percent-escapes and dropping any #fragment.
+
+    Args:
+        url (str): Article URL like https://en.wikipedia.org/wiki/Goodhart%27s_law
+
+    Returns:
+        str: Page title like "Goodhart's_law", or None if the URL is not a /wiki/ link
+    """
+    path = urlparse(url.strip()).path
+    if '/wiki/' not in path:
+        return None
+    return unquote(path.split('/wiki/', 1)[1]) or None
+
+def fragment_from_url(url):
+    """
+    Returns the section anchor a URL points to, like 'Naming_disputes' for .../Geographical_renaming#Naming_disputes.
+
+    Returns:
+        str: Decoded anchor with underscores instead of spaces, or None without a #fragment
+    """
+    fragment = urlparse(url.strip()).fragment
+    return unquote(fragment).replace(' ', '_') or None
+
+def canonical_article_url(url, title=None):
+    """
+    Returns one spelling for all URLs of the same article: lowercase host, no #fragment,
+    underscores instead of spaces and uniform percent-encoding, so
+    .../wiki/Goodhart%27s_law and .../wiki/Goodhart's_law#History come out the same.
+
+    Args:
+        url (str): Article URL
+        title (str): Title to use instead of the one in the URL, e.g. where a redirect leads
+
+    Returns:
+        str: Canonical URL; URLs that are not /wiki/ links are only normalized
+    """
+    title = title or title_from_url(url)
+    if not title:
+        return normalize_url(url)
+    parsed = urlparse(url.strip())
+    return normalize_url(f"{parsed.scheme}://{parsed.netloc}/wiki/{quote(title.replace(' ', '_'))}")
+
+def query_url(endpoint, titles):
+    """
+    Builds an action=query request returning the current revision of up to API_BATCH_SIZE pages.
+
+    Args:
+        endpoint (str): Action API endpoint
+        titles (list): Page titles to look up
+
+    Returns:
+        str: Request URL
+    """
+    if len(titles) > API_BATCH_SIZE:
+        raise ValueError(f"at most {API_BATCH_SIZE} titles can be queried at once")
+    params = {
+        'action': 'query',
+        'format': 'json',
+        'formatversion': '2',
+        'prop': 'revisions',
+        'rvprop': 'ids',
+        'redirects': '1',
+        'titles': '|'.join(titles),
+    }
+    return f"{endpoint}?{urlencode(params)}"
+
+def read_query_response(body, titles):
+    """
+    Maps every requested title to the page it resolves to, following normalization and redirects.
+
+    Args:
+        body (bytes): JSON response of a query_url() request
+        titles (list): The titles that were requested
+
+    Returns:
+        dict: requested title -> (canonical_title, revision_id), or None for missing pages
+
+    Raises:
+        ValueError: If the response is not a valid query result
+    """
+    data = json.loads(body)
+    if 'error' in data:
+        raise ValueError(f"API error: {data['error'].get('info', data['error'])}")
+    query = data.get('query', {})
+
+    # Follow title normalization ("Goodhart's_law" -> "Goodhart's law") and then redirects
+    renames = {entry['from']: entry['to'] for entry in query.get('normalized', [])}
+    redirects = {entry['from']: entry['to'] for entry in query.get('redirects', [])}
+    pages = {}
+    for page in query.get('pages', []):
+        if page.get('missing') or page.get('invalid'):
+            continue
+        revisions = page.get('revisions') or [{}]
+        pages[page['title']] = (page['title'], revisions[0].get('revid'))
+
+    resolved = {}
+    for title in titles:
+        name = renames.get(title, title)
+        name = redirects.get(name, name)
+        resolved[title] = pages.get(name)
+    return resolved
+
+def category_members_url(endpoint, title, continuation=None):
+    """
+    Builds a list=categorymembers request returning the articles and subcategories of a category.
+
+    Args:
+        endpoint (str): Action API endpoint
+        title (str): Category title, like "Category:Programming_language_comparisons"
+        continuation (dict): The 'continue' object of the previous response, for the next page
+
+    Returns:
+        str: Request URL
+    """
+    params = {
+        'action': 'query',
+        'format': 'json',
+        'formatversion': '2',
+        'list': 'categorymembers',
+        'cmtitle': title,
+        'cmnamespace': f"{ARTICLE_NAMESPACE}|{CATEGORY_NAMESPACE}",
+        'cmlimit': 'max',
+    }
+    params.update(continuation or {})
+    return f"{endpoint}?{urlencode(params)}"
+
+def read_category_members_response(body):
+    """
+    Extracts one page of category members.
+
+    Args:
+        body (bytes): JSON response of a category_members_url() request
+
+    Returns:
+        tuple: (members, continuation), where members is a list of (title, is_category)
+            and continuation is the 'continue' object, or None on the last page
+
+    Raises:
+        ValueError: If the response is an API error
+    """
+    data = json.loads(body)
+    if 'error' in data:
+        raise ValueError(f"API error: {data['error'].get('info', data['error'])}")
+    members = [(member['title'], member.get('ns') == CATEGORY_NAMESPACE)
+               for member in data.get('query', {}).get('categorymembers', [])]
+    return members, data.get('continue')
+
+def links_url(endpoint, titles, continuation=None):
+    """
+    Builds a prop=links request returning the article links of up to API_BATCH_SIZE pages.
+
+    Args:
+        endpoint (str): Action API endpoint
+        titles (list): Titles of the pages whose links are wanted, e.g. list articles
+        continuation (dict): The 'continue' object of the previous response, for the next page
+
+    Returns:
+        str: Request URL
+    """
+    if len(titles) > API_BATCH_SIZE:
+        raise ValueError(f"at most {API_BATCH_SIZE} titles can be queried at once")
+    params = {
+        'action': 'query',
+        'format': 'json',
+        'formatversion': '2',
+        'prop': 'links',
+        'plnamespace': str(ARTICLE_NAMESPACE),
+        'pllimit': 'max',
+        'redirects': '1',
+        'titles': '|'.join(titles),
+    }
+    params.update(continuation or {})
+    return f"{endpoint}?{urlencode(params)}"
+
+def read_links_response(body):
+    """
+    Extracts one page of links from a links_url() response.
+
+    Args:
+        body (bytes): JSON response of a links_url() request
+
+    Returns:
+        tuple: (links, continuation), where links maps each page title to the article
+            titles it links to in this response, and continuation is the 'continue'
+            object, or None on the last page
+
+    Raises:
+        ValueError: If the response is an API error
+    """
+    data = json.loads(body)
+    if 'error' in data:
+        raise ValueError(f"API error: {data['error'].get('info', data['error'])}")
+    links = {page['title']: [link['title'] for link in page.get('links', [])]
+             for page in data.get('query', {}).get('pages', []) if not page.get('missing')}
+    return links, data.get('continue')
+
+def parse_url(endpoint, title, section=None, revision=None):
+    """
+    Builds an action=parse request returning only the rendered article body.
+
+    With a known revision the request names it through oldid instead of the title,
+    so a cached response always belongs to that revision.
+
+    Args:
+        endpoint (str): Action API endpoint
+        title (str): Page title
+        section (str): Only render this section (an index from find_section_index())
+        revision (int): Render this revision of the page, as reported by read_query_response()
+
+    Returns:
+        str: Request URL
+    """
+    params = {
+        'action': 'parse',
+        'format': 'json',
+        'formatversion': '2',
+        'prop': 'text|revid|displaytitle',
+        'disableeditsection': '1',
+        'disablelimitreport': '1',
+    }
+    if revision:
+        params['oldid'] = revision
+    else:
+        params.update({'redirects': '1', 'page': title})
+    if section is not None:
+        params['section'] = section
+    return f"{endpoint}?{urlencode(params)}"
+
+def sections_url(endpoint, title):
+    """Builds an action=parse request returning only the section list of a page."""
+    params = {
+        'action': 'parse',
+        'format': 'json',
+        'formatversion': '2',
+        'prop': 'sections',
+        'redirects': '1',
+        'page': title,
+    }
+    return f"{endpoint}?{urlencode(params)}"
+
+def find_section_index(body, anchor):
+    """
+    Finds the section an anchor belongs to in a sections_url() response.
+
+    Args:
+        body (bytes): JSON response of a sections_url() request
+        anchor (str): Section anchor, as returned by fragment_from_url()
+
+    Returns:
+        str: The section index to pass to parse_url(), or None if no section has that anchor
+
+    Raises:
+        ValueError: If the response is an API error
+    """
+    data = json.loads(body)
+    if 'error' in data:
+        raise ValueError(f"API error: {data['error'].get('info', data['error'])}")
+    for section in data['parse'].get('sections', []):
+        if anchor in (section.get('anchor'), section.get('linkAnchor')):
+            return section['index']
+    return None
+
+def read_parse_response(body):
+    """
+    Extracts the article from an action=parse response.
+
+    Args:
+        body (bytes): JSON response of a parse_url() request
+
+    Returns:
+        tuple: (title, body_html, revision_id), where body_html is the mw-parser-output div
+
+    Raises:
+        ValueError: If the response is an API error
+    """
+    data = json.loads(body)
+    if 'error' in data:
+        raise ValueError(f"API error: {data['error'].get('info', data['error'])}")
+    parsed = data['parse']
+    return parsed['title'], parsed['text'], parsed.get('revid')
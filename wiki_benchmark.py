@@ -0,0 +1,496 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark of the Wikipedia-to-EPUB pipeline.
+
+Replays a corpus of saved Wikipedia pages through wiki_stub_server.py, so runs are
+repeatable and do not depend on the network, and reports throughput (articles/s,
+MB/s) plus the time and memory spent in each pipeline stage. A run can be saved
+as a baseline; later runs compared against it flag every metric that got worse
+by more than the tolerance.
+
+Usage:
+    python wiki_benchmark.py record                  # save the benchmark pages (needs network access)
+    python wiki_benchmark.py synthesize              # or write synthetic stand-ins for them
+    python wiki_benchmark.py run --save-baseline benchmarks/baseline.json
+    python wiki_benchmark.py run --baseline benchmarks/baseline.json
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import random
+import sys
+import tempfile
+from contextlib import redirect_stdout
+from pathlib import Path
+from urllib.parse import quote, unquote
+
+import wiki_api
+from wiki_epub_compiler import (
+    process_wikipedia_articles, download_article_html, REQUEST_HEADERS, REQUESTS_PER_SECOND_PER_HOST,
+    REQUEST_BURST, DEFAULT_FETCH_WORKERS, PARSER_BACKENDS, DEFAULT_PARSER_BACKEND, FETCH_BACKENDS,
+    DEFAULT_FETCH_BACKEND
+)
+from wiki_http import HostRateLimiter, HttpClient
+from wiki_metrics import PipelineMetrics, STAGES, peak_memory_bytes
+from wiki_stub_server import fixture_path, start_stub_server
+
+DEFAULT_CORPUS_DIR = 'benchmarks/corpus'
+DEFAULT_REPEAT = 3
+# Relative slowdown (or memory growth) tolerated before a metric counts as a regression
+DEFAULT_TOLERANCE = 0.15
+# Smallest absolute growth that counts as a regression; stages taking a few milliseconds
+# vary by more than the tolerance from run to run
+MIN_REGRESSION_SECONDS = 0.1
+MIN_REGRESSION_BYTES = 1024 * 1024
+
+# A representative subset of wiki_articles.txt: short and long prose articles, code-heavy
+# pages, huge list pages and a non-Wikipedia wiki
+BENCHMARK_ARTICLES = [
+    'https://en.wikipedia.org/wiki/Publication_bias',
+    'https://en.wikipedia.org/wiki/Data_dredging',
+    'https://en.wikipedia.org/wiki/Zero-knowledge_proof',
+    'https://en.wikipedia.org/wiki/Off-by-one_error',
+    'https://en.wikipedia.org/wiki/Python_syntax_and_semantics',
+    'https://en.wikibooks.org/wiki/German/Grammar',
+    'https://en.wikipedia.org/wiki/Goodhart%27s_law',
+    'https://en.wikipedia.org/wiki/List_of_common_misconceptions',
+    'https://en.wikipedia.org/wiki/Timeline_of_the_far_future',
+    'https://en.wikipedia.org/wiki/List_of_cognitive_biases',
+    'https://en.wikipedia.org/wiki/Behavioral_economics',
+    'https://en.wikipedia.org/wiki/Data_compression',
+    'https://en.wikipedia.org/wiki/Quine_(computing)',
+    'https://en.wikipedia.org/wiki/Wikipedia%3AList_of_hoaxes_on_Wikipedia',
+    'https://en.wikipedia.org/wiki/Lists_of_sovereign_states_and_dependent_territories',
+]
+
+def _clear_corpus(corpus_dir):
+    """Creates the corpus directory, or empties it so only the pages about to be written are measured."""
+    Path(corpus_dir).mkdir(parents=True, exist_ok=True)
+    for path in Path(corpus_dir).glob('*.html'):
+        path.unlink()
+
+def record_corpus(corpus_dir=DEFAULT_CORPUS_DIR, urls=BENCHMARK_ARTICLES):
+    """
+    Downloads the benchmark pages and saves them as stub-server fixtures, replacing
+    whatever corpus was there before.
+
+    Args:
+        corpus_dir (str): Directory the <Title>.html fixtures are written to
+        urls (list): Article URLs to record
+
+    Returns:
+        int: Number of pages recorded
+    """
+    _clear_corpus(corpus_dir)
+    rate_limiter = HostRateLimiter(REQUESTS_PER_SECOND_PER_HOST, REQUEST_BURST)
+    recorded = 0
+    with HttpClient(REQUEST_HEADERS) as client:
+        for url in urls:
+            title = wiki_api.title_from_url(url)
+            if not title:
+                print(f"   [!] Not an article URL, skipping: {url}")
+                continue
+            try:
+                html = download_article_html(url, rate_limiter, client=client)
+            except Exception as e:
+                print(f"   [!] Could not record {url}: {e}")
+                continue
+            fixture_path(corpus_dir, title).write_bytes(html)
+            recorded += 1
+    print(f"[*] Recorded {recorded} of {len(urls)} pages into {corpus_dir}")
+    return recorded
+
+# Shape of the synthetic stand-in for each of BENCHMARK_ARTICLES, by title: (kind, sections).
+# Machines that cannot record the real pages get the same titles with similar content
+SYNTHETIC_SHAPES = {
+    'Publication_bias': ('prose', 12),
+    'Data_dredging': ('prose', 10),
+    'Zero-knowledge_proof': ('prose', 20),
+    'Off-by-one_error': ('code', 8),
+    'Python_syntax_and_semantics': ('code', 40),
+    'German/Grammar': ('prose', 8),
+    "Goodhart's_law": ('prose', 8),
+    'List_of_common_misconceptions': ('list', 90),
+    'Timeline_of_the_far_future': ('table', 30),
+    'List_of_cognitive_biases': ('table', 25),
+    'Behavioral_economics': ('prose', 30),
+    'Data_compression': ('prose', 30),
+    'Quine_(computing)': ('code', 16),
+    'Wikipedia:List_of_hoaxes_on_Wikipedia': ('table', 30),
+    'Lists_of_sovereign_states_and_dependent_territories': ('list', 40),
+}
+SYNTHETIC_SEED = 20260101
+
+_SYNTHETIC_WORDS = (
+    'data statistical analysis result study effect bias sample hypothesis model test error value '
+    'research publication significance measure theory evidence method number system proof language '
+    'function variable memory process algorithm network historical century population economic '
+    'according early later however although several different important common known first'
+).split()
+
+def _sentence(rng, links=0.15, references=0.1):
+    words = []
+    for _ in range(rng.randint(8, 24)):
+        word = rng.choice(_SYNTHETIC_WORDS)
+        if rng.random() < links:
+            word = f'<a href="/wiki/{word.capitalize()}_{rng.randint(1, 999)}" title="{word}">{word}</a>'
+        words.append(word)
+    sentence = ' '.join(words).capitalize() + '.'
+    if rng.random() < references:
+        number = rng.randint(1, 200)
+        sentence += (f'<sup id="cite_ref-{number}" class="reference"><a href="#cite_note-{number}">'
+                     f'&#91;{number}&#93;</a></sup>')
+    return sentence
+
+def _paragraph(rng):
+    return '<p>' + ' '.join(_sentence(rng) for _ in range(rng.randint(3, 8))) + '</p>\n'
+
+def _heading(level, text):
+    anchor = text.replace(' ', '_')
+    return (f'<div class="mw-heading mw-heading{level}"><h{level} id="{anchor}">{text}</h{level}>'
+            f'<span class="mw-editsection"><span class="mw-editsection-bracket">[</span>'
+            f'<a href="/w/index.php?action=edit&amp;section=1">edit</a>'
+            f'<span class="mw-editsection-bracket">]</span></span></div>\n')
+
+def _section_body(rng, kind):
+    if kind == 'list':
+        items = ''.join(f'<li>{_sentence(rng, links=0.3, references=0.4)}</li>\n'
+                        for _ in range(rng.randint(20, 40)))
+        return f'<ul>\n{items}</ul>\n'
+    parts = [_paragraph(rng) for _ in range(rng.randint(2, 5))]
+    if kind == 'code':
+        lines = '\n'.join(f'<span class="k">def</span> <span class="nf">{rng.choice(_SYNTHETIC_WORDS)}_{i}</span>'
+                           f'<span class="p">(</span>x<span class="p">):</span> <span class="k">return</span> '
+                           f'x <span class="o">+</span> <span class="mi">{i}</span>' for i in range(rng.randint(5, 20)))
+        parts.append(f'<div class="mw-highlight mw-highlight-lang-python"><pre>{lines}</pre></div>\n')
+    elif kind == 'table':
+        rows = ''.join(f'<tr><td>{rng.randint(1, 10 ** 9)}</td><td>{_sentence(rng, references=0.3)}</td>'
+                       f'<td>{rng.choice(_SYNTHETIC_WORDS)}</td></tr>\n' for _ in range(rng.randint(8, 25)))
+        parts.append(f'<table class="wikitable sortable"><tbody><tr><th>Year</th><th>Event</th><th>Field</th></tr>'
+                     f'\n{rows}</tbody></table>\n')
+    if rng.random() < 0.3:
+        parts.append(f'<figure typeof="mw:File/Thumb"><a href="/wiki/File:{rng.randint(1, 999)}.png">'
+                     f'<img src="//upload.wikimedia.org/x/{rng.randint(1, 999)}.png" width="250" height="180"/></a>'
+                     f'<figcaption>{_sentence(rng, references=0)}</figcaption></figure>\n')
+    return ''.join(parts)
+
+def synthesize_page(title, kind, sections, seed=SYNTHETIC_SEED):
+    """
+    Writes a deterministic stand-in for a rendered Wikipedia page.
+
+    The page has the markup the cleaner deals with on real pages: the skin chrome,
+    a hatnote, an infobox, TemplateStyles, headings with edit links, reference
+    markers, figures, a reference list, a navbox and the category links.
+
+    Args:
+        title (str): Page title, with underscores
+        kind (str): 'prose', 'code', 'table' or 'list', the content of each section
+        sections (int): Number of sections
+
+    Returns:
+        bytes: The page as UTF-8 HTML
+    """
+    rng = random.Random(f"{seed}:{title}")
+    display = title.replace('_', ' ')
+    revision = rng.randint(10 ** 9, 2 * 10 ** 9)
+    menu = ''.join(f'<li class="mw-list-item"><a href="/wiki/Special:{word}">{word}</a></li>'
+                   for word in _SYNTHETIC_WORDS)
+    body = [
+        '<div class="hatnote navigation-not-searchable">For other uses, see '
+        f'<a href="/wiki/{title}_(disambiguation)">{display} (disambiguation)</a>.</div>\n',
+        '<style data-mw-deduplicate="TemplateStyles:r1">.mw-parser-output .infobox{border:1px solid #a2a9b1}'
+        '.mw-parser-output .infobox>tbody>tr>th{text-align:left}</style>\n',
+        '<table class="infobox"><tbody>' + ''.join(
+            f'<tr><th scope="row">{rng.choice(_SYNTHETIC_WORDS).capitalize()}</th>'
+            f'<td>{_sentence(rng, references=0)}</td></tr>'
+            for _ in range(8)) + '</tbody></table>\n',
+        _paragraph(rng), _paragraph(rng),
+    ]
+    for number in range(1, sections + 1):
+        body.append(_heading(2, f"Section {number}"))
+        body.append(_section_body(rng, kind))
+        if kind != 'list' and rng.random() < 0.4:
+            body.append(_heading(3, f"Subsection {number}"))
+            body.append(_section_body(rng, kind))
+    body.append(_heading(2, 'References'))
+    body.append('<div class="reflist"><ol class="references">' + ''.join(
+        f'<li id="cite_note-{n}"><span class="mw-cite-backlink"><a href="#cite_ref-{n}">^</a></span> '
+        f'<span class="reference-text"><cite class="citation journal cs1">{_sentence(rng, references=0)}</cite>'
+        '</span></li>' for n in range(1, 60)) + '</ol></div>\n')
+    body.append('<div class="navbox" role="navigation"><table class="nowraplinks"><tbody><tr><td>' +
+                ' · '.join(f'<a href="/wiki/{word}">{word}</a>' for word in _SYNTHETIC_WORDS) +
+                '</td></tr></tbody></table></div>\n')
+    page = (
+        '<!DOCTYPE html>\n<html class="client-nojs" lang="en" dir="ltr"><head><meta charset="UTF-8">'
+        f'<title>{display} - Wikipedia</title>'
+        f'<script>RLCONF={{"wgPageName":"{title}","wgTitle":"{display}","wgRevisionId":{revision}}};</script>'
+        '<link rel="stylesheet" href="/w/load.php?modules=skins.vector.styles"></head>\n'
+        f'<body class="skin-vector"><div id="mw-navigation"><nav id="p-navigation"><ul>{menu}</ul></nav>'
+        f'<nav id="p-tb"><ul>{menu}</ul></nav></div>\n'
+        f'<main id="content"><h1 id="firstHeading" class="firstHeading mw-first-heading">'
+        f'<span class="mw-page-title-main">{display}</span></h1>\n'
+        '<div id="bodyContent"><div id="mw-content-text" class="mw-body-content">'
+        '<div class="mw-content-ltr mw-parser-output" lang="en" dir="ltr">\n' + ''.join(body) +
+        '</div></div>\n<div id="catlinks" class="catlinks"><ul><li><a href="/wiki/Category:Statistics">'
+        'Statistics</a></li></ul></div></div></main>\n'
+        f'<footer id="footer"><ul>{menu}</ul></footer></body></html>\n'
+    )
+    return page.encode('utf-8')
+
+def synthesize_corpus(corpus_dir=DEFAULT_CORPUS_DIR, urls=BENCHMARK_ARTICLES):
+    """
+    Writes a synthetic stand-in for every benchmark page, the same bytes on every machine,
+    replacing whatever corpus was there before.
+
+    Returns:
+        int: Number of pages written
+    """
+    _clear_corpus(corpus_dir)
+    titles = [wiki_api.title_from_url(url) for url in urls]
+    for title in titles:
+        kind, sections = SYNTHETIC_SHAPES.get(title, ('prose', 10))
+        fixture_path(corpus_dir, title).write_bytes(synthesize_page(title, kind, sections))
+    print(f"[*] Wrote {len(titles)} synthetic pages into {corpus_dir}")
+    return len(titles)
+
+def corpus_fingerprint(corpus_dir):
+    """Returns the page count, size and content digest that identify a corpus."""
+    digest = hashlib.sha256()
+    size = 0
+    paths = sorted(Path(corpus_dir).glob('*.html'))
+    for path in paths:
+        data = path.read_bytes()
+        digest.update(path.name.encode('utf-8') + b'\0' + data)
+        size += len(data)
+    return {'articles': len(paths), 'bytes': size, 'sha256': digest.hexdigest()}
+
+def corpus_urls(corpus_dir, base_url):
+    """Returns the stub-server URL of every page in a corpus directory."""
+    return [
+        f"{base_url}/wiki/{quote(unquote(path.stem))}"
+        for path in sorted(Path(corpus_dir).glob('*.html'))
+    ]
+
+def _run_once(urls, workers, parser, fetch_backend, stream, metrics):
+    """Compiles the corpus once into a throwaway EPUB, with the pipeline's progress output silenced."""
+    # The stub server is local, so requests are not throttled
+    rate_limiter = HostRateLimiter(1e9, len(urls) + 1)
+    with tempfile.TemporaryDirectory() as tmp, redirect_stdout(io.StringIO()):
+        ok = process_wikipedia_articles(urls, str(Path(tmp) / 'benchmark.epub'), max_workers=workers,
+                                        rate_limiter=rate_limiter, parser=parser, stream=stream,
+                                        fetch_backend=fetch_backend, metrics=metrics)
+    if not ok:
+        raise RuntimeError("benchmark compilation failed")
+    return metrics.report()
+
+def run_benchmark(corpus_dir=DEFAULT_CORPUS_DIR, repeat=DEFAULT_REPEAT, workers=DEFAULT_FETCH_WORKERS,
+                  parser=DEFAULT_PARSER_BACKEND, fetch_backend=DEFAULT_FETCH_BACKEND, stream=False):
+    """
+    Replays the corpus through the pipeline and measures it.
+
+    Throughput comes from the fastest of `repeat` runs and every stage figure is
+    its minimum across the runs, which filters out scheduling noise. Per-stage memory
+    comes from one extra run with tracemalloc and a single worker, so each peak
+    belongs to one stage of one article.
+
+    Returns:
+        dict: Corpus size, settings, throughput and per-stage results
+    """
+    corpus = corpus_fingerprint(corpus_dir)
+    server, base_url = start_stub_server(corpus_dir)
+    try:
+        urls = corpus_urls(corpus_dir, base_url)
+        if not urls:
+            raise ValueError(f"no pages in {corpus_dir}, record them first with: python wiki_benchmark.py record "
+                             "(or synthesize)")
+
+        timings = []
+        for i in range(max(1, repeat)):
+            timings.append(_run_once(urls, workers, parser, fetch_backend, stream, PipelineMetrics()))
+            print(f"   [*] Run {i + 1}/{repeat}: {timings[-1]['wall_seconds']:.2f}s")
+        best = min(timings, key=lambda report: report['wall_seconds'])
+
+        memory = _run_once(urls, 1, parser, fetch_backend, stream, PipelineMetrics(trace_memory=True))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    stages = {}
+    for name in STAGES:
+        if name not in best['stages']:
+            continue
+        summaries = [report['stages'][name] for report in timings if name in report['stages']]
+        stages[name] = {key: min(summary[key] for summary in summaries) for key in ('total', 'p50', 'p95')}
+        if 'peak_memory_bytes' in memory['stages'].get(name, {}):
+            stages[name]['peak_memory_bytes'] = memory['stages'][name]['peak_memory_bytes']
+
+    wall = best['wall_seconds']
+    return {
+        'corpus': corpus,
+        'settings': {'workers': workers, 'parser': parser, 'fetch_backend': fetch_backend, 'stream': stream},
+        'repeat': repeat,
+        'wall_seconds': wall,
+        'articles_per_second': len(urls) / wall,
+        'mb_per_second': best['bytes_downloaded'] / 1024 / 1024 / wall,
+        'peak_memory_bytes': peak_memory_bytes(),
+        'stages': stages,
+    }
+
+def _comparable_metrics(results):
+    """
+    Yields (name, value, higher_is_better, min_change) for every metric a baseline
+    comparison looks at, where min_change is the smallest absolute growth that counts.
+    """
+    yield 'articles_per_second', results['articles_per_second'], True, 0
+    yield 'mb_per_second', results['mb_per_second'], True, 0
+    for name, stage in results['stages'].items():
+        for key in ('total', 'p50', 'p95', 'peak_memory_bytes'):
+            if key in stage:
+                min_change = MIN_REGRESSION_BYTES if key == 'peak_memory_bytes' else MIN_REGRESSION_SECONDS
+                yield f"{name}.{key}", stage[key], False, min_change
+
+def compare_to_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Prints every metric next to its baseline value and collects the regressions.
+
+    A stage timing or memory peak must also grow by at least MIN_REGRESSION_SECONDS
+    or MIN_REGRESSION_BYTES to count, so run-to-run jitter does not fail a build.
+    Results of another corpus or other settings are not comparable at all.
+
+    Args:
+        results (dict): Output of run_benchmark()
+        baseline (dict): Earlier output of run_benchmark()
+        tolerance (float): Relative change tolerated before a metric counts as a regression
+
+    Returns:
+        list: Names of the metrics that regressed
+
+    Raises:
+        ValueError: If the baseline was measured on another corpus or with other settings
+    """
+    for key in ('corpus', 'settings'):
+        if baseline.get(key) != results.get(key):
+            raise ValueError(f"{key} of the baseline {baseline.get(key)} does not match this run's "
+                             f"{results.get(key)}")
+    previous = {name: value for name, value, _, _ in _comparable_metrics(baseline)}
+
+    regressions = []
+    print(f"\n{'metric':<28}{'baseline':>14}{'current':>14}{'change':>10}")
+    for name, value, higher_is_better, min_change in _comparable_metrics(results):
+        old = previous.get(name)
+        if not old:
+            continue
+        change = (value - old) / old
+        regressed = change < -tolerance if higher_is_better else change > tolerance and value - old >= min_change
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<28}{old:>14.4g}{value:>14.4g}{change:>+9.1%}{'  <-- regression' if regressed else ''}")
+    return regressions
+
+def resolve_settings(args, baseline=None):
+    """
+    Returns the run_benchmark() settings of a run: the options given on the command
+    line, then the baseline's settings, then the compiler's defaults.
+    """
+    defaults = {'workers': DEFAULT_FETCH_WORKERS, 'parser': DEFAULT_PARSER_BACKEND,
+                'fetch_backend': DEFAULT_FETCH_BACKEND, 'stream': False}
+    defaults.update((baseline or {}).get('settings', {}))
+    return {name: default if getattr(args, name) is None else getattr(args, name)
+            for name, default in defaults.items()}
+
+def print_results(results):
+    corpus = results['corpus']
+    print(f"\n[*] {corpus['articles']} articles, {corpus['bytes'] / 1024 / 1024:.1f} MB of HTML "
+          f"in {results['wall_seconds']:.2f}s: {results['articles_per_second']:.1f} articles/s, "
+          f"{results['mb_per_second']:.2f} MB/s")
+    for name, stage in results['stages'].items():
+        memory = stage.get('peak_memory_bytes')
+        memory_text = f"   peak {memory / 1024 / 1024:7.1f} MB" if memory is not None else ''
+        print(f"    {name:<9} total {stage['total']:8.3f}s   p50 {stage['p50'] * 1000:8.1f} ms   "
+              f"p95 {stage['p95'] * 1000:8.1f} ms{memory_text}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the compiler against a saved page corpus.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    record = commands.add_parser('record', help="download the benchmark pages into the corpus (needs network access)")
+    record.add_argument('--corpus', default=DEFAULT_CORPUS_DIR, help=f"corpus directory (default: {DEFAULT_CORPUS_DIR})")
+    record.add_argument('--urls', help="file with the URLs to record instead of the built-in subset")
+
+    synthesize = commands.add_parser('synthesize', help="write the synthetic stand-in corpus, without network access")
+    synthesize.add_argument('--corpus', default=DEFAULT_CORPUS_DIR, help=f"corpus directory (default: {DEFAULT_CORPUS_DIR})")
+
+    run = commands.add_parser('run', help="replay the corpus through the pipeline and report the results")
+    run.add_argument('--corpus', default=DEFAULT_CORPUS_DIR, help=f"corpus directory (default: {DEFAULT_CORPUS_DIR})")
+    run.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                     help=f"timed runs, the fastest one is reported (default: {DEFAULT_REPEAT})")
+    # Without a value these come from --baseline, or the compiler's defaults
+    run.add_argument('--workers', type=int, help=f"default: the baseline's, else {DEFAULT_FETCH_WORKERS}")
+    run.add_argument('--parser', choices=PARSER_BACKENDS,
+                     help=f"default: the baseline's, else {DEFAULT_PARSER_BACKEND}")
+    run.add_argument('--fetch-backend', choices=FETCH_BACKENDS,
+                     help=f"default: the baseline's, else {DEFAULT_FETCH_BACKEND}")
+    run.add_argument('--stream', action='store_true', default=None)
+    run.add_argument('--output', help="also write the results as JSON to this file")
+    run.add_argument('--save-baseline', metavar='PATH', help="store the results as the new baseline")
+    run.add_argument('--baseline', metavar='PATH', help="compare against a stored baseline, exit 1 on regressions")
+    run.add_argument('--tolerance', type=float,
+                     help="relative change that counts as a regression, stored with --save-baseline "
+                          f"(default: the baseline's, else {DEFAULT_TOLERANCE})")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.command == 'record':
+        urls = BENCHMARK_ARTICLES
+        if args.urls:
+            from main import load_wikipedia_urls
+            urls = load_wikipedia_urls(args.urls)
+        sys.exit(0 if record_corpus(args.corpus, urls) else 1)
+    if args.command == 'synthesize':
+        sys.exit(0 if synthesize_corpus(args.corpus) else 1)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    settings = resolve_settings(args, baseline)
+    # A baseline from a noisy machine carries the tolerance that machine needs
+    tolerance = args.tolerance if args.tolerance is not None else \
+        (baseline or {}).get('tolerance', DEFAULT_TOLERANCE)
+    try:
+        # Fail before the timed runs when the results could not be compared anyway
+        if baseline and baseline.get('settings') != settings:
+            raise ValueError(f"settings of the baseline {baseline.get('settings')} do not match this run's {settings}")
+        if baseline and baseline.get('corpus') != corpus_fingerprint(args.corpus):
+            raise ValueError(f"{args.corpus} is not the corpus the baseline was measured on")
+        results = run_benchmark(args.corpus, args.repeat, **settings)
+    except (ValueError, RuntimeError) as e:
+        print(f"[!] {e}")
+        sys.exit(1)
+    print_results(results)
+    results['tolerance'] = tolerance
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=1)
+            print(f"[*] Results written to {path}")
+
+    if baseline:
+        try:
+            regressions = compare_to_baseline(results, baseline, tolerance)
+        except ValueError as e:
+            print(f"[!] {e}")
+            sys.exit(1)
+        if regressions:
+            print(f"\n[!] {len(regressions)} metrics regressed by more than {tolerance:.0%}")
+            sys.exit(1)
+        print("\n[+] No regressions against the baseline")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit, quote, unquote
+
+DEFAULT_CACHE_DIR = '.wiki_cache'
+DEFAULT_CACHE_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Characters left untouched when re-quoting a path, so %27 and ' map to the same key
+_PATH_SAFE_CHARS = "/:@!$&'()*+,;=-._~"
+
+def normalize_url(url):
+    """
+    Normalizes a URL so that equivalent spellings share one cache entry.
+
+    Lowercases the scheme and host, drops the #fragment, canonicalizes
+    percent-encoding in the path and sorts query parameters.
+
+    Args:
+        url (str): URL to normalize
+
+    Returns:
+        str: Normalized URL
+    """
+    parts = urlsplit(url.strip())
+    path = quote(unquote(parts.path), safe=_PATH_SAFE_CHARS)
+    query = '&'.join(sorted(parts.query.split('&'))) if parts.query else ''
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ''))
+
+class OfflineCacheMiss(Exception):
+    """Raised when the cache is in offline mode and the requested URL is not cached."""
+
+class CacheEntry:
+    """A cached HTTP response body together with its validators."""
+
+    __slots__ = ('url', 'body', 'etag', 'last_modified', 'fetched_at', 'fresh')
+
+    def __init__(self, url, body, etag, last_modified, fetched_at, fresh):
+        self.url = url
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+        self.fresh = fresh
+
+    def conditional_headers(self):
+        """Returns the If-None-Match / If-Modified-Since headers used to revalidate this entry."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+class HttpCache:
+    """
+    Persistent on-disk cache of raw HTTP response bodies.
+
+    Entries are addressed by the SHA-256 of the normalized URL and store the raw
+    bytes plus the ETag and Last-Modified headers. Entries older than the TTL are
+    stale and should be revalidated with a conditional request. The total size is
+    capped, evicting the least recently used entries first.
+
+    Args:
+        cache_dir (str): Directory holding the cache files
+        ttl (float): Seconds an entry is served without revalidation
+        max_bytes (int): Size cap for all cached bodies
+        offline (bool): Serve only from the cache and never touch the network
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, ttl=DEFAULT_CACHE_TTL_SECONDS,
+                 max_bytes=DEFAULT_CACHE_MAX_BYTES, offline=False):
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self._lock = threading.Lock()
+        self._total_bytes = None  # Computed lazily on the first store
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha256(normalize_url(url).encode('utf-8')).hexdigest()
+        directory = self.cache_dir / key[:2]
+        return directory / f"{key}.json", directory / f"{key}.body"
+
+    def lookup(self, url):
+        """
+        Looks up a cached response.
+
+        Args:
+            url (str): Requested URL
+
+        Returns:
+            CacheEntry: The cached entry, or None if the URL is not cached
+        """
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            body = body_path.read_bytes()
+        except (OSError, ValueError):
+            return None
+
+        # Bump the access time so LRU eviction keeps recently used entries
+        try:
+            os.utime(meta_path)
+        except OSError:
+            pass
+
+        fresh = time.time() - meta.get('fetched_at', 0) < self.ttl
+        return CacheEntry(url, body, meta.get('etag'), meta.get('last_modified'),
+                          meta.get('fetched_at', 0), fresh)
+
+    def store(self, url, body, headers):
+        """
+        Saves a response body and its validators.
+
+        Args:
+            url (str): Requested URL
+            body (bytes): Raw response body
+            headers (Mapping): Response headers (ETag and Last-Modified are kept)
+        """
+        meta_path, body_path = self._paths(url)
+        meta_path.parent.mkdir(exist_ok=True)
+
+        old_size = body_path.stat().st_size if body_path.exists() else 0
+        meta = {
+            'url': normalize_url(url),
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'fetched_at': time.time(),
+            'size': len(body),
+        }
+
+        # Write to temporary files first so readers never see a half-written entry
+        _atomic_write(body_path, body)
+        _atomic_write(meta_path, json.dumps(meta).encode('utf-8'))
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            else:
+                self._total_bytes += len(body) - old_size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def mark_revalidated(self, url):
+        """Resets the age of an entry after the server answered 304 Not Modified."""
+        meta_path, _ = self._paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            meta['fetched_at'] = time.time()
+            _atomic_write(meta_path, json.dumps(meta).encode('utf-8'))
+        except (OSError, ValueError):
+            pass
+
+    def _entries(self):
+        return self.cache_dir.glob('*/*.json')
+
+    def _scan_size(self):
+        total = 0
+        for meta_path in self._entries():
+            try:
+                total += meta_path.with_suffix('.body').stat().st_size
+            except OSError:
+                continue
+        return total
+
+    def _evict(self):
+        """Deletes least recently used entries until the cache is below 90% of its cap."""
+        entries = []
+        for meta_path in self._entries():
+            try:
+                entries.append((meta_path.stat().st_mtime, meta_path))
+            except OSError:
+                continue
+        entries.sort()
+
+        target = self.max_bytes * 0.9
+        for _, meta_path in entries:
+            if self._total_bytes <= target:
+                break
+            body_path = meta_path.with_suffix('.body')
+            try:
+                size = body_path.stat().st_size
+                body_path.unlink()
+                meta_path.unlink()
+                self._total_bytes -= size
+            except OSError:
+                continue
+
+def _atomic_write(path, data):
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
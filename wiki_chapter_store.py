@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from urllib.parse import urlsplit
+from wiki_cache import normalize_url
+
+DEFAULT_BUILD_DIR = '.wiki_build'
+MANIFEST_NAME = 'manifest.json'
+# Bump whenever the cleaning rules change so stale chapters are rebuilt
+MANIFEST_VERSION = 2
+
+# MediaWiki embeds the page revision in its inline config: "wgRevisionId":1234567
+_REVISION_PATTERN = re.compile(rb'"wgRevisionId"\s*:\s*(\d+)')
+
+def extract_revision_id(html):
+    """
+    Reads the revision ID MediaWiki embeds in a rendered page, without parsing the HTML.
+
+    Args:
+        html (bytes): Raw HTML of a Wikipedia page
+
+    Returns:
+        int: The revision ID, or None if the page does not carry one
+    """
+    match = _REVISION_PATTERN.search(html)
+    return int(match.group(1)) if match else None
+
+def _chapter_key(url):
+    """Manifest key of a URL; a #fragment selects a section, so it is part of the key."""
+    fragment = urlsplit(url.strip()).fragment
+    return normalize_url(url) + (f"#{fragment}" if fragment else '')
+
+class ChapterStore:
+    """
+    Build directory that remembers every cleaned chapter between runs.
+
+    The manifest maps each article URL to its source revision, the hash of its
+    cleaned content and the file holding that content. When an article's
+    revision has not changed, the stored chapter is reused and the page does not
+    need to be parsed or cleaned again.
+
+    Args:
+        build_dir (str): Directory holding the manifest and chapter files
+        variant (str): Identifies build settings that change the cleaned content, e.g.
+            the image settings; chapters stored under another variant are rebuilt
+    """
+
+    def __init__(self, build_dir=DEFAULT_BUILD_DIR, variant=None):
+        self.build_dir = Path(build_dir)
+        self.variant = variant
+        self.chapter_dir = self.build_dir / 'chapters'
+        self.chapter_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.build_dir / MANIFEST_NAME
+        self._lock = threading.Lock()
+        self._manifest = self._load_manifest()
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"[!] Ignoring unreadable build manifest {self.manifest_path}: {e}")
+            return {}
+
+        if manifest.get('version') != MANIFEST_VERSION:
+            print("[*] Build manifest is from an older version, rebuilding all chapters")
+            return {}
+        return manifest.get('chapters', {})
+
+    def lookup(self, url, revision):
+        """
+        Returns the stored chapter for `url` if it was built from the same revision.
+
+        Args:
+            url (str): Article URL
+            revision (int): Current revision ID of the article
+
+        Returns:
+            tuple: (title, cleaned_content) if the chapter is unchanged, None otherwise
+        """
+        if revision is None:
+            return None
+
+        with self._lock:
+            entry = self._manifest.get(_chapter_key(url))
+        if not entry or entry.get('revision') != revision or entry.get('variant') != self.variant:
+            return None
+
+        try:
+            content = (self.chapter_dir / entry['file']).read_text(encoding='utf-8')
+        except OSError:
+            return None
+        return entry['title'], content
+
+    def store(self, url, title, revision, content):
+        """
+        Records a freshly cleaned chapter.
+
+        Args:
+            url (str): Article URL
+            title (str): Article title
+            revision (int): Revision ID the content was built from, or None
+            content (str): Cleaned HTML content of the chapter
+        """
+        content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        file_name = f"{content_hash}.html"
+        chapter_path = self.chapter_dir / file_name
+        if not chapter_path.exists():
+            tmp_path = chapter_path.with_name(f"{file_name}.{threading.get_ident()}.tmp")
+            tmp_path.write_text(content, encoding='utf-8')
+            os.replace(tmp_path, chapter_path)
+
+        with self._lock:
+            self._manifest[_chapter_key(url)] = {
+                'title': title,
+                'revision': revision,
+                'content_hash': content_hash,
+                'file': file_name,
+                'variant': self.variant,
+            }
+
+    def save(self):
+        """Writes the manifest to disk and deletes chapter files no entry refers to anymore."""
+        with self._lock:
+            manifest = dict(self._manifest)
+
+        tmp_path = self.manifest_path.with_name(MANIFEST_NAME + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'chapters': manifest}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+        referenced = {entry['file'] for entry in manifest.values()}
+        for chapter_path in self.chapter_dir.glob('*.html'):
+            if chapter_path.name not in referenced:
+                try:
+                    chapter_path.unlink()
+                except OSError:
+                    pass
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+import wiki_api
+from wiki_cache import OfflineCacheMiss
+from wiki_epub_compiler import download_article_html
+from wiki_lazy import lazy_import
+
+requests = lazy_import('requests')
+
+# Levels of subcategories (or lists of lists) followed below a listed page
+DEFAULT_CRAWL_DEPTH = 1
+# Members taken from any single category or list page
+DEFAULT_CRAWL_BREADTH = 200
+# Articles discovered by the whole crawl
+DEFAULT_CRAWL_MAX_ARTICLES = 1000
+
+CATEGORY_PREFIX = 'Category:'
+LIST_PREFIXES = ('List of ', 'Lists of ')
+
+def is_category(title):
+    """Returns True for a category title like "Category:Programming_language_comparisons"."""
+    return title.replace('_', ' ').startswith(CATEGORY_PREFIX)
+
+def is_list(title):
+    """Returns True for a list article title like "List_of_paradoxes"."""
+    return title.replace('_', ' ').startswith(LIST_PREFIXES)
+
+class ArticleCrawler:
+    """
+    Expands category pages, and optionally list articles, into the articles they contain.
+
+    Categories are expanded with list=categorymembers and list articles with
+    prop=links, which looks up the links of up to API_BATCH_SIZE lists per
+    request. Subcategories and lists found on the way are expanded breadth-first
+    until `max_depth` levels below the listed page. Every URL is yielded as soon
+    as the API response it is in arrives, so the pipeline can fetch articles while
+    the crawl is still running. A visited set keeps every page from being
+    expanded or yielded twice, even when categories contain each other.
+
+    Args:
+        client (HttpClient): Shared HTTP client
+        rate_limiter (HostRateLimiter): Per-host limiter shared with the article downloads
+        cache (HttpCache): Optional HTTP cache for the API responses
+        max_depth (int): Levels of pages expanded below a listed page; 1 only takes its direct members
+        max_breadth (int): Members taken from any single category or list
+        max_articles (int): Articles discovered by the whole crawl; expansion stops once reached
+        expand_lists (bool): Also expand "List of ..." articles into the articles they link to,
+            instead of keeping them as chapters
+    """
+
+    def __init__(self, client, rate_limiter=None, cache=None, max_depth=DEFAULT_CRAWL_DEPTH,
+                 max_breadth=DEFAULT_CRAWL_BREADTH, max_articles=DEFAULT_CRAWL_MAX_ARTICLES,
+                 expand_lists=False):
+        self.client = client
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.max_depth = max(1, max_depth)
+        self.max_breadth = max_breadth
+        self.max_articles = max_articles
+        self.expand_lists = expand_lists
+        self.discovered = 0
+
+    def is_expandable(self, url):
+        """Returns True if the crawler expands this URL instead of passing it on."""
+        title = wiki_api.title_from_url(url)
+        if not title or wiki_api.fragment_from_url(url):
+            return False
+        return is_category(title) or (self.expand_lists and is_list(title))
+
+    def crawl(self, urls):
+        """
+        Yields the URLs of a list, with every expandable page replaced by the articles it contains.
+
+        Args:
+            urls (iterable): Article, category and list URLs in book order
+
+        Yields:
+            str: Article URLs; discovered ones follow in place of the page they came from
+        """
+        visited = set()
+        for url in urls:
+            url = url.strip()
+            if not self.is_expandable(url):
+                canonical = wiki_api.canonical_article_url(url)
+                if canonical not in visited or wiki_api.fragment_from_url(url):
+                    visited.add(canonical)
+                    yield url
+                continue
+            if self.discovered >= self.max_articles:
+                print(f"[!] Crawl limit of {self.max_articles} articles reached, not expanding {url}")
+                continue
+
+            title = wiki_api.title_from_url(url)
+            print(f"[*] Expanding {title.replace('_', ' ')}")
+            before = self.discovered
+            yield from self._expand(url, visited)
+            print(f"   [+] {title.replace('_', ' ')}: {self.discovered - before} articles")
+
+    def _expand(self, url, visited):
+        """Yields the articles below one page, level by level."""
+        endpoint = wiki_api.api_endpoint(url)
+        visited.add(wiki_api.canonical_article_url(url))
+        level = [wiki_api.title_from_url(url)]
+        for depth in range(1, self.max_depth + 1):
+            expand_further = depth < self.max_depth
+            next_level = []
+            for title, is_subcategory in self._members(endpoint, level):
+                member_url = wiki_api.canonical_article_url(url, title)
+                if member_url in visited:
+                    continue
+                visited.add(member_url)
+                if is_subcategory or (expand_further and self.expand_lists and is_list(title)):
+                    if expand_further:
+                        next_level.append(title)
+                    continue
+
+                yield member_url
+                self.discovered += 1
+                if self.discovered >= self.max_articles:
+                    print(f"[!] Crawl limit of {self.max_articles} articles reached")
+                    return
+            if not next_level:
+                return
+            level = next_level
+
+    def _members(self, endpoint, titles):
+        """Yields (title, is_category) for the members of every page in `titles`, up to max_breadth each."""
+        for title in titles:
+            if not is_category(title):
+                continue
+            taken = 0
+            continuation = None
+            while taken < self.max_breadth:
+                result = self._query(wiki_api.category_members_url(endpoint, title, continuation),
+                                     wiki_api.read_category_members_response)
+                if result is None:
+                    break
+                members, continuation = result
+                for member in members[:self.max_breadth - taken]:
+                    taken += 1
+                    yield member
+                if continuation is None:
+                    break
+
+        lists = [title for title in titles if not is_category(title)]
+        for start in range(0, len(lists), wiki_api.API_BATCH_SIZE):
+            batch = lists[start:start + wiki_api.API_BATCH_SIZE]
+            taken = {}
+            continuation = None
+            while True:
+                result = self._query(wiki_api.links_url(endpoint, batch, continuation),
+                                     wiki_api.read_links_response)
+                if result is None:
+                    break
+                links, continuation = result
+                for page, linked in links.items():
+                    for link in linked[:self.max_breadth - taken.get(page, 0)]:
+                        taken[page] = taken.get(page, 0) + 1
+                        yield link, False
+                if continuation is None or (len(taken) >= len(batch) and
+                                            min(taken.values()) >= self.max_breadth):
+                    break
+
+    def _query(self, url, read_response):
+        """Downloads one API response and reads it, or returns None after reporting why that failed."""
+        try:
+            return read_response(download_article_html(url, self.rate_limiter, self.cache, self.client))
+        except (requests.RequestException, OfflineCacheMiss, ValueError) as e:
+            print(f"   [!] Crawl request failed: {e}")
+            return None
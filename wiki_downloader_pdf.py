@@ -7,334 +7,28 @@ from urllib.parse import urlparse, quote, unquote, urljoin
 from pypdf import PdfWriter
 from pathlib import Path
 import sys
-from google.colab import files
+import argparse
 import traceback
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from bs4 import BeautifulSoup  # Import BeautifulSoup
+from wiki_http import HostRateLimiter, HttpClient
+from wiki_journal import CheckpointJournal
 
 # Configuration settings for the Wikipedia PDF downloader
 USER_AGENT = 'WikipediaPdfDownloader/1.2 (Educational use; contact: user@example.com)'
 
+INPUT_URL_FILE = 'wiki_articles.txt'
 OUTPUT_PDF_FILE = 'wiki_compilation.pdf'
 TEMP_DIR = 'temp_wiki_pdfs'
-# Rate limiting delay between article downloads
+# Rate limiting: minimum spacing between download starts on the same host
 DOWNLOAD_DELAY_SECONDS = 1  # Be respectful to Wikipedia's servers
+# Concurrent downloads over the shared session, and how many of them may hit one host
+MAX_CONCURRENT_DOWNLOADS = 4
+MAX_CONCURRENT_PER_HOST = 2
 REQUEST_TIMEOUT_STEP1 = 60   # HTML page timeout
 REQUEST_TIMEOUT_STEP2 = 180  # PDF download timeout (longer for large files)
 
-# --- User Input ---
-wiki_urls_text = """
-https://en.wikipedia.org/wiki/Publication_bias
-https://en.wikipedia.org/wiki/Data_dredging
-https://en.wikipedia.org/wiki/Zero-knowledge_proof
-https://en.wikipedia.org/wiki/Brinkmanship
-https://en.wikipedia.org/wiki/Flanderization
-https://en.wikipedia.org/wiki/Recursive_acronym
-https://en.wikipedia.org/wiki/Off-by-one_error
-https://en.wikipedia.org/wiki/Category:Programming_language_comparisons
-https://en.wikipedia.org/wiki/Python_syntax_and_semantics
-https://en.wikibooks.org/wiki/German/Grammar
-https://en.wikipedia.org/wiki/Goodhart%27s_law
-https://en.wikipedia.org/wiki/List_of_common_misconceptions
-https://en.wikipedia.org/wiki/Timeline_of_the_far_future
-https://en.wikipedia.org/wiki/List_of_fallacies
-https://en.wikipedia.org/wiki/List_of_unusual_deaths
-https://en.wikipedia.org/wiki/List_of_confidence_tricks
-https://en.wikipedia.org/wiki/Geographical_renaming#Naming_disputes
-https://en.wikipedia.org/wiki/Intersectionality
-https://en.wikipedia.org/wiki/Behavioral_economics
-https://en.wikipedia.org/wiki/Systems_thinking
-https://en.wikipedia.org/wiki/Constructivism_(philosophy_of_science)
-https://en.wikipedia.org/wiki/Sociotechnical_system
-https://en.wikipedia.org/wiki/Heuristic_(psychology)
-https://en.wikipedia.org/wiki/Complex_system
-https://en.wikipedia.org/wiki/Data_compression
-https://en.wikipedia.org/wiki/Coding_theory
-https://en.wikipedia.org/wiki/Cognitive_bias_mitigation
-https://en.wikipedia.org/wiki/List_of_cognitive_biases
-https://en.wikipedia.org/wiki/Black_swan_theory
-https://en.wikipedia.org/wiki/Autogram
-https://en.wikipedia.org/wiki/Quine_(computing)
-https://en.wikipedia.org/wiki/Droste_effect
-https://en.wikipedia.org/wiki/Paraprosdokian
-https://en.wikipedia.org/wiki/Garden-path_sentence
-https://en.wikipedia.org/wiki/List_of_linguistic_example_sentences
-https://en.wikipedia.org/wiki/Wikipedia%3AList_of_hoaxes_on_Wikipedia
-https://en.wikipedia.org/wiki/List_of_military_strategies_and_concepts
-https://en.wikipedia.org/wiki/Information_asymmetry
-https://en.wikipedia.org/wiki/Social_choice_theory
-https://en.wikipedia.org/wiki/Lists_of_sovereign_states_and_dependent_territories
-https://en.wikipedia.org/wiki/Political_history_of_the_world
-https://en.wikipedia.org/wiki/Rose_(mathematics)
-https://en.wikipedia.org/wiki/100_prisoners_problem
-https://en.wikipedia.org/wiki/Perverse_incentive
-https://en.wikipedia.org/wiki/Systems_theory
-https://en.wikipedia.org/wiki/Futile_game
-https://en.wikipedia.org/wiki/Surreal_humour
-https://en.wikipedia.org/wiki/Self-referential_humor
-https://en.wikipedia.org/wiki/List_of_paradoxes
-https://en.wikipedia.org/wiki/Snowclone
-https://en.wikipedia.org/wiki/Dead_man%27s_switch
-https://en.wikipedia.org/wiki/Comparative_illusion
-https://en.wikipedia.org/wiki/Divide_and_choose
-https://en.wikipedia.org/wiki/Category:Types_of_auction
-https://en.wikipedia.org/wiki/Reverse_auction
-https://en.wikipedia.org/wiki/Crosswordese
-https://en.wikipedia.org/wiki/Casus_belli
-https://en.wikipedia.org/wiki/Overton_window
-https://en.wikipedia.org/wiki/List_of_United_States_cities_by_population
-https://en.wikipedia.org/wiki/List_of_numbers
-https://en.wikipedia.org/wiki/Metric_prefix#List_of_SI_prefixes
-https://en.wikipedia.org/wiki/Numeral_prefix
-https://en.wikipedia.org/wiki/List_of_commonly_used_taxonomic_affixes
-https://en.wikipedia.org/wiki/List_of_medical_roots,_suffixes_and_prefixes
-https://en.wikipedia.org/wiki/List_of_Latin_names_of_cities
-https://en.wikipedia.org/wiki/List_of_Latin_words_with_English_derivatives
-https://en.wikipedia.org/wiki/List_of_Greek_and_Latin_roots_in_English
-https://en.wikipedia.org/wiki/List_of_Latin_and_Greek_words_commonly_used_in_systematic_names
-https://en.wikipedia.org/wiki/Glossary_of_scientific_naming
-https://en.wikipedia.org/wiki/List_of_mnemonics
-https://en.wikipedia.org/wiki/Inherently_funny_word
-https://en.wikipedia.org/wiki/Phonestheme
-https://en.wiktionary.org/wiki/Appendix:German_cognates_with_English
-https://fr.wikipedia.org/wiki/Identit%C3%A9_remarquable
-https://en.wikipedia.org/wiki/List_of_territorial_disputes
-https://en.wikipedia.org/wiki/United_Nations_list_of_non-self-governing_territories#Current_entries
-https://en.wikipedia.org/wiki/List_of_largest_cities_throughout_history
-https://en.wikipedia.org/wiki/Euclidean_tilings_by_convex_regular_polygons?wprov=sfti1#Regular_tilings
-https://en.wikipedia.org/wiki/Braess%27s_paradox
-https://en.wikipedia.org/wiki/Emergence
-https://en.wikipedia.org/wiki/Fuzzy_logic
-https://en.wikipedia.org/wiki/Collective_effervescence
-https://en.wikipedia.org/wiki/Kolmogorov_complexity
-https://en.wikipedia.org/wiki/List_of_longest-living_organisms
-https://en.wikipedia.org/wiki/List_of_U.S._counties_with_shortest_life_expectancy
-https://en.wikipedia.org/wiki/List_of_individual_trees
-https://en.wikipedia.org/wiki/List_of_superlative_trees
-https://en.wikipedia.org/wiki/Largest_and_heaviest_animals
-https://en.wikipedia.org/wiki/List_of_largest_mammals
-https://en.wikipedia.org/wiki/List_of_largest_insects
-https://en.wikipedia.org/wiki/Wonders_of_the_World
-https://endwalker.com/archive.html
-https://en.wikipedia.org/wiki/List_of_hypothetical_technologies
-https://en.wikipedia.org/wiki/List_of_emerging_technologies
-https://en.wikipedia.org/wiki/List_of_natural_disasters_by_death_toll
-https://en.wikipedia.org/wiki/List_of_accidents_and_disasters_by_death_toll
-https://en.wikipedia.org/wiki/List_of_anthropogenic_disasters_by_death_toll
-https://en.wikipedia.org/wiki/List_of_metonyms
-https://en.wikipedia.org/wiki/List_of_lists_of_lists
-https://en.wikipedia.org/wiki/Timeline_of_association_football
-https://en.wikipedia.org/wiki/Wikipedia:Deleted_articles_with_freaky_titles
-https://en.wikipedia.org/wiki/List_of_Generation_Z_slang
-https://en.wikipedia.org/wiki/Frequency_illusion
-https://en.wikipedia.org/wiki/Base_rate_fallacy
-https://en.wikipedia.org/wiki/Intuitive_statistics
-https://en.wikipedia.org/wiki/Self-defeating_prophecy
-https://en.wikipedia.org/wiki/Preparedness_paradox
-https://en.wikipedia.org/wiki/Risk_compensation
-https://en.wikipedia.org/wiki/Nobel_disease
-https://en.wikipedia.org/wiki/Lambda_calculus
-https://en.wikipedia.org/wiki/High-context_and_low-context_cultures
-https://en.wikipedia.org/wiki/Impossible_color
-https://en.wikipedia.org/wiki/Hildegart_Rodr%C3%ADguez_Carballeira
-https://en.wikipedia.org/wiki/Surname
-https://en.wikipedia.org/wiki/List_of_national_flag_proposals
-https://en.wikipedia.org/wiki/Flag_families
-https://commons.wikimedia.org/wiki/Flags_of_extinct_states
-https://en.wikipedia.org/wiki/List_of_former_sovereign_states
-https://en.wikipedia.org/wiki/List_of_sovereign_states
-https://en.wikipedia.org/wiki/Internet_aesthetic
-https://en.wikipedia.org/wiki/Former_countries_in_Europe_after_1815
-https://en.wikipedia.org/wiki/Lists_of_political_entities_by_century
-https://en.wikipedia.org/wiki/Timeline_of_geopolitical_changes_(2000%E2%80%93present)
-https://en.wikipedia.org/wiki/List_of_ways_people_honor_the_dead
-https://en.wikipedia.org/wiki/List_of_folk_heroes
-https://en.wikipedia.org/wiki/List_of_destroyed_heritage
-https://en.wikipedia.org/wiki/R/K_selection_theory
-https://en.wikipedia.org/wiki/List_of_animal_sounds
-https://en.wikipedia.org/wiki/Lists_of_animals
-https://en.wikipedia.org/wiki/List_of_animal_names
-https://en.wikipedia.org/wiki/List_of_Latin_phrases_(full)
-https://en.wikipedia.org/wiki/List_of_chord_progressions
-https://en.wikipedia.org/wiki/List_of_bones_of_the_human_skeleton
-https://fr.wikipedia.org/wiki/Figure_de_style
-https://en.wikipedia.org/wiki/Outline_of_human_anatomy
-https://en.wikipedia.org/wiki/List_of_national_anthems
-https://en.wikipedia.org/wiki/Wikipedia:Language_recognition_chart
-https://en.wikipedia.org/wiki/List_of_stock_characters
-https://en.wikipedia.org/wiki/Stereotypes_of_groups_within_the_United_States
-https://en.wikipedia.org/wiki/List_of_constructed_languages
-https://en.wikipedia.org/wiki/List_of_contemporary_ethnic_groups
-https://en.wikipedia.org/wiki/List_of_national_border_changes_(1914%E2%80%93present)
-https://en.wikipedia.org/wiki/Negotiation#Tactics
-https://en.wikipedia.org/wiki/Watershed_(broadcasting)
-https://en.wikipedia.org/wiki/List_of_association_footballers_who_died_after_on-field_incidents
-https://en.wikipedia.org/wiki/Wikipedia:Lamest_edit_wars
-https://en.wikipedia.org/wiki/%CA%BEI%CA%BFrab
-https://en.wikipedia.org/wiki/Leverage_(negotiation)
-https://en.wikipedia.org/wiki/The_New_York_Times_crossword
-https://en.wikipedia.org/wiki/Glossary_of_mathematical_symbols
-https://en.wikipedia.org/wiki/List_of_logic_symbols
-https://en.wikipedia.org/wiki/List_of_emerging_technologies
-https://en.wikipedia.org/wiki/List_of_academic_fields
-https://en.wikipedia.org/wiki/List_of_animal_names
-https://en.wikipedia.org/wiki/List_of_algorithms
-https://en.wikipedia.org/wiki/List_of_colors_by_shade
-https://en.wikipedia.org/wiki/List_of_Internet_phenomena
-https://en.wikipedia.org/wiki/Glossary_of_medicine
-https://en.wikipedia.org/wiki/Outline_of_human_anatomy
-https://fr.wikipedia.org/wiki/Liste_des_figures_de_style
-https://en.wikipedia.org/wiki/List_of_most-watched_television_broadcasts
-https://en.wikipedia.org/wiki/List_of_circulating_currencies
-https://en.wikipedia.org/wiki/Currency_symbol
-https://en.wikipedia.org/wiki/List_of_current_heads_of_state_and_government
-https://en.wikipedia.org/wiki/The_world%27s_100_most_threatened_species
-https://en.wikipedia.org/wiki/List_of_historical_unrecognized_states
-https://en.wikipedia.org/wiki/Illeism
-https://en.wikipedia.org/wiki/List_of_obsolete_units_of_measurement
-https://en.wikipedia.org/wiki/List_of_humorous_units_of_measurement
-https://en.wikipedia.org/wiki/List_of_unusual_units_of_measurement
-https://en.wikipedia.org/wiki/Indefinite_and_fictitious_numbers
-https://en.wikipedia.org/wiki/Lists_of_most_expensive_items_by_category
-https://en.wikipedia.org/wiki/Wikipedia:Manual_of_Style
-https://en.wikipedia.org/wiki/List_of_most_popular_given_names
-https://en.wikipedia.org/wiki/List_of_family_name_affixes
-https://en.wikipedia.org/wiki/Lists_of_most_common_surnames
-https://en.wikipedia.org/wiki/Induction_puzzles
-https://fr.wikipedia.org/wiki/Classification_des_jeux
-https://en.wikipedia.org/wiki/Magic_number_(programming)
-https://fr.wikipedia.org/wiki/Fen%C3%AAtre_d'Overton
-https://fr.wikipedia.org/wiki/Nombre_de_Dunbar
-https://en.wikipedia.org/wiki/Affordance?wprov=sfti1
-https://fr.wikipedia.org/wiki/%C3%89minence_grise
-https://en.wikipedia.org/wiki/Cultural_universal?wprov=sfti1
-https://en.wikipedia.org/wiki/Antifragility?wprov=sfti1
-https://en.wikipedia.org/wiki/Lists_of_most_expensive_items_by_category
-https://en.wikipedia.org/wiki/Pseudo-anglicism?wprov=sfti1
-https://en.wikipedia.org/wiki/Lists_of_people_by_nationality
-https://en.wikipedia.org/wiki/List_of_tallest_buildings
-https://en.wikipedia.org/wiki/List_of_tallest_buildings_and_structures
-https://en.wikipedia.org/wiki/List_of_photographs_considered_the_most_important
-https://en.wikipedia.org/wiki/List_of_world_association_football_records
-https://en.wikipedia.org/wiki/List_of_forms_of_government
-https://en.wikipedia.org/wiki/List_of_countries_by_system_of_government
-https://en.wikipedia.org/wiki/Illegal_number
-https://en.wikipedia.org/wiki/List_of_mythological_places
-https://en.wikipedia.org/wiki/List_of_Greek_mythological_figures
-https://en.wikipedia.org/wiki/List_of_presidents_of_the_United_States
-https://en.wikipedia.org/wiki/Eye_contact#Between_species
-https://www.britannica.com/story/history-of-technology-timeline
-https://en.wikipedia.org/wiki/Cooperative_principle
-https://en.wikipedia.org/wiki/Very_Short_Introductions
-https://en.wikipedia.org/wiki/Hypocognition
-https://en.wikipedia.org/wiki/R/place
-https://en.wikipedia.org/wiki/Auction?wprov=sfti1#Types
-https://fr.wikipedia.org/wiki/Antipattern
-https://en.wikipedia.org/wiki/Golden_generation#Football
-https://en.wikipedia.org/wiki/List_of_heaviest_people
-https://en.wikipedia.org/wiki/Maximum_life_span
-https://en.wikipedia.org/wiki/Hyperreality
-https://en.wikipedia.org/wiki/Sorites_paradox
-https://en.wikipedia.org/wiki/List_of_eponymous_laws
-https://en.wikipedia.org/wiki/List_of_city_name_changes
-https://en.wikipedia.org/wiki/English_exonyms
-https://en.wikipedia.org/wiki/News_values
-https://en.wikipedia.org/wiki/Roko%27s_basilisk
-https://en.wikipedia.org/wiki/DNA_digital_data_storage
-https://en.wikipedia.org/wiki/Information_hazard
-https://en.wikipedia.org/wiki/Glossary_of_rhetorical_terms
-https://en.wikipedia.org/wiki/Path_dependence
-https://en.wikipedia.org/wiki/Iron_law_of_oligarchy
-https://en.wikipedia.org/wiki/Comparison_of_voting_rules
-https://en.wikipedia.org/wiki/List_of_musical_scales_and_modes
-https://en.wikipedia.org/wiki/Glossary_of_philosophy
-https://en.wikipedia.org/wiki/Glossary_of_professional_wrestling_terms
-https://en.wikipedia.org/wiki/Association_football_tactics_and_skills
-https://en.wikipedia.org/wiki/Lists_of_English_words
-https://en.wikipedia.org/wiki/Glossary_of_British_terms_not_widely_used_in_the_United_States
-https://en.wikipedia.org/wiki/Glossary_of_American_terms_not_widely_used_in_the_United_Kingdom
-https://en.wikipedia.org/wiki/List_of_English_words_with_disputed_usage
-https://en.wikipedia.org/wiki/Mathematical_proof
-https://en.wikipedia.org/wiki/Comparison_of_Portuguese_and_Spanish
-https://en.wikipedia.org/wiki/List_of_prematurely_reported_obituaries
-https://en.wikipedia.org/wiki/Wikipedia:Essay_directory
-https://en.wikipedia.org/wiki/Rhetorical_device
-https://en.wikipedia.org/wiki/List_of_World_Heritage_in_Danger
-https://en.wikipedia.org/wiki/UNESCO_Intangible_Cultural_Heritage_Lists
-https://en.wikipedia.org/wiki/Glossary_of_engineering:_A%E2%80%93L
-https://en.wikipedia.org/wiki/Glossary_of_engineering:_M%E2%80%93Z
-https://en.wikipedia.org/wiki/Glossary_of_computer_science
-https://en.wikipedia.org/wiki/List_of_chemical_element_name_etymologies
-https://fr.wikipedia.org/wiki/Racine_grecque
-https://en.wikipedia.org/wiki/List_of_last_words
-https://en.wikipedia.org/wiki/List_of_unusual_deaths_in_the_21st_century
-https://en.wikipedia.org/wiki/List_of_entertainers_who_died_during_a_performance
-https://en.wikipedia.org/wiki/List_of_narrative_techniques
-https://en.wikipedia.org/wiki/List_of_lost_inventions
-https://en.wikipedia.org/wiki/Greatest_Britons_spin-offs
-https://en.wikipedia.org/wiki/2025_Prayag_Maha_Kumbh_Mela
-https://en.wikipedia.org/wiki/List_of_largest_peaceful_gatherings
-https://en.wikipedia.org/wiki/List_of_most-attended_concerts
-https://en.wikipedia.org/wiki/List_of_most-attended_concert_tours
-https://en.wikipedia.org/wiki/List_of_video_games_notable_for_negative_reception
-https://en.wikipedia.org/wiki/List_of_media_notable_for_being_in_development_hell
-https://en.wikipedia.org/wiki/List_of_television_shows_notable_for_negative_reception
-https://en.wikipedia.org/wiki/Extremes_on_Earth
-https://en.wikipedia.org/wiki/Handicap_principle
-https://en.wikipedia.org/wiki/Letter_frequency
-https://en.wikipedia.org/wiki/Frequency_analysis
-https://en.wikipedia.org/wiki/English_collocations
-https://en.wikipedia.org/wiki/Zipf%27s_law
-https://en.wikipedia.org/wiki/Relevance_theory
-https://en.wikipedia.org/wiki/Four-sides_model
-https://en.wikipedia.org/wiki/Benford%27s_law
-https://en.wikipedia.org/wiki/Statelessness
-https://en.wikipedia.org/wiki/Lists_of_highest-grossing_films
-https://en.wikipedia.org/wiki/List_of_popes
-https://en.wikipedia.org/wiki/List_of_highest_mountains_on_Earth
-https://en.wikipedia.org/wiki/List_of_elected_and_appointed_female_heads_of_state_and_government
-https://en.wikipedia.org/wiki/Lists_of_etymologies
-https://fr.wikipedia.org/wiki/Confidentialit%C3%A9_diff%C3%A9rentielle
-https://fr.wikipedia.org/wiki/Avantage_comparatif
-https://en.wikipedia.org/wiki/Index_of_athletics_record_progressions
-https://en.wikipedia.org/wiki/List_of_tallest_statues
-https://en.wikipedia.org/wiki/List_of_longest_bridges
-https://en.wikipedia.org/wiki/List_of_tallest_structures_built_before_the_20th_century
-https://en.wikipedia.org/wiki/Largest_prehistoric_animals
-https://en.wikipedia.org/wiki/Square%E2%80%93cube_law
-https://en.wikipedia.org/wiki/List_of_world_records_in_chess
-https://en.wikipedia.org/wiki/Unintended_consequences
-https://en.wikipedia.org/wiki/Conflict-of-interest_editing_on_Wikipedia
-https://en.wikipedia.org/wiki/List_of_national_independence_days
-https://en.wikipedia.org/wiki/List_of_sovereign_states_by_date_of_formation
-https://en.wikipedia.org/wiki/Political_history_of_the_world
-https://en.wikipedia.org/wiki/Free-rider_problem
-https://en.wikipedia.org/wiki/Tragedy_of_the_commons
-https://en.wikipedia.org/wiki/Tragedy_of_the_anticommons
-https://en.wikipedia.org/wiki/Headline#Headlinese
-https://en.wikipedia.org/wiki/Shibboleth
-https://en.wikipedia.org/wiki/Code_word_(figure_of_speech)
-https://en.wikipedia.org/wiki/Weasel_word
-https://en.wikipedia.org/wiki/Longest_words
-https://en.wikipedia.org/wiki/Hapax_legomenon
-https://en.wikipedia.org/wiki/Longest_word_in_English
-https://en.wikipedia.org/wiki/Autogram
-https://en.wikipedia.org/wiki/List_of_natural_disasters_by_death_toll#21st_century
-https://en.wikipedia.org/wiki/List_of_the_longest_English_words_with_one_syllable
-https://en.wikipedia.org/wiki/List_of_superlatives
-https://en.wikipedia.org/wiki/Strange_loop
-https://en.wikipedia.org/wiki/List_of_visionary_tall_buildings_and_structures
-https://en.wikipedia.org/wiki/Tallest_structures_by_category
-https://en.wikipedia.org/wiki/Category:World_records
-https://en.wikipedia.org/wiki/List_of_largest_universities_and_university_networks_by_enrollment
-https://en.wikipedia.org/wiki/List_of_most_expensive_paintings
-https://en.wikipedia.org/wiki/3rd_millennium
-https://en.wikipedia.org/wiki/Timeline_of_prehistory
-https://en.wikipedia.org/wiki/Timeline_of_human_evolution
-https://en.wikipedia.org/wiki/Timeline_of_historic_inventions
-https://en.wikipedia.org/wiki/Global_catastrophe_scenarios
-https://en.wikipedia.org/wiki/List_of_accidents_and_disasters_by_death_toll
-""" # Add your list here
-
 # --- Helper Functions ---
 
 def get_pdf_render_url(wiki_url):
@@ -490,42 +184,109 @@ def download_pdf_two_step(render_url, output_path_str, headers, session):
         return False
 
 
-def merge_pdfs(pdf_files, output_path_str):
-    """Merges a list of PDF file paths into a single output PDF using PdfWriter."""
-    if not pdf_files:
-        print("[!] No valid PDF files were provided for merging.")
-        return False
+def temp_pdf_path(url, index, temp_path):
+    """Returns the temporary file an article's PDF is downloaded to."""
+    try:
+        article_name = unquote(urlparse(url).path.split('/wiki/', 1)[1]).replace('/','_')
+        safe_filename = "".join([c for c in article_name if c.isalnum() or c in (' ', '.', '_', '-')]).rstrip()
+        safe_filename = safe_filename[:100]
+    except:
+        safe_filename = f"article_{index+1}" # Fallback
+    # The index keeps names unique when titles sanitize to the same string
+    return temp_path / f"wiki_{index+1:04d}_{safe_filename}.pdf"
+
+def download_pdfs_concurrently(urls, temp_path, session, journal=None):
+    """
+    Downloads the PDF of every URL concurrently over a shared session.
 
-    writer = PdfWriter() # Use PdfWriter instead of PdfMerger
-    print(f"\n[*] Merging {len(pdf_files)} downloaded PDF files into {os.path.basename(output_path_str)}...")
-    valid_pdfs_appended = 0
+    At most MAX_CONCURRENT_DOWNLOADS run at once, at most MAX_CONCURRENT_PER_HOST
+    of them against the same host, and download starts on a host are spaced by
+    DOWNLOAD_DELAY_SECONDS. With a checkpoint journal, PDFs finished by an
+    earlier run are yielded without downloading them again, and every new
+    download is recorded as it completes.
 
-    for pdf_file in pdf_files:
-        # Basic checks before attempting to merge
-        if not os.path.exists(pdf_file):
-             print(f"   [!] Skipping merge for non-existent file: {os.path.basename(pdf_file)}")
-             continue
-        # Check file size more carefully - empty files cause errors
-        if os.path.getsize(pdf_file) == 0:
-            print(f"   [!] Skipping merge for zero-byte file: {os.path.basename(pdf_file)}")
-            continue
-        # Add a try-except block specifically for the append operation
-        try:
-             print(f"   [*] Appending: {os.path.basename(pdf_file)}")
-             # Check read permissions (less likely in Colab, but good practice)
-             if not os.access(pdf_file, os.R_OK):
-                  print(f"   [!] Skipping merge for file without read permissions: {os.path.basename(pdf_file)}")
-                  continue
-             writer.append(pdf_file) # Use writer.append()
-             valid_pdfs_appended += 1
-        except Exception as e:
-            # PdfWriter.append can raise errors on corrupted PDFs
-            print(f"   [!] Error appending file {os.path.basename(pdf_file)}: {e}.")
-            print(f"   [!] This might indicate a corrupted or malformed PDF download. Skipping this file.")
-            # Consider logging the specific error e for more details if needed
-            # print(traceback.format_exc())
+    Yields:
+        tuple: (index, pdf_path) in completion order; pdf_path is None on failure
+    """
+    host_slots = {}
+    host_slots_lock = threading.Lock()
+    rate_limiter = HostRateLimiter(1 / DOWNLOAD_DELAY_SECONDS if DOWNLOAD_DELAY_SECONDS else 1000)
+
+    def download(index, url):
+        print(f"\n[{index+1}/{len(urls)}] Processing URL: {url}")
+        render_url = get_pdf_render_url(url)
+        if not render_url:
+            return None # Skip invalid URLs
+        temp_filename_str = str(temp_pdf_path(url, index, temp_path))
+
+        host = urlparse(render_url).netloc
+        with host_slots_lock:
+            slots = host_slots.setdefault(host, threading.BoundedSemaphore(MAX_CONCURRENT_PER_HOST))
+        with slots:
+            rate_limiter.acquire(render_url)
+            ok = download_pdf_two_step(render_url, temp_filename_str, session.headers, session)
+
+        if ok:
+            if os.path.exists(temp_filename_str) and os.path.getsize(temp_filename_str) > 0:
+                if journal:
+                    journal.record(url, 'done', output=temp_filename_str)
+                return temp_filename_str
+            print(f"   [!] Download function reported success, but file is missing or empty: {temp_filename_str}")
+        else:
+            print(f"   [!] Skipping article due to download failure.")
+        if journal:
+            journal.record(url, 'failed')
+        return None
+
+    pending = []
+    for i, url in enumerate(urls):
+        entry = journal.completed(url) if journal else None
+        if entry:
+            print(f"\n[{i+1}/{len(urls)}] Already downloaded: {url}")
+            yield i, entry['output']
+        else:
+            pending.append((i, url))
 
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_DOWNLOADS) as executor:
+        futures = {executor.submit(download, i, url): i for i, url in pending}
+        for future in as_completed(futures):
+            index = futures.pop(future)
+            try:
+                yield index, future.result()
+            except Exception:
+                print(f"   [!] Unexpected error downloading {urls[index]}:")
+                print(traceback.format_exc())
+                yield index, None
+
+def _append_pdf(writer, pdf_file):
+    """Appends one downloaded PDF to the writer. Returns True if it was appended."""
+    # Basic checks before attempting to merge
+    if not os.path.exists(pdf_file):
+         print(f"   [!] Skipping merge for non-existent file: {os.path.basename(pdf_file)}")
+         return False
+    # Check file size more carefully - empty files cause errors
+    if os.path.getsize(pdf_file) == 0:
+        print(f"   [!] Skipping merge for zero-byte file: {os.path.basename(pdf_file)}")
+        return False
+    # Add a try-except block specifically for the append operation
+    try:
+         print(f"   [*] Appending: {os.path.basename(pdf_file)}")
+         # Check read permissions (less likely in Colab, but good practice)
+         if not os.access(pdf_file, os.R_OK):
+              print(f"   [!] Skipping merge for file without read permissions: {os.path.basename(pdf_file)}")
+              return False
+         writer.append(pdf_file) # Use writer.append()
+         return True
+    except Exception as e:
+        # PdfWriter.append can raise errors on corrupted PDFs
+        print(f"   [!] Error appending file {os.path.basename(pdf_file)}: {e}.")
+        print(f"   [!] This might indicate a corrupted or malformed PDF download. Skipping this file.")
+        # Consider logging the specific error e for more details if needed
+        # print(traceback.format_exc())
+        return False
 
+def _write_merged_pdf(writer, valid_pdfs_appended, output_path_str):
+    """Writes the merged PDF to disk and closes the writer."""
     if valid_pdfs_appended > 0:
         try:
             print(f"[*] Writing final merged PDF ({valid_pdfs_appended} articles)...")
@@ -551,101 +312,157 @@ def merge_pdfs(pdf_files, output_path_str):
             pass
         return False
 
+def merge_pdfs(pdf_files, output_path_str):
+    """Merges a list of PDF file paths into a single output PDF using PdfWriter."""
+    if not pdf_files:
+        print("[!] No valid PDF files were provided for merging.")
+        return False
 
-# --- Main Execution Logic ---
-print("--- Wikipedia Article PDF Downloader and Merger (Colab - Two-Step) ---")
+    writer = PdfWriter() # Use PdfWriter instead of PdfMerger
+    print(f"\n[*] Merging {len(pdf_files)} downloaded PDF files into {os.path.basename(output_path_str)}...")
+    valid_pdfs_appended = 0
 
-# Display configuration
-print(f"[*] Using User-Agent: {USER_AGENT}")
-print(f"[*] Delay between articles: {DOWNLOAD_DELAY_SECONDS} seconds")
+    for pdf_file in pdf_files:
+        if _append_pdf(writer, pdf_file):
+            valid_pdfs_appended += 1
 
-# --- Process Input URLs ---
-urls = [line.strip() for line in wiki_urls_text.strip().split('\n') if line.strip() and not line.strip().startswith('#')]
-if not urls:
-    print("\n[!] No valid URLs found in the 'wiki_urls_text' variable. Please paste URLs and re-run.")
-else:
-    print(f"[*] Found {len(urls)} URLs to process.")
+    return _write_merged_pdf(writer, valid_pdfs_appended, output_path_str)
 
-    # --- Setup Environment ---
-    temp_path = Path(TEMP_DIR)
-    output_path_str = str(OUTPUT_PDF_FILE)
-    downloaded_pdf_paths = []
-    merge_successful = False
-    # Use a session for cookie persistence across the two steps for each article
-    session = requests.Session()
-    session.headers.update({
+def download_and_merge_pdfs(urls, temp_path, output_path_str, session, journal=None):
+    """
+    Downloads all articles concurrently and merges them while the downloads are still running.
+
+    Each PDF is appended as soon as it and every article before it have arrived,
+    so the merged document keeps the input order, and its temporary file is
+    deleted right after it is appended. With a checkpoint journal the PDFs are
+    kept instead, so an interrupted run can be resumed.
+
+    Returns:
+        tuple: (downloaded_count, merge_successful)
+    """
+    writer = PdfWriter()
+    arrived = {}
+    next_index = 0
+    downloaded_count = 0
+    valid_pdfs_appended = 0
+
+    for index, pdf_path in download_pdfs_concurrently(urls, temp_path, session, journal):
+        arrived[index] = pdf_path
+        while next_index in arrived:
+            pdf_file = arrived.pop(next_index)
+            next_index += 1
+            if not pdf_file:
+                continue
+            downloaded_count += 1
+            if _append_pdf(writer, pdf_file):
+                valid_pdfs_appended += 1
+            # Release the temporary file as soon as its pages are in the writer
+            if not journal:
+                try:
+                    os.remove(pdf_file)
+                except OSError:
+                    pass
+
+    if not downloaded_count:
+        writer.close()
+        return 0, False
+    return downloaded_count, _write_merged_pdf(writer, valid_pdfs_appended, output_path_str)
+
+
+def create_session(http2=False):
+    """
+    Creates the shared client used for every download: pooled keep-alive connections
+    sized for concurrency, retries with backoff on 429/5xx, and optional HTTP/2.
+    """
+    # The client keeps cookies across the two steps for each article
+    return HttpClient({
         'User-Agent': USER_AGENT,
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,application/pdf,*/*;q=0.8',
         'Accept-Language': 'en-US,en;q=0.5',
-    })
+    }, pool_size=MAX_CONCURRENT_DOWNLOADS, http2=http2)
 
 
-    try:
-        temp_path.mkdir(exist_ok=True)
-        print(f"[*] Using temporary directory: ./{temp_path.name}")
+def colab_download_hook(output_path_str):
+    """Completion hook that offers the merged PDF as a browser download when running in Google Colab."""
+    from google.colab import files  # Only available inside Colab
+    print(f"[*] Preparing file for download...")
+    files.download(output_path_str)
+    print(f"[*] Download initiated. Check your browser.")
 
-        # --- Download Phase ---
-        for i, url in enumerate(urls):
-            print(f"\n[{i+1}/{len(urls)}] Processing URL: {url}")
-            render_url = get_pdf_render_url(url)
-            if not render_url:
-                continue # Skip invalid URLs
 
-            try:
-                article_name = unquote(urlparse(url).path.split('/wiki/', 1)[1]).replace('/','_')
-                safe_filename = "".join([c for c in article_name if c.isalnum() or c in (' ', '.', '_', '-')]).rstrip()
-                safe_filename = safe_filename[:100]
-            except:
-                safe_filename = f"article_{i+1}" # Fallback
-
-            temp_filename = temp_path / f"wiki_{safe_filename}.pdf"
-            temp_filename_str = str(temp_filename)
-
-            # Call the new two-step download function, passing the session
-            if download_pdf_two_step(render_url, temp_filename_str, session.headers, session):
-                 if os.path.exists(temp_filename_str) and os.path.getsize(temp_filename_str) > 0:
-                      downloaded_pdf_paths.append(temp_filename_str)
-                 else:
-                      print(f"   [!] Download function reported success, but file is missing or empty: {temp_filename_str}")
-            else:
-                 print(f"   [!] Skipping article due to download failure.")
+def compile_pdf(urls, output_pdf_file=OUTPUT_PDF_FILE, temp_dir=TEMP_DIR, on_complete=None, journal=None,
+                http2=False):
+    """
+    Downloads the PDF of every article and merges them into a single PDF.
+
+    Args:
+        urls (list): Wikipedia article URLs
+        output_pdf_file (str): Path of the merged PDF
+        temp_dir (str): Directory for the per-article PDFs, removed afterwards
+        on_complete (callable): Optional hook called with the output path once the merged PDF exists,
+            e.g. colab_download_hook
+        journal (CheckpointJournal): Optional checkpoint journal; the per-article PDFs are then
+            kept in its output directory until the merged PDF is written, so the run can be resumed
+        http2 (bool): Download over HTTP/2 (needs httpx[http2])
+
+    Returns:
+        bool: True if the merged PDF was written
+    """
+    # --- Setup Environment ---
+    try:
+        session = create_session(http2)
+    except ValueError as e:
+        print(f"[!] {e}")
+        return False
+    # Checkpointed PDFs live with the journal so they survive a crash
+    temp_path = journal.output_dir if journal else Path(temp_dir)
+    output_path_str = str(output_pdf_file)
+    downloaded_count = 0
+    merge_successful = False
 
-            # Delay between processing ARTICLES
-            print(f"   [*] Waiting {DOWNLOAD_DELAY_SECONDS} seconds before next article...")
-            time.sleep(DOWNLOAD_DELAY_SECONDS)
+    try:
+        temp_path.mkdir(exist_ok=True)
+        print(f"[*] Using temporary directory: ./{temp_path.name}")
 
-        # --- Merge Phase ---
-        if downloaded_pdf_paths:
-            merge_successful = merge_pdfs(downloaded_pdf_paths, output_path_str)
-        else:
+        # --- Download and Merge Phase ---
+        # PDFs are appended to the merged document while later downloads are still running
+        downloaded_count, merge_successful = download_and_merge_pdfs(urls, temp_path, output_path_str, session, journal)
+        if not downloaded_count:
              print("\n[!] No articles were successfully downloaded. Skipping merge.")
 
 
-        # --- Colab Download Trigger ---
+        # --- Completion Hook ---
         if merge_successful and os.path.exists(output_path_str):
              final_size = os.path.getsize(output_path_str)
-             print(f"\n[*] Final merged PDF '{OUTPUT_PDF_FILE}' created ({final_size // 1024} KB).")
-             print(f"[*] Preparing file for download...")
-             try:
-                 files.download(output_path_str)
-                 print(f"[*] Download initiated. Check your browser.")
-             except Exception as e:
-                  print(f"[!] Error triggering download: {e}. Manual download might be needed.")
-
-        elif not downloaded_pdf_paths:
+             print(f"\n[*] Final merged PDF '{output_pdf_file}' created ({final_size // 1024} KB).")
+             if on_complete:
+                 try:
+                     on_complete(output_path_str)
+                 except Exception as e:
+                      print(f"[!] Error triggering download: {e}. Manual download might be needed.")
+
+        elif not downloaded_count:
              print("\n[*] No file generated as no articles were downloaded.")
         else: # Merge failed
-             print(f"\n[!] Merging failed or produced no output file. Cannot download {OUTPUT_PDF_FILE}.")
+             print(f"\n[!] Merging failed or produced no output file: {output_pdf_file}.")
 
 
     except Exception as e:
-        print(f"\n[!!!] An unexpected error occurred during the main script execution: {e}")
+        print(f"\n[!!!] An unexpected error occurred during the PDF compilation: {e}")
         print(traceback.format_exc())
     finally:
         # Close the session
         session.close()
         # --- Cleanup Phase ---
-        if temp_path.exists():
+        if journal:
+            # Keep the checkpoint unless the merged PDF is complete
+            if merge_successful:
+                print(f"\n[*] Removing checkpoint: {journal.path.name}")
+                journal.discard()
+            else:
+                journal.close()
+                print(f"\n[*] Downloads kept in ./{temp_path.name}; run again with --resume to continue.")
+        elif temp_path.exists():
             try:
                 print(f"\n[*] Cleaning up temporary directory: ./{temp_path.name}")
                 shutil.rmtree(temp_path)
@@ -653,4 +470,61 @@ else:
             except Exception as e:
                 print(f"[!] Warning: Error during cleanup: {e}")
 
-print("\n--- Script execution finished ---")
\ No newline at end of file
+    return merge_successful
+
+
+def parse_args(argv=None):
+    """Parses command-line options for the PDF downloader."""
+    parser = argparse.ArgumentParser(description="Download Wikipedia articles as PDFs and merge them into one file.")
+    parser.add_argument('input', nargs='?', default=INPUT_URL_FILE,
+                        help=f"file with one Wikipedia URL per line (default: {INPUT_URL_FILE})")
+    parser.add_argument('-o', '--output', default=OUTPUT_PDF_FILE,
+                        help=f"merged PDF to write (default: {OUTPUT_PDF_FILE})")
+    parser.add_argument('--temp-dir', default=TEMP_DIR,
+                        help=f"directory for the per-article PDFs (default: {TEMP_DIR})")
+    parser.add_argument('--checkpoint', action='store_true',
+                        help="record every download in a journal and keep the PDFs until the merge, so an "
+                             "interrupted run can continue with --resume")
+    parser.add_argument('--resume', action='store_true',
+                        help="continue an interrupted --checkpoint run, reusing the PDFs it already downloaded "
+                             "(implies --checkpoint)")
+    parser.add_argument('--http2', action='store_true',
+                        help="download over HTTP/2 with multiplexed connections (needs httpx[http2])")
+    parser.add_argument('--colab-download', action='store_true',
+                        help="offer the merged PDF as a browser download (Google Colab only)")
+    return parser.parse_args(argv)
+
+
+# --- Main Execution Logic ---
+def main(argv=None):
+    """Entry point: reads the URL list and compiles the merged PDF."""
+    from main import load_wikipedia_urls
+
+    args = parse_args(argv)
+    print("--- Wikipedia Article PDF Downloader and Merger (Two-Step) ---")
+
+    # Display configuration
+    print(f"[*] Using User-Agent: {USER_AGENT}")
+    print(f"[*] Concurrent downloads: {MAX_CONCURRENT_DOWNLOADS} ({MAX_CONCURRENT_PER_HOST} per host, {DOWNLOAD_DELAY_SECONDS}s between starts)")
+
+    # --- Process Input URLs ---
+    urls = load_wikipedia_urls(args.input)
+    if not urls:
+        print(f"\n[!] No valid URLs found in {args.input}.")
+        sys.exit(1)
+    print(f"[*] Found {len(urls)} URLs to process.")
+
+    on_complete = colab_download_hook if args.colab_download else None
+    # Checkpointing keeps every PDF until the merge; without it each one is deleted once appended
+    journal = None
+    if args.checkpoint or args.resume:
+        journal = CheckpointJournal.for_output(args.output, resume=args.resume)
+    success = compile_pdf(urls, args.output, args.temp_dir, on_complete, journal, args.http2)
+
+    print("\n--- Script execution finished ---")
+    if not success:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,246 @@
 #!/usr/bin/env python3
 
-import requests
+import hashlib
 import time
 import re
-from bs4 import BeautifulSoup, Comment
-from ebooklib import epub
-from urllib.parse import urlparse, urljoin
+from urllib.parse import urlparse, urljoin, quote
 import os
+import zipfile
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import nullcontext
+from functools import lru_cache
+from wiki_http import HostRateLimiter, HttpClient, REQUESTS_PER_SECOND_PER_HOST, REQUEST_BURST
+from wiki_cache import OfflineCacheMiss
+from wiki_chapter_store import extract_revision_id
+from wiki_epub_writer import StreamingEpubWriter
+from wiki_epub_template import ChapterTemplate, chapter_file_name, minify_css, escape, quoteattr
+from wiki_epub_zip import ZipArchiveWriter
+from wiki_lazy import lazy_import
+import wiki_api
+
+# The heavy dependencies load when the stage that needs them first runs
+requests = lazy_import('requests')
+bs4 = lazy_import('bs4')
+epub = lazy_import('ebooklib.epub')
 
 # Respectful User-Agent string for Wikipedia requests
 USER_AGENT = 'WikipediaEpubCompiler/1.0 (Educational use; contact: user@example.com)'
-REQUEST_DELAY_SECONDS = 1.5
+# Sent with every request by the shared HttpClient; connections are kept alive by its pool
+REQUEST_HEADERS = {
+    'User-Agent': USER_AGENT,
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate',
+}
+# Number of articles downloaded and cleaned at the same time
+DEFAULT_FETCH_WORKERS = 4
+# Processes parsing and cleaning articles; 0 cleans in the fetch threads
+DEFAULT_CLEAN_WORKERS = 0
+# Articles queued, being processed or waiting for their turn in the book, per worker
+IN_FLIGHT_PER_WORKER = 4
+
+# How articles are retrieved: scraping rendered pages, or the MediaWiki Action API
+FETCH_BACKENDS = ('html', 'api')
+DEFAULT_FETCH_BACKEND = 'html'
+
+# HTML parser backends: BeautifulSoup's pure-Python parser, lxml, or selectolax (lexbor)
+PARSER_BACKENDS = ('html.parser', 'lxml', 'selectolax')
+DEFAULT_PARSER_BACKEND = 'html.parser'
+
+# Only the title heading and the article body are needed from a rendered page
+_ARTICLE_PARTS_CLASS = re.compile(r'(?:^|\s)(?:firstHeading|mw-parser-output)(?:\s|$)')
+# Start of the article body and the <div> tags (or comments) after it, in raw page bytes
+_ARTICLE_BODY_START_PATTERN = re.compile(rb'<div\b[^>]*\bclass=["\'](?:[^"\']*\s)?mw-parser-output[\s"\']', re.I)
+_DIV_TAG_PATTERN = re.compile(rb'<!--.*?-->|<(/?)div\b', re.I | re.S)
+
+_default_client = None
+
+def default_http_client():
+    """Returns the HttpClient shared by downloads that were not given a client of their own."""
+    global _default_client
+    if _default_client is None:
+        _default_client = HttpClient(REQUEST_HEADERS)
+    return _default_client
+
+def download_article_html(url, rate_limiter=None, cache=None, client=None):
+    """
+    Downloads the raw HTML of a Wikipedia page, going through the disk cache when one is given.
+    
+    Fresh cache entries are served without touching the network. Stale entries are
+    revalidated with If-None-Match / If-Modified-Since so a 304 skips the body transfer.
+    
+    Args:
+        url (str): The Wikipedia article URL to fetch
+        rate_limiter (HostRateLimiter): Optional per-host limiter to wait on before requesting
+        cache (HttpCache): Optional persistent HTTP cache
+        client (HttpClient): Shared HTTP client, defaults to default_http_client()
+        
+    Returns:
+        bytes: Raw HTML of the page
+        
+    Raises:
+        requests.RequestException: If the download fails
+        OfflineCacheMiss: If the cache is offline and has no entry for the URL
+    """
+    entry = cache.lookup(url) if cache else None
+    if entry and (entry.fresh or cache.offline):
+        print(f"   [*] Using cached copy: {url}")
+        return entry.body
+    if cache and cache.offline:
+        raise OfflineCacheMiss(f"{url} is not cached (offline mode)")
+    
+    print(f"   [*] Fetching: {url}")
+    
+    # The client already sends REQUEST_HEADERS; only revalidation headers vary per request
+    headers = entry.conditional_headers() if entry else None
+    client = client or default_http_client()
+    response = client.get(url, headers=headers, rate_limiter=rate_limiter)
+    if entry and response.status_code == 304:
+        print(f"   [*] Not modified, reusing cached copy: {url}")
+        cache.mark_revalidated(url)
+        return entry.body
+    response.raise_for_status()
+    
+    if cache:
+        cache.store(url, response.content, response.headers)
+    return response.content
+
+def _available_tree_builder():
+    """Returns the fastest BeautifulSoup tree builder that is installed."""
+    try:
+        import lxml  # noqa: F401
+        return 'lxml'
+    except ImportError:
+        return 'html.parser'
+
+@lru_cache(maxsize=1)
+def _article_parts():
+    return bs4.SoupStrainer(['h1', 'div'], class_=_ARTICLE_PARTS_CLASS)
+
+def _parse_with_beautifulsoup(html, features, body_only):
+    parse_only = _article_parts() if body_only else None
+    soup = bs4.BeautifulSoup(html, features, parse_only=parse_only)
+    
+    # Get the article title from the main heading
+    title_element = soup.find('h1', {'class': 'firstHeading'})
+    article_title = title_element.get_text().strip() if title_element else "Untitled Article"
+    return article_title, soup
+
+def article_body_span(html):
+    """
+    Returns the (start, end) byte offsets of the mw-parser-output div in a page,
+    found by matching its <div> tags, or None if the page has no article body.
+    """
+    body = _ARTICLE_BODY_START_PATTERN.search(html)
+    if not body:
+        return None
+    depth = 0
+    for tag in _DIV_TAG_PATTERN.finditer(html, body.start()):
+        if tag.group(1) is None:  # A comment, whose content is not markup
+            continue
+        depth += -1 if tag.group(1) else 1
+        if depth == 0:
+            end = html.find(b'>', tag.end())
+            return body.start(), len(html) if end < 0 else end + 1
+    return body.start(), len(html)
+
+def _parse_with_selectolax(html):
+    """
+    Reads the title from the page chrome with selectolax's lexbor engine and builds a
+    BeautifulSoup tree of the article body only, so the cleaning rules see the same tree.
+    
+    The body is cut out of the original bytes rather than re-serialized by lexbor,
+    whose HTML5 tree construction rewrites markup (e.g. it adds <tbody> to every
+    table), and each part of the page is parsed only once.
+    """
+    from selectolax.lexbor import LexborHTMLParser
+    
+    if isinstance(html, str):
+        html, encoding = html.encode('utf-8'), 'utf-8'
+    else:
+        encoding = None
+    span = article_body_span(html)
+    chrome, body_html = (html[:span[0]], html[span[0]:span[1]]) if span else (html, b'')
+    # The body alone lacks the page's <meta charset>, so it is decoded with the page's encoding
+    encoding = encoding or bs4.dammit.EncodingDetector.find_declared_encoding(chrome, is_html=True) or 'utf-8'
+    
+    title_node = LexborHTMLParser(chrome).css_first('h1.firstHeading')
+    article_title = title_node.text().strip() if title_node else "Untitled Article"
+    return article_title, bs4.BeautifulSoup(body_html, _available_tree_builder(), from_encoding=encoding)
+
+def check_parser_backend(parser):
+    """
+    Verifies that a parser backend exists and its package is installed.
+    
+    Args:
+        parser (str): Parser backend name
+        
+    Raises:
+        ValueError: If the parser backend is unknown or not installed
+    """
+    if parser not in PARSER_BACKENDS:
+        raise ValueError(f"unknown parser backend '{parser}', expected one of: {', '.join(PARSER_BACKENDS)}")
+    if parser == 'html.parser':
+        return
+    
+    module = 'lxml' if parser == 'lxml' else 'selectolax.lexbor'
+    try:
+        __import__(module)
+    except ImportError:
+        raise ValueError(f"the '{parser}' parser backend needs the {parser} package (pip install {parser})")
+
+def check_volume_limits(volume_max_bytes=None, volume_max_chapters=None):
+    """
+    Verifies that the volume limits of a split compilation, where set, are positive.
+    
+    Raises:
+        ValueError: If a limit is zero or negative
+    """
+    for name, value in (('volume_max_bytes', volume_max_bytes), ('volume_max_chapters', volume_max_chapters)):
+        if value is not None and value <= 0:
+            raise ValueError(f"{name} must be positive, not {value}")
 
-def fetch_wikipedia_content(url):
+def parse_article_html(html, parser=DEFAULT_PARSER_BACKEND, body_only=False):
+    """
+    Parses a downloaded Wikipedia page and reads its title.
+    
+    Every backend hands the cleaning stage a BeautifulSoup tree built from the
+    page's own markup, so clean_article_content produces the same output whichever
+    one is used (tests/test_parser_backends.py checks this). Only badly malformed
+    markup may be repaired differently by html.parser and lxml; selectolax builds
+    the body's tree with lxml when it is installed.
+    
+    Args:
+        html (bytes): Raw HTML of the page
+        parser (str): Parser backend, one of PARSER_BACKENDS
+        body_only (bool): Only build the tree for the title heading and the
+            mw-parser-output article body, skipping the page chrome
+            (the selectolax backend always does this)
+        
+    Returns:
+        tuple: (article_title, BeautifulSoup_object)
+        
+    Raises:
+        ValueError: If the parser backend is unknown or not installed
+    """
+    check_parser_backend(parser)
+    if parser == 'selectolax':
+        return _parse_with_selectolax(html)
+    return _parse_with_beautifulsoup(html, parser, body_only)
+
+def fetch_wikipedia_content(url, rate_limiter=None, cache=None, parser=DEFAULT_PARSER_BACKEND,
+                            body_only=False, client=None):
     """
     Downloads and parses a Wikipedia article's HTML content.
     
     Args:
         url (str): The Wikipedia article URL to fetch
+        rate_limiter (HostRateLimiter): Optional per-host limiter to wait on before requesting
+        cache (HttpCache): Optional persistent HTTP cache
+        parser (str): Parser backend, one of PARSER_BACKENDS
+        body_only (bool): Only parse the title heading and article body
+        client (HttpClient): Shared HTTP client, defaults to default_http_client()
         
     Returns:
         tuple: (article_title, BeautifulSoup_object) on success, (None, None) on failure
@@ -27,25 +249,9 @@ def fetch_wikipedia_content(url):
         url = url.strip()
         if not url:
             return None, None
-            
-        print(f"   [*] Fetching: {url}")
-        
-        headers = {
-            'User-Agent': USER_AGENT,
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Accept-Encoding': 'gzip, deflate',
-            'Connection': 'keep-alive',
-        }
-        
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
         
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Get the article title from the main heading
-        title_element = soup.find('h1', {'class': 'firstHeading'})
-        article_title = title_element.get_text().strip() if title_element else "Untitled Article"
+        html = download_article_html(url, rate_limiter, cache, client)
+        article_title, soup = parse_article_html(html, parser, body_only)
         
         print(f"   [+] Successfully fetched: {article_title}")
         return article_title, soup
@@ -53,17 +259,195 @@ def fetch_wikipedia_content(url):
     except requests.RequestException as e:
         print(f"   [!] Failed to fetch {url}: {e}")
         return None, None
+    except OfflineCacheMiss as e:
+        print(f"   [!] Failed to fetch {e}")
+        return None, None
     except Exception as e:
         print(f"   [!] Error processing {url}: {e}")
         return None, None
 
-def clean_article_content(soup):
+# Sections that add clutter to the e-reader experience (matched case-insensitively)
+UNWANTED_SECTIONS = frozenset(name.lower() for name in [
+    'References', 'Bibliography', 'External links', 'See also',
+    'Further reading', 'Sources', 'Notes', 'Footnotes',
+    'External sources', 'Works cited', 'Citations'
+])
+
+# Elements whose text BeautifulSoup writes out unescaped, which would break the chapter's XHTML,
+# e.g. the <style> blocks of MediaWiki TemplateStyles; the book has its own stylesheet
+UNWANTED_TAGS = frozenset(['style', 'script'])
+
+# Wikipedia's navigation and metadata elements, removed wherever they appear
+UNWANTED_CLASSES = frozenset([
+    'navbox',           # Navigation boxes
+    # 'infobox',          # Info boxes - actually useful for context
+    'ambox',            # Article message boxes
+    'hatnote',          # Disambiguation notes
+    'sistersitebox',    # Sister project boxes
+    'metadata',         # Metadata
+    'printfooter',      # Print footer
+    'catlinks',         # Category links
+    'mw-editsection',   # Edit section links
+    'reference',        # Individual reference links and superscripts
+    'mw-cite-backlink', # Citation backlinks
+    'portal',           # Portal boxes
+    'navframe',         # Collapsible navigation frames
+    'collapsible',      # Other collapsible content
+    'stub',             # Stub notices
+    'reflist',          # References list containers
+    'refbegin',         # Reference begin containers
+    'references',       # References containers
+    'cs1',              # CS1 citation format
+    'citation',         # General and <cite> citations
+])
+
+# Classes that mark a list item's child as pure citation content
+_CITATION_CLASSES = frozenset(['citation', 'cs1', 'reference'])
+_HEADING_LEVELS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 4, 'h5': 5, 'h6': 6}
+
+def _heading_of(element):
+    """
+    Returns the heading tag an element represents: either an <hN> itself or the
+    <div class="mw-heading"> wrapper current Wikipedia markup puts around it.
+    """
+    if element.name in _HEADING_LEVELS:
+        return element
+    if element.name == 'div' and 'mw-heading' in element.get('class', ()):
+        for child in element.children:
+            if getattr(child, 'name', None) in _HEADING_LEVELS:
+                return child
+    return None
+
+def _is_citation_only(li):
+    """Checks whether a list item is just a leftover reference entry."""
+    for child in li.children:
+        if isinstance(child, bs4.Tag):
+            classes = child.get('class')
+            if child.name not in ('cite', 'span') or not classes or _CITATION_CLASSES.isdisjoint(classes):
+                return False
+        elif child.strip():
+            return False
+    return True
+
+def _clean_children(tag, keep_images=False):
+    """
+    Applies every cleaning rule to the children of `tag` in one depth-first pass.
+    
+    Removal rules are checked on the way down so discarded subtrees are never
+    visited; rules that depend on what is left of an element (empty paragraphs,
+    citation-only list items, [n] markers) are checked on the way back up.
+    """
+    skip_level = None
+    
+    for child in list(tag.children):
+        if not isinstance(child, bs4.Tag):
+            if isinstance(child, bs4.Comment):
+                child.extract()
+            continue
+        
+        heading = _heading_of(child)
+        level = _HEADING_LEVELS[heading.name] if heading is not None else None
+        
+        # Inside an unwanted section: drop everything until the next major heading
+        if skip_level is not None:
+            if level is None or level > skip_level:
+                child.decompose()
+                continue
+            skip_level = None
+        
+        if heading is not None and heading.get_text().strip().lower() in UNWANTED_SECTIONS:
+            skip_level = level
+            child.decompose()
+            continue
+        
+        name = child.name
+        classes = child.get('class')
+        if name in UNWANTED_TAGS or (classes and not UNWANTED_CLASSES.isdisjoint(classes)):
+            child.decompose()
+            continue
+        
+        if name == 'img':
+            # Images are only kept when an ImagePipeline embeds them into the book
+            if not keep_images:
+                child.decompose()
+            continue
+        if name == 'a':
+            # Make Wikipedia links absolute for better EPUB compatibility
+            href = child.get('href')
+            if href and href.startswith('/wiki/'):
+                child['href'] = 'https://en.wikipedia.org' + href
+        
+        _clean_children(child, keep_images)
+        
+        if name == 'sup':
+            # Clean up inline citation markers like [1], [2]
+            text = child.get_text().strip()
+            if text.startswith('[') and text.endswith(']'):
+                child.decompose()
+        elif name == 'p':
+            # Remove paragraphs that became empty after cleaning
+            if not child.get_text().strip() and not (keep_images and child.find('img')):
+                child.decompose()
+        elif name == 'li':
+            # Clean up stray reference entries that escaped the section removal
+            if _is_citation_only(child):
+                child.decompose()
+
+def _heading_anchor(heading):
+    """Returns the #anchor of a heading: its own id, or that of its mw-headline span in older markup."""
+    if heading.get('id'):
+        return heading['id']
+    headline = heading.find('span', class_='mw-headline')
+    return headline.get('id') if headline else None
+
+def extract_section(soup, anchor):
+    """
+    Reduces a parsed article to the section a #fragment points to: the section's
+    heading and everything up to the next heading of the same or a higher level.
+    
+    Args:
+        soup (BeautifulSoup): Parsed HTML of the article, modified in place
+        anchor (str): Section anchor, e.g. 'Naming_disputes'
+        
+    Returns:
+        str: Text of the section heading, or None if the article has no such
+            section (the article is then left whole)
+    """
+    content_div = soup.find('div', {'class': 'mw-parser-output'}) if soup else None
+    if not content_div:
+        return None
+    
+    children = list(content_div.children)
+    start = end = None
+    for position, child in enumerate(children):
+        heading = _heading_of(child) if isinstance(child, bs4.Tag) else None
+        if heading is None:
+            continue
+        if start is None:
+            if _heading_anchor(heading) == anchor:
+                start, level, section_title = position, _HEADING_LEVELS[heading.name], heading.get_text().strip()
+        elif _HEADING_LEVELS[heading.name] <= level:
+            end = position
+            break
+    if start is None:
+        return None
+    
+    for child in children[:start] + (children[end:] if end is not None else []):
+        child.extract()
+    return section_title
+
+def clean_article_content(soup, keep_images=False):
     """
     Cleans Wikipedia HTML by removing references, navigation elements, and other clutter
     that interferes with a clean reading experience on e-readers.
     
+    All rules are applied in a single traversal of the article body. The body is
+    detached from `soup` and cleaned in place, and both are destroyed afterwards,
+    so the soup must not be used again.
+    
     Args:
         soup (BeautifulSoup): Parsed HTML of the Wikipedia article
+        keep_images (bool): Keep <img> tags for an ImagePipeline to embed
         
     Returns:
         str: Cleaned HTML content suitable for EPUB generation
@@ -77,157 +461,373 @@ def clean_article_content(soup):
         print("   [!] Could not find main content area")
         return ""
     
-    # Work with a copy to preserve the original soup object
-    content = BeautifulSoup(str(content_div), 'html.parser')
-    
-    # Target sections that add clutter to e-reader experience
-    unwanted_sections = [
-        'References', 'Bibliography', 'External links', 'See also', 
-        'Further reading', 'Sources', 'Notes', 'Footnotes',
-        'External sources', 'Works cited', 'Citations'
-    ]
-    
-    for section_name in unwanted_sections:
-        # Scan for headings matching our cleanup list
-        for heading in content.find_all(['h2', 'h3', 'h4', 'h5', 'h6']):
-            if heading.get_text().strip().lower() == section_name.lower():
-                # Remove this section and all content until the next major heading
-                current_level = int(heading.name[1])  # h2=2, h3=3, etc.
-                elements_to_remove = [heading]
-                
-                # Gather everything in this section for removal
-                element = heading.find_next_sibling()
-                while element:
-                    # Stop when we hit the next major section
-                    if (element.name in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6'] 
-                        and int(element.name[1]) <= current_level):
-                        break
-                    
-                    elements_to_remove.append(element)
-                    element = element.find_next_sibling()
-                
-                # Clean out the entire section
-                for elem in elements_to_remove:
-                    if elem.parent:
-                        elem.extract()
-                break
-    
-    # Strip out Wikipedia's navigation and metadata elements
-    unwanted_selectors = [
-        '.navbox',           # Navigation boxes
-        # '.infobox',          # Info boxes - actually useful for context
-        '.ambox',            # Article message boxes
-        '.hatnote',          # Disambiguation notes
-        '.sistersitebox',    # Sister project boxes
-        '.metadata',         # Metadata
-        '.printfooter',      # Print footer
-        '.catlinks',         # Category links
-        '.mw-editsection',   # Edit section links
-        '.reference',        # Individual reference links
-        '.mw-cite-backlink', # Citation backlinks
-        'sup.reference',     # Reference superscripts
-        '.portal',           # Portal boxes
-        '.navframe',         # Collapsible navigation frames
-        '.collapsible',      # Other collapsible content
-        '.stub',             # Stub notices
-        '.reflist',          # References list containers
-        '.refbegin',         # Reference begin containers
-        '.references',       # References containers
-        'cite.citation',     # Citation elements
-        '.cs1',              # CS1 citation format
-        '.citation',         # General citations
-    ]
-    
-    for selector in unwanted_selectors:
-        for element in content.select(selector):
-            element.extract()
-    
-    # Clean up stray reference entries that escaped the section removal
-    for li in content.find_all('li'):
-        # Check if this list item is just a leftover reference
-        non_cite_content = []
-        for child in li.children:
-            if hasattr(child, 'name'):
-                if child.name not in ['cite', 'span'] or not child.get('class') or not any(cls in ['citation', 'cs1', 'reference'] for cls in child.get('class', [])):
-                    non_cite_content.append(child)
-            elif isinstance(child, str) and child.strip():
-                non_cite_content.append(child)
+    # bs4 trees are reference cycles that only the garbage collector would free,
+    # so the page chrome and then the body are torn down as soon as they are done with
+    content = content_div.extract()
+    soup.decompose()
+    _clean_children(content, keep_images)
+    cleaned = str(content)
+    content.decompose()
+    return cleaned
+
+# Book metadata shown by e-readers
+BOOK_TITLE = 'Wikipedia Article Compilation'
+BOOK_AUTHOR = 'Wikipedia Contributors'
+BOOK_LANGUAGE = 'en'
+# Last chapter of every volume of a split compilation
+VOLUME_INDEX_TITLE = 'Index of All Volumes'
+
+# Styling for clean, readable text on e-readers
+EPUB_STYLESHEET = '''
+body {
+    font-family: serif;
+    line-height: 1.6;
+    margin: 2em;
+}
+h1, h2, h3, h4, h5, h6 {
+    color: #333;
+    margin-top: 2em;
+    margin-bottom: 1em;
+}
+p {
+    margin-bottom: 1em;
+    text-align: justify;
+}
+img {
+    max-width: 100%;
+    height: auto;
+}
+figure {
+    margin: 1em 0;
+    text-align: center;
+}
+figcaption {
+    font-size: 0.9em;
+}
+.infobox {
+    border: 1px solid #ccc;
+    background-color: #f9f9f9;
+    float: right;
+    margin: 0 0 1em 1em;
+    padding: 0.5em;
+    width: 300px;
+}
+'''
+
+# The one stylesheet of the book, minified once; every chapter links to it
+STYLESHEET_FILE = 'style/book.css'
+_STYLESHEET_CONTENT = minify_css(EPUB_STYLESHEET).encode('utf-8')
+# Chapter skeleton, compiled once for all chapters of every book
+_CHAPTER_TEMPLATE = ChapterTemplate(STYLESHEET_FILE, BOOK_LANGUAGE)
+
+def _stylesheet_item():
+    """Returns the EPUB item for the stylesheet every chapter links to."""
+    return epub.EpubItem(
+        uid="book_css",
+        file_name=STYLESHEET_FILE,
+        media_type="text/css",
+        content=_STYLESHEET_CONTENT
+    )
+
+def create_epub_chapter(title, content, chapter_id):
+    """
+    Converts cleaned Wikipedia content into a properly formatted EPUB chapter.
+    
+    Args:
+        title (str): Article title for the chapter
+        content (str or bytes): Cleaned HTML content, bytes in UTF-8
+        chapter_id (int): Sequential chapter number
         
-        # Remove if it's purely citation content
-        if not non_cite_content:
-            li.extract()
+    Returns:
+        epub.EpubItem: Ready-to-add XHTML document holding the rendered bytes, so
+            ebooklib writes it without parsing it again
+    """
+    file_name, xhtml = render_epub_chapter(title, content, chapter_id)
+    return epub.EpubItem(
+        uid=f"chapter_{chapter_id}",
+        file_name=file_name,
+        media_type="application/xhtml+xml",
+        content=xhtml
+    )
+
+def render_epub_chapter(title, content, chapter_id):
+    """
+    Renders a chapter straight to its final XHTML bytes with the precompiled chapter template.
     
-    # Strip HTML comments
-    for comment in content.find_all(string=lambda text: isinstance(text, Comment)):
-        comment.extract()
+    Args:
+        title (str): Article title for the chapter
+        content (str or bytes): Cleaned HTML content, bytes in UTF-8
+        chapter_id (int): Sequential chapter number
+        
+    Returns:
+        tuple: (file_name, xhtml_bytes)
+    """
+    return chapter_file_name(chapter_id, title), _CHAPTER_TEMPLATE.render(title, content)
+
+def clean_article_html(html, parser=DEFAULT_PARSER_BACKEND, body_only=False, measure=False, section=None,
+                       title=None, keep_images=False):
+    """
+    Parses a downloaded page and cleans it, as one self-contained step.
     
-    # Clean up inline citation markers like [1], [2]
-    for element in content.find_all('sup'):
-        if element.get_text().strip().startswith('[') and element.get_text().strip().endswith(']'):
-            element.extract()
+    This is what the cleaning processes run: it takes the raw page rather than a
+    parsed tree, so only bytes go to the worker and only a string comes back.
     
-    # Remove paragraphs that became empty after cleaning
-    for p in content.find_all('p'):
-        if not p.get_text().strip():
-            p.extract()
+    Args:
+        html (bytes or str): Raw HTML of the page or of its article body
+        parser (str): Parser backend, one of PARSER_BACKENDS
+        body_only (bool): Only parse the title heading and article body
+        measure (bool): Also time the parse and clean steps and count the parsed elements
+        section (str): Only keep the section with this anchor; the title then names
+            the section as well, like "Geographical renaming: Naming disputes"
+        title (str): Article title to use instead of the page's heading, e.g. the one
+            reported by the API
+        keep_images (bool): Keep <img> tags for an ImagePipeline to embed
+        
+    Returns:
+        tuple: (article_title, cleaned_content, stats), where cleaned_content is None if
+            the page has no `section`, and stats is None unless `measure` is set, else
+            {'parse': seconds, 'clean': seconds, 'dom_nodes': count}
+    """
+    start = time.perf_counter()
+    page_title, soup = parse_article_html(html, parser, body_only)
+    title = title or page_title
+    if section:
+        section_title = extract_section(soup, section)
+        if not section_title:
+            # The whole article instead could repeat a chapter the book already has
+            print(f"   [!] Section #{section} not found in {title}, leaving it out")
+            return title, None, None
+        title = f"{title}: {section_title}"
+    parsed = time.perf_counter()
+    stats = None
+    if measure:
+        stats = {'dom_nodes': len(soup.find_all(True))}
+        parsed = time.perf_counter()
+    cleaned_content = clean_article_content(soup, keep_images)
+    if measure:
+        stats['parse'] = parsed - start
+        stats['clean'] = time.perf_counter() - parsed
+    return title, cleaned_content, stats
+
+def _timed(metrics, stage, article):
+    """Times a pipeline stage when metrics are being collected."""
+    return metrics.stage(stage, article) if metrics else nullcontext()
+
+class ArticleRecord:
+    """
+    One processed article on its way from a fetch worker into the book.
+    
+    Hundreds of these can be alive at once, so the record uses slots instead of
+    a per-instance dict and keeps the cleaned chapter as UTF-8 bytes, the form
+    it is written into the book in, rather than as a str that can take up to
+    four bytes per character.
+    
+    Args:
+        url (str): Canonical article URL
+        title (str): Chapter title
+        content (str or bytes): Cleaned HTML of the chapter
+        revision (int): Revision ID the chapter was built from, None if unknown
+        raw_size (int): Bytes downloaded for the article, 0 if it came from a store or checkpoint
+        seconds (float): Time spent fetching and cleaning the article
+    """
+    
+    __slots__ = ('url', 'title', 'content', 'revision', 'raw_size', 'seconds')
     
-    # Remove images since they don't embed properly in EPUB
-    for img in content.find_all('img'):
-        img.extract()
+    def __init__(self, url, title, content, revision=None, raw_size=0, seconds=0.0):
+        self.url = url
+        self.title = title
+        self.content = content.encode('utf-8') if isinstance(content, str) else content
+        self.revision = revision
+        self.raw_size = raw_size
+        self.seconds = seconds
     
-    # Make Wikipedia links absolute for better EPUB compatibility
-    for link in content.find_all('a'):
-        href = link.get('href')
-        if href and href.startswith('/wiki/'):
-            link['href'] = 'https://en.wikipedia.org' + href
+    @property
+    def text(self):
+        """The cleaned chapter as a str."""
+        return self.content.decode('utf-8')
     
-    return str(content)
+    @property
+    def size(self):
+        return len(self.content)
+    
+    def __repr__(self):
+        return f"ArticleRecord({self.title!r}, {self.size} bytes)"
 
-def create_epub_chapter(title, content, chapter_id):
+def volume_filename(output_filename, number):
+    """Returns the file name of one volume of a split compilation, e.g. wiki_compilation_vol2.epub."""
+    base, extension = os.path.splitext(output_filename)
+    return f"{base}_vol{number}{extension}"
+
+def _volume_title(number, count):
+    return f"{BOOK_TITLE}, Volume {number} of {count}"
+
+def _volume_index_content(volume_titles, volume, chapter_files):
     """
-    Converts cleaned Wikipedia content into a properly formatted EPUB chapter.
+    Builds the cross-volume index that ends every volume of a split compilation.
     
     Args:
-        title (str): Article title for the chapter
-        content (str): Cleaned HTML content
-        chapter_id (int): Sequential chapter number
+        volume_titles (list): Chapter titles of every volume, one list per volume
+        volume (int): 1-based number of the volume the index goes into
+        chapter_files (list): Chapter file names of that volume, to link its own entries
         
     Returns:
-        epub.EpubHtml: Ready-to-add EPUB chapter object
+        str: HTML content of the index chapter
+    """
+    parts = []
+    for number, titles in enumerate(volume_titles, 1):
+        heading = f"Volume {number} (this volume)" if number == volume else f"Volume {number}"
+        parts.append(f'<h2>{heading}</h2><ul>')
+        for position, title in enumerate(titles):
+            if number == volume:
+                parts.append(f'<li><a href={quoteattr(chapter_files[position])}>{escape(title)}</a></li>')
+            else:
+                parts.append(f'<li>{escape(title)}</li>')
+        parts.append('</ul>')
+    return ''.join(parts)
+
+class _VolumeBudget:
+    """
+    Tracks how full the current volume is, by chapter count and by the bytes of its
+    chapters and of the images they embed (each image counted once per volume).
     """
-    # Sanitize title to create a valid filename
-    safe_title = re.sub(r'[^\w\s-]', '', title).strip()
-    safe_title = re.sub(r'[-\s]+', '_', safe_title)
     
-    chapter = epub.EpubHtml(
-        title=title,
-        file_name=f'chapter_{chapter_id}_{safe_title}.xhtml',
-        lang='en'
-    )
+    def __init__(self, max_bytes=None, max_chapters=None, images=None):
+        self.max_bytes = max_bytes
+        self.max_chapters = max_chapters
+        self.images = images
+        self.start_volume()
+    
+    def start_volume(self):
+        self.size = 0
+        self.chapters = 0
+        self.image_names = set()
+    
+    def fits(self, article):
+        """Returns True if an ArticleRecord still fits into the current volume; an empty volume takes any."""
+        if self.chapters == 0:
+            return True
+        if self.max_chapters and self.chapters >= self.max_chapters:
+            return False
+        return not self.max_bytes or self.size + self._size(article) <= self.max_bytes
+    
+    def add(self, article):
+        self.size += self._size(article)
+        self.chapters += 1
+        if self.images:
+            self.image_names.update(self.images.referenced(article.text))
+    
+    def _size(self, article):
+        size = article.size
+        if self.images:
+            size += sum(self.images.file_size(file_name) for file_name in self.images.referenced(article.text)
+                        if file_name not in self.image_names)
+        return size
+
+class _ChapterDeduplicator:
+    """
+    Finds chapters of one book whose cleaned content is identical to an earlier
+    chapter's, e.g. an article listed under two names or reached by two crawled
+    categories, so only one copy is stored and the others just link to it.
+    """
+    
+    def __init__(self):
+        self._files = {}  # SHA-256 of the cleaned content -> chapter file holding it
+        self.count = 0
+        self.saved_bytes = 0
     
-    # Build complete HTML document for the chapter
-    html_content = f'''
-    <html xmlns="http://www.w3.org/1999/xhtml">
-    <head>
-        <title>{title}</title>
-    </head>
-    <body>
-        <h1>{title}</h1>
-        {content}
-    </body>
-    </html>
-    '''
+    def original(self, article, file_name):
+        """
+        Returns the file of an earlier chapter with the same content as `article`, or
+        None after remembering `file_name` as the file that will hold this content.
+        """
+        key = hashlib.sha256(article.content).digest()
+        original = self._files.setdefault(key, file_name)
+        if original == file_name:
+            return None
+        self.count += 1
+        self.saved_bytes += article.size
+        return original
+    
+    def report(self):
+        if self.count:
+            print(f"   [*] {self.count} chapters have the same content as an earlier one and link to it, "
+                  f"saving {self.saved_bytes:,} bytes")
+
+def split_into_volumes(articles_data, max_bytes=None, max_chapters=None, images=None):
+    """
+    Partitions articles, in order, into volumes that stay within a size and chapter budget.
+    
+    An article larger than `max_bytes` on its own still gets a volume of its own.
+    
+    Args:
+        articles_data (list): ArticleRecord of every article, in book order
+        max_bytes (int): Largest uncompressed size of a volume's chapters and images
+        max_chapters (int): Most chapters in one volume
+        images (ImagePipeline): Image pipeline, so embedded images count toward the size
+        
+    Returns:
+        list: One list of ArticleRecord per volume
+    """
+    budget = _VolumeBudget(max_bytes, max_chapters, images)
+    volumes = [[]]
+    for article in articles_data:
+        if not budget.fits(article):
+            volumes.append([])
+            budget.start_volume()
+        budget.add(article)
+        volumes[-1].append(article)
+    return volumes if volumes[0] else []
+
+def compile_volumes(volumes, output_filename, max_workers=DEFAULT_FETCH_WORKERS, metrics=None, images=None,
+                    compression=None):
+    """
+    Compiles the volumes from split_into_volumes() into EPUB files in parallel.
+    
+    Volumes are named like wiki_compilation_vol1.epub and each ends with an index
+    of the articles in every volume. A single volume is written as one ordinary
+    EPUB to `output_filename`.
+    
+    Args:
+        volumes (list): One list of ArticleRecord per volume
+        output_filename (str): Path of the EPUB; volumes are named after it
+        max_workers (int): Volumes written at the same time
+        metrics (PipelineMetrics): Optional collector for the render and write timings
+        images (ImagePipeline): Optional image pipeline whose images the chapters refer to
+        compression (CompressionPolicy): Compression level per media type and compression threads
+        
+    Returns:
+        bool: True if every volume was written
+    """
+    if len(volumes) <= 1:
+        return compile_epub(volumes[0] if volumes else [], output_filename, metrics, images,
+                            compression=compression)
     
-    chapter.content = html_content
-    return chapter
+    print(f"\n[*] Writing {sum(len(volume) for volume in volumes)} articles as {len(volumes)} volumes")
+    volume_titles = [[article.title for article in volume] for volume in volumes]
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(volumes)))) as executor:
+        futures = [
+            executor.submit(compile_epub, volume, volume_filename(output_filename, number), metrics, images,
+                            _volume_title(number, len(volumes)), volume_titles, number, compression)
+            for number, volume in enumerate(volumes, 1)
+        ]
+        results = [future.result() for future in futures]
+    return all(results)
 
-def compile_epub(articles_data, output_filename):
+def compile_epub(articles_data, output_filename, metrics=None, images=None, book_title=BOOK_TITLE,
+                 volume_titles=None, volume=None, compression=None):
     """
     Takes cleaned Wikipedia articles and assembles them into a complete EPUB file.
     
     Args:
-        articles_data (list): List of (title, content) tuples from processed articles
+        articles_data (list): ArticleRecord of every processed article, in book order
         output_filename (str): Path where the final EPUB should be saved
+        metrics (PipelineMetrics): Optional collector for the render and write timings
+        images (ImagePipeline): Optional image pipeline whose images the chapters refer to
+        book_title (str): Book title
+        volume_titles (list): For one volume of a split compilation, the chapter titles of
+            every volume; the book then ends with a cross-volume index
+        volume (int): 1-based number of this volume
+        compression (CompressionPolicy): Compression level per media type and compression threads
         
     Returns:
         bool: True if EPUB creation succeeded, False otherwise
@@ -242,137 +842,674 @@ def compile_epub(articles_data, output_filename):
     book = epub.EpubBook()
     
     # Configure book metadata for e-reader display
-    book.set_identifier('wikipedia_compilation_' + str(int(time.time())))
-    book.set_title('Wikipedia Article Compilation')
-    book.add_author('Wikipedia Contributors')
-    book.set_language('en')
+    book.set_identifier('wikipedia_compilation_' + str(int(time.time())) + (f"_vol{volume}" if volume else ''))
+    book.set_title(book_title)
+    book.add_author(BOOK_AUTHOR)
+    book.set_language(BOOK_LANGUAGE)
     
     # Define styling for clean, readable text on e-readers
-    nav_css = epub.EpubItem(
-        uid="nav_css",
-        file_name="style/nav.css",
-        media_type="text/css",
-        content='''
-        body {
-            font-family: serif;
-            line-height: 1.6;
-            margin: 2em;
-        }
-        h1, h2, h3, h4, h5, h6 {
-            color: #333;
-            margin-top: 2em;
-            margin-bottom: 1em;
-        }
-        p {
-            margin-bottom: 1em;
-            text-align: justify;
-        }
-        img {
-            max-width: 100%;
-            height: auto;
-        }
-        .infobox {
-            border: 1px solid #ccc;
-            background-color: #f9f9f9;
-            float: right;
-            margin: 0 0 1em 1em;
-            padding: 0.5em;
-            width: 300px;
-        }
-        '''
-    )
-    book.add_item(nav_css)
+    book.add_item(_stylesheet_item())
     
     chapters = []
+    chapter_files = []  # File of every TOC entry; identical chapters share one
+    toc = []
+    duplicates = _ChapterDeduplicator()
     
     # Convert each Wikipedia article into an EPUB chapter
-    for i, (title, content) in enumerate(articles_data, 1):
-        chapter = create_epub_chapter(title, content, i)
-        chapter.add_item(nav_css)
+    for i, article in enumerate(articles_data, 1):
+        original = duplicates.original(article, chapter_file_name(i, article.title))
+        if original:
+            chapter_files.append(original)
+            toc.append(epub.Link(original, article.title, f"chapter_{i}"))
+            print(f"   [+] Added chapter {i}: {article.title} (same content as {original})")
+            continue
+        with _timed(metrics, 'render', article.title):
+            chapter = create_epub_chapter(article.title, article.content, i)
         book.add_item(chapter)
         chapters.append(chapter)
-        print(f"   [+] Added chapter {i}: {title}")
+        chapter_files.append(chapter.file_name)
+        toc.append(epub.Link(chapter.file_name, article.title, chapter.id))
+        print(f"   [+] Added chapter {i}: {article.title}")
+    duplicates.report()
+    
+    # A volume of a split compilation ends with an index of every volume
+    if volume_titles:
+        index_content = _volume_index_content(volume_titles, volume, chapter_files)
+        index_chapter = create_epub_chapter(VOLUME_INDEX_TITLE, index_content, len(articles_data) + 1)
+        book.add_item(index_chapter)
+        chapters.append(index_chapter)
+        toc.append(epub.Link(index_chapter.file_name, VOLUME_INDEX_TITLE, index_chapter.id))
+    
+    # Add every image the chapters refer to, each once
+    if images:
+        file_names = {file_name for article in articles_data for file_name in images.referenced(article.text)}
+        for uid, file_name, media_type, content in images.book_items(file_names):
+            book.add_item(epub.EpubItem(uid=uid, file_name=file_name, media_type=media_type, content=content))
     
     # Set up the book's navigation structure
-    book.toc = chapters
+    book.toc = toc
     
     # Include standard EPUB navigation components
     book.add_item(epub.EpubNcx())
     book.add_item(epub.EpubNav())
     
-    # Add basic typography styles
-    style = '''
-    body { font-family: serif; }
-    h1 { text-align: center; }
-    '''
-    default_css = epub.EpubItem(
-        uid="default",
-        file_name="style/default.css", 
-        media_type="text/css",
-        content=style
-    )
-    book.add_item(default_css)
-    
     # Define the reading order of chapters
     book.spine = ['nav'] + chapters
     
     # Save the completed EPUB to disk
     try:
-        epub.write_epub(output_filename, book, {})
+        with _timed(metrics, 'write', output_filename):
+            _write_book(output_filename, book, compression)
         print(f"   [+] EPUB created successfully: {output_filename}")
         return True
     except Exception as e:
         print(f"   [!] Failed to create EPUB: {e}")
         return False
 
-def process_wikipedia_articles(urls, output_filename='wiki_compilation.epub'):
+def _write_book(output_filename, book, compression=None):
+    """
+    Writes an ebooklib book like epub.write_epub(), but through a ZipArchiveWriter.
+    
+    ebooklib renders the package and navigation documents and writes every entry
+    with writestr(); only the archive it writes into is replaced, so the entries
+    are compressed in parallel at the level of their media type. Unlike
+    write_epub(), which returns False on an OSError, errors are raised.
+    """
+    class _ParallelZipWriter(epub.EpubWriter):
+        def write(self):
+            self.out = ZipArchiveWriter(self.file_name, compression)
+            try:
+                # The mimetype entry must come first and stay uncompressed
+                self.out.writestr('mimetype', 'application/epub+zip', compress_type=zipfile.ZIP_STORED)
+                self._write_container()
+                self._write_opf()
+                self._write_items()
+            except BaseException:
+                self.out.abort()
+                raise
+            self.out.close()
+    
+    writer = _ParallelZipWriter(output_filename, book)
+    writer.process()
+    writer.write()
+
+def lookup_page_revisions(urls, rate_limiter=None, client=None, cache=None):
+    """
+    Looks up the canonical title and current revision of many articles through the
+    MediaWiki Action API, batching up to API_BATCH_SIZE titles per request.
+    
+    Lookups always go to the network so the revisions are current; the responses
+    are still saved in the cache, where an offline build finds them again.
+    
+    Args:
+        urls (list): Article URLs
+        rate_limiter (HostRateLimiter): Optional per-host limiter
+        client (HttpClient): Shared HTTP client, defaults to default_http_client()
+        cache (HttpCache): Optional persistent HTTP cache
+        
+    Returns:
+        dict: url -> (canonical_title, revision_id), or None if the page does not exist.
+            URLs whose lookup failed are left out.
+    """
+    # Group titles by wiki, since every host has its own API endpoint
+    by_endpoint = {}
+    for url in urls:
+        title = wiki_api.title_from_url(url)
+        if title:
+            by_endpoint.setdefault(wiki_api.api_endpoint(url), {}).setdefault(title, []).append(url)
+    
+    revisions = {}
+    request_count = 0
+    for endpoint, urls_by_title in by_endpoint.items():
+        titles = list(urls_by_title)
+        for start in range(0, len(titles), wiki_api.API_BATCH_SIZE):
+            batch = titles[start:start + wiki_api.API_BATCH_SIZE]
+            request_url = wiki_api.query_url(endpoint, batch)
+            try:
+                if cache and cache.offline:
+                    body = download_article_html(request_url, cache=cache)
+                else:
+                    body = download_article_html(request_url, rate_limiter, client=client)
+                    request_count += 1
+                    if cache:
+                        cache.store(request_url, body, {})
+                resolved = wiki_api.read_query_response(body, batch)
+            except (requests.RequestException, OfflineCacheMiss, ValueError) as e:
+                print(f"   [!] Page lookup failed for {len(batch)} titles on {endpoint}: {e}")
+                continue
+            for title, page in resolved.items():
+                for url in urls_by_title[title]:
+                    revisions[url] = page
+    
+    print(f"[*] Looked up {len(revisions)} pages in {request_count} API requests")
+    return revisions
+
+def canonicalize_urls(urls, page_revisions=None, seen=None):
+    """
+    Collapses URLs that name the same article, so each article is fetched and added once.
+    
+    Spelling variants collapse locally; with `page_revisions` the URLs of redirects
+    and non-canonical titles are also replaced by the URL of the page they resolve
+    to. A #fragment link stands for one section of an article and is kept apart,
+    unless the whole article is in the list too.
+    
+    Args:
+        urls (list): Article URLs in book order
+        page_revisions (dict): Results of lookup_page_revisions() for these URLs
+        seen (set): Canonical URLs of earlier batches, left out of the result and
+            extended with this batch's; a section only gives way to a whole article
+            in the same or an earlier batch
+        
+    Returns:
+        tuple: (canonical_urls, canonical_revisions), where canonical_urls keeps the
+            position of each article's first occurrence and canonical_revisions holds
+            page_revisions keyed by canonical URL (None without page_revisions)
+    """
+    canonical_urls = []
+    canonical_revisions = {} if page_revisions is not None else None
+    seen = set() if seen is None else seen
+    for url in urls:
+        url = url.strip()
+        page = page_revisions.get(url, False) if page_revisions is not None else False
+        canonical = wiki_api.canonical_article_url(url, page[0] if page else None)
+        fragment = wiki_api.fragment_from_url(url)
+        if fragment:
+            canonical += '#' + quote(fragment)
+        if canonical_revisions is not None and page is not False:
+            canonical_revisions[canonical] = page
+        if canonical not in seen:
+            seen.add(canonical)
+            canonical_urls.append(canonical)
+    
+    # A section is already part of the book when its whole article is
+    canonical_urls = [url for url in canonical_urls if '#' not in url or url.split('#', 1)[0] not in seen]
+    return canonical_urls, canonical_revisions
+
+def _fetch_and_clean_article(url, position, total, rate_limiter, cache, chapter_store, parser,
+                             body_only, page_revisions=None, client=None, metrics=None, clean_pool=None,
+                             images=None):
+    """
+    Worker task for the fetch pipeline: downloads one article and cleans it.
+    
+    With a chapter store, an article whose revision matches the previous build
+    is taken from the store instead of being parsed and cleaned again. When
+    `page_revisions` is given the article is fetched through the MediaWiki
+    parse API instead of scraping the rendered page.
+    
+    Args:
+        url (str): The Wikipedia article URL to fetch
+        position (int): 1-based position of the URL in the input list
+        total (int): Total number of URLs being processed, None while it is not known yet
+        rate_limiter (HostRateLimiter): Shared per-host limiter
+        cache (HttpCache): Shared HTTP cache, or None
+        chapter_store (ChapterStore): Chapters of the previous build, or None
+        parser (str): Parser backend, one of PARSER_BACKENDS
+        body_only (bool): Only parse the title heading and article body
+        page_revisions (dict): Results of lookup_page_revisions() for the 'api' fetch backend
+        client (HttpClient): Shared HTTP client
+        metrics (PipelineMetrics): Optional collector for per-stage timings and sizes
+        clean_pool (ProcessPoolExecutor): Optional process pool the page is parsed and
+            cleaned in; the thread waits for the result
+        images (ImagePipeline): Optional pipeline embedding the article's images
+        
+    Returns:
+        ArticleRecord: The cleaned article, None on failure
+    """
+    print(f"\n[*] Processing article {position}/{total}" if total else f"\n[*] Processing article {position}")
+    
+    start = time.perf_counter()
+    url = url.strip()
+    use_api = page_revisions is not None
+    api_title = None
+    revision = None
+    # A #fragment asks for a single section of the article
+    section = wiki_api.fragment_from_url(url)
+    
+    if use_api:
+        page = page_revisions.get(url, False)
+        if page is None:
+            print(f"   [!] Page does not exist: {url}")
+            return None
+        if page:
+            api_title, revision = page
+    
+    # An unchanged revision known from the batched lookup needs no download at all
+    if chapter_store and revision is not None:
+        stored = chapter_store.lookup(url, revision)
+        if stored:
+            return _stored_article(url, stored, revision, 0, start, images)
+    
+    try:
+        with _timed(metrics, 'download', url):
+            if use_api:
+                endpoint = wiki_api.api_endpoint(url)
+                page_title = api_title or wiki_api.title_from_url(url)
+                section_index = None
+                if section:
+                    # Look the anchor up first, so only that section is rendered and transferred
+                    section_list = download_article_html(wiki_api.sections_url(endpoint, page_title),
+                                                         rate_limiter, cache, client)
+                    section_index = wiki_api.find_section_index(section_list, section)
+                    if section_index is None:
+                        print(f"   [!] Section #{section} not found in {page_title.replace('_', ' ')}, leaving it out")
+                        return None
+                request_url = wiki_api.parse_url(endpoint, page_title, section_index, revision)
+                body = download_article_html(request_url, rate_limiter, cache, client)
+                api_title, html, revision = wiki_api.read_parse_response(body)
+            else:
+                html = body = download_article_html(url, rate_limiter, cache, client)
+        if metrics:
+            metrics.count('bytes', url, len(body))
+    except requests.RequestException as e:
+        print(f"   [!] Failed to fetch {url}: {e}")
+        return None
+    except OfflineCacheMiss as e:
+        print(f"   [!] Failed to fetch {e}")
+        return None
+    except ValueError as e:
+        print(f"   [!] Failed to fetch {url}: {e}")
+        return None
+    
+    if chapter_store and not use_api:
+        revision = extract_revision_id(html)
+        stored = chapter_store.lookup(url, revision)
+        if stored:
+            return _stored_article(url, stored, revision, len(body), start, images)
+    
+    # Parse, then remove references and cleanup for e-reader
+    try:
+        if clean_pool:
+            cleaned = clean_pool.submit(clean_article_html, html, parser, body_only, metrics is not None,
+                                        section, api_title, images is not None)
+            title, cleaned_content, stats = cleaned.result()
+        else:
+            title, cleaned_content, stats = clean_article_html(html, parser, body_only, metrics is not None,
+                                                               section, api_title, images is not None)
+    except Exception as e:
+        print(f"   [!] Error processing {url}: {e}")
+        return None
+    # Only the cleaned chapter is needed from here on
+    raw_size = len(body)
+    del html, body
+    if cleaned_content is None:
+        return None
+    print(f"   [+] Successfully fetched: {title}")
+    if metrics:
+        metrics.record('parse', url, stats['parse'])
+        metrics.record('clean', url, stats['clean'])
+        metrics.count('dom_nodes', url, stats['dom_nodes'])
+    
+    if not cleaned_content.strip():
+        print(f"   [!] No content extracted from {title}")
+        return None
+    
+    if images:
+        cleaned_content = images.embed(cleaned_content, url)
+    
+    if chapter_store:
+        chapter_store.store(url, title, revision, cleaned_content)
+    
+    return ArticleRecord(url, title, cleaned_content, revision, raw_size, time.perf_counter() - start)
+
+def _stored_article(url, stored, revision, raw_size, start, images):
+    """Makes the ArticleRecord of a chapter reused from the chapter store."""
+    title, content = stored
+    print(f"   [+] Unchanged since last build: {title}")
+    if images:
+        content = images.register(content)
+    return ArticleRecord(url, title, content, revision, raw_size, time.perf_counter() - start)
+
+def _checkpoint_article(journal, url, article):
+    """Stores a finished article in the checkpoint journal so a resumed run can skip it."""
+    if not article:
+        journal.record(url, 'failed')
+        return
+    output_path = journal.output_path(url, '.html')
+    output_path.write_bytes(article.content)
+    journal.record(url, 'done', title=article.title, output=str(output_path))
+
+def _stream_chapter(writer, article, metrics=None, duplicates=None):
+    """
+    Renders one cleaned article and writes it straight into a StreamingEpubWriter,
+    or only links to an earlier chapter of the book with the same content.
+    """
+    chapter_id = writer.chapter_count + 1
+    original = duplicates.original(article, chapter_file_name(chapter_id, article.title)) if duplicates else None
+    if original:
+        writer.add_chapter_link(article.title, original)
+        print(f"   [+] Added chapter {chapter_id}: {article.title} (same content as {original})")
+        return
+    with _timed(metrics, 'render', article.title):
+        file_name, xhtml = render_epub_chapter(article.title, article.content, chapter_id)
+    with _timed(metrics, 'write', article.title):
+        writer.add_chapter(article.title, file_name, xhtml)
+    print(f"   [+] Added chapter {chapter_id}: {article.title}")
+
+def _open_volume_writer(output_filename, stylesheet_item, compression=None, volume=None):
+    """Starts a streamed EPUB (or volume number `volume`) with the shared stylesheet already in it."""
+    writer = StreamingEpubWriter(output_filename, BOOK_TITLE, BOOK_AUTHOR, BOOK_LANGUAGE, compression, volume)
+    writer.add_item(stylesheet_item.id, stylesheet_item.file_name, stylesheet_item.media_type,
+                    stylesheet_item.content)
+    return writer
+
+def _close_volume_writers(writers, volume_images, output_filename, stylesheet_item, max_workers, metrics,
+                          images, split):
+    """
+    Finishes every streamed volume: adds its images and, when there are several
+    volumes, the cross-volume index, then closes them in parallel.
+    
+    A split book that fit into one volume is renamed to `output_filename`.
+    
+    Returns:
+        bool: True if every volume was written
+    """
+    if len(writers) > 1:
+        volume_titles = [[title for _, title in writer.chapters] for writer in writers]
+        for number, writer in enumerate(writers, 1):
+            writer.title = _volume_title(number, len(writers))
+            content = _volume_index_content(volume_titles, number, [file_name for file_name, _ in writer.chapters])
+            file_name, xhtml = render_epub_chapter(VOLUME_INDEX_TITLE, content, writer.chapter_count + 1)
+            writer.add_chapter(VOLUME_INDEX_TITLE, file_name, xhtml)
+    
+    def close(writer, image_names):
+        try:
+            with _timed(metrics, 'write', writer.output_filename):
+                if images:
+                    for item in images.book_items(image_names):
+                        writer.add_item(*item)
+                return writer.close()
+        except Exception as e:
+            print(f"   [!] Failed to create EPUB {writer.output_filename}: {e}")
+            writer.abort()
+            return False
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(writers)))) as executor:
+        success = all(list(executor.map(close, writers, volume_images)))
+    if success and split and len(writers) == 1:
+        os.replace(writers[0].output_filename, output_filename)
+    return success
+
+def process_wikipedia_articles(urls, output_filename='wiki_compilation.epub',
+                               max_workers=DEFAULT_FETCH_WORKERS, rate_limiter=None, cache=None,
+                               chapter_store=None, parser=DEFAULT_PARSER_BACKEND, body_only=False,
+                               stream=False, fetch_backend=DEFAULT_FETCH_BACKEND, journal=None,
+                               client=None, metrics=None, profiler=None,
+                               clean_workers=DEFAULT_CLEAN_WORKERS, resolve_redirects=False, images=None,
+                               volume_max_bytes=None, volume_max_chapters=None, max_in_flight=None,
+                               compression=None):
     """
     Main orchestration function that handles the complete Wikipedia-to-EPUB workflow.
-    Downloads articles, cleans them up, and compiles into a single EPUB file.
+    Downloads and cleans articles concurrently, then compiles them into a single EPUB
+    file with chapters in the same order as the input URLs. An article listed more
+    than once is only fetched once and gets a single chapter, at its first position.
+    
+    In streaming mode each chapter is written to the EPUB as soon as it and all the
+    articles before it are cleaned, so memory use does not grow with the book size.
     
     Args:
-        urls (list): List of Wikipedia URLs to process
+        urls (list): List of Wikipedia URLs to process, or any iterable of them (e.g. a
+            crawler generator); articles from an iterable are fetched while it is still running
         output_filename (str): Name for the output EPUB file
+        max_workers (int): Number of articles fetched and cleaned at the same time
+        rate_limiter (HostRateLimiter): Per-host limiter; a default one is created if omitted
+        cache (HttpCache): Optional persistent HTTP cache shared by all downloads
+        chapter_store (ChapterStore): Optional build directory for incremental rebuilds;
+            unchanged articles reuse their previously cleaned chapter
+        parser (str): HTML parser backend, one of PARSER_BACKENDS
+        body_only (bool): Only parse the title heading and mw-parser-output article body
+        stream (bool): Write chapters incrementally with StreamingEpubWriter
+        fetch_backend (str): 'html' scrapes rendered pages, 'api' uses the MediaWiki
+            Action API (batched revision lookup plus action=parse for article bodies)
+        journal (CheckpointJournal): Optional checkpoint journal; articles it lists as done
+            are read back instead of fetched, and new results are recorded as they finish
+        client (HttpClient): Shared HTTP client; one with a connection pool sized for
+            max_workers is created (and closed) if omitted
+        metrics (PipelineMetrics): Optional collector of per-article stage timings, bytes
+            downloaded and DOM sizes
+        profiler (RunProfiler): Optional profiler every worker task is run under
+            (cleaning processes are not profiled)
+        clean_workers (int): Processes that parse and clean articles, so cleaning runs on
+            several cores; 0 cleans in the fetch threads. At least this many articles are
+            kept in flight so every process has work.
+        resolve_redirects (bool): Look up all titles in batched API queries first, so URLs of
+            redirects are replaced by their target and the article is only added once
+            (always done by the 'api' fetch backend)
+        images (ImagePipeline): Optional pipeline that downloads, recompresses and embeds
+            the articles' images; without it images are removed
+        volume_max_bytes (int): Split the book into volumes whose chapters and images stay
+            below this many (uncompressed) bytes; volumes are named like <output>_vol1.epub
+            and each ends with an index of all volumes
+        volume_max_chapters (int): Split the book into volumes of at most this many chapters
+        max_in_flight (int): Most articles queued, being processed or finished but waiting for
+            an earlier article, so memory stays bounded however long the list is; defaults to
+            IN_FLIGHT_PER_WORKER per worker and is never below the number of workers
+        compression (CompressionPolicy): Compression level of each media type in the EPUB and
+            threads compressing its entries; XHTML at level 9 and images stored, by default
         
     Returns:
         bool: True if the EPUB was successfully created
     """
-    print(f"[*] Processing {len(urls)} Wikipedia articles...")
+    if isinstance(urls, (list, tuple)):
+        print(f"[*] Processing {len(urls)} Wikipedia articles with {max_workers} workers...")
+    else:
+        print(f"[*] Processing Wikipedia articles as they are discovered, with {max_workers} workers...")
     
+    try:
+        check_parser_backend(parser)
+        check_volume_limits(volume_max_bytes, volume_max_chapters)
+    except ValueError as e:
+        print(f"[!] {e}")
+        return False
+    
+    # Be respectful to Wikipedia's servers: every host gets its own request budget
+    if rate_limiter is None:
+        rate_limiter = HostRateLimiter(REQUESTS_PER_SECOND_PER_HOST, REQUEST_BURST)
+    
+    # All workers share one connection pool, so each host's connections are reused
+    owns_client = client is None
+    if owns_client:
+        client = HttpClient(REQUEST_HEADERS, pool_size=max(1, max_workers))
+    try:
+        return _run_pipeline(urls, output_filename, max_workers, rate_limiter, cache, chapter_store,
+                             parser, body_only, stream, fetch_backend, journal, client, metrics, profiler,
+                             clean_workers, resolve_redirects, images, volume_max_bytes, volume_max_chapters,
+                             max_in_flight, compression)
+    finally:
+        if owns_client:
+            client.close()
+        if metrics:
+            metrics.finish()
+
+def _batched(iterable, size):
+    """Yields lists of up to `size` consecutive items of an iterable."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _run_pipeline(urls, output_filename, max_workers, rate_limiter, cache, chapter_store, parser,
+                  body_only, stream, fetch_backend, journal, client, metrics, profiler, clean_workers,
+                  resolve_redirects, images, volume_max_bytes, volume_max_chapters, max_in_flight,
+                  compression):
+    """Body of process_wikipedia_articles, run with a ready rate limiter and HTTP client."""
+    if fetch_backend not in FETCH_BACKENDS:
+        print(f"[!] Unknown fetch backend '{fetch_backend}', expected one of: {', '.join(FETCH_BACKENDS)}")
+        return False
+    
+    # A list is deduplicated as a whole; URLs from an iterator (e.g. a crawler) are taken as
+    # they come, so fetching starts before the iterator is exhausted. The revision lookup
+    # still needs them in batches of API_BATCH_SIZE titles.
+    lookup = fetch_backend == 'api' or resolve_redirects
+    page_revisions = {} if fetch_backend == 'api' else None
+    total = len(urls) if isinstance(urls, (list, tuple)) else None
+    if total is not None:
+        batches = [list(urls)]
+    else:
+        batches = _batched(urls, wiki_api.API_BATCH_SIZE if lookup else 1)
+    
+    # With a volume budget, a streamed book moves on to a new volume file whenever the next
+    # chapter would not fit; all volumes stay open until the cross-volume index is known
+    budget = None
+    if volume_max_bytes or volume_max_chapters:
+        budget = _VolumeBudget(volume_max_bytes, volume_max_chapters, images)
+    writers = []
+    volume_images = []  # Image file names each streamed volume refers to
+    volume_duplicates = []  # Chapter contents each streamed volume already holds
+    if stream:
+        stylesheet_item = _stylesheet_item()
+        writers.append(_open_volume_writer(volume_filename(output_filename, 1) if budget else output_filename,
+                                           stylesheet_item, compression, 1 if budget else None))
+        volume_images.append(set())
+        volume_duplicates.append(_ChapterDeduplicator())
+    
+    # Finished articles wait here until every article before them is done,
+    # so chapter order matches the URL list
+    finished = {}
+    next_position = 0
     articles_data = []
-    failed_count = 0
+    article_urls = []  # Canonical URL of every article, by position
+    seen = set()
+    requested_count = 0
+    resumed_count = 0
     
-    for i, url in enumerate(urls, 1):
-        print(f"\n[*] Processing article {i}/{len(urls)}")
-        
-        # Download and parse this article
-        title, soup = fetch_wikipedia_content(url)
-        if not title or not soup:
-            failed_count += 1
-            continue
-        
-        # Remove references and cleanup for e-reader
-        cleaned_content = clean_article_content(soup)
-        if not cleaned_content.strip():
-            print(f"   [!] No content extracted from {title}")
-            failed_count += 1
-            continue
-        
-        articles_data.append((title, cleaned_content))
-        
-        # Be respectful to Wikipedia's servers
-        if i < len(urls):  # No need to wait after the final article
-            time.sleep(REQUEST_DELAY_SECONDS)
+    def hand_over_finished():
+        """Passes every finished article whose predecessors are all done on to the EPUB."""
+        nonlocal next_position
+        while next_position in finished:
+            article = finished.pop(next_position)
+            next_position += 1
+            if not article:
+                continue
+            if writers:
+                if budget:
+                    if not budget.fits(article):
+                        writers.append(_open_volume_writer(volume_filename(output_filename, len(writers) + 1),
+                                                           stylesheet_item, compression, len(writers) + 1))
+                        volume_images.append(set())
+                        volume_duplicates.append(_ChapterDeduplicator())
+                        budget.start_volume()
+                    budget.add(article)
+                if images:
+                    volume_images[-1].update(images.referenced(article.text))
+                _stream_chapter(writers[-1], article, metrics, volume_duplicates[-1])
+            else:
+                articles_data.append(article)
+    
+    worker_count = max(1, max_workers, clean_workers)
+    max_in_flight = max(worker_count, max_in_flight or IN_FLIGHT_PER_WORKER * worker_count)
     
-    print(f"\n[*] Successfully processed {len(articles_data)} articles")
+    # Cleaning is CPU-bound, so a process pool lets it use more than one core despite the GIL
+    clean_pool = None
+    if clean_workers > 0:
+        print(f"[*] Cleaning articles in {clean_workers} processes")
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        # The pool starts its processes from a fetch thread while other threads hold locks (stdout's
+        # among them); a forked child would inherit those locks held and hang, so never fork
+        method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        clean_pool = ProcessPoolExecutor(max_workers=clean_workers, mp_context=multiprocessing.get_context(method))
+    
+    try:
+        with ThreadPoolExecutor(max_workers=worker_count) as executor:
+            # A profiler has to run inside each worker thread to see its calls
+            run = profiler.runcall if profiler else (lambda func, *args: func(*args))
+            futures = {}
+            
+            def collect(block):
+                """Records finished articles; waits for at least one if `block` is set."""
+                done, _ = wait(futures, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+                for future in done:
+                    position = futures.pop(future)
+                    article = future.result()
+                    if journal:
+                        _checkpoint_article(journal, article_urls[position], article)
+                    finished[position] = article
+                hand_over_finished()
+            
+            for batch in batches:
+                requested_count += len(batch)
+                # Spelling variants and #fragment links of one article collapse into a single URL
+                batch, _ = canonicalize_urls(batch)
+                batch = [url for url in batch if url not in seen]
+                if lookup and batch:
+                    revisions = lookup_page_revisions(batch, rate_limiter, client, cache)
+                    # The batched lookup also tells which URLs are redirects to another article
+                    batch, revisions = canonicalize_urls(batch, revisions, seen)
+                    if page_revisions is not None:
+                        page_revisions.update(revisions)
+                else:
+                    batch, _ = canonicalize_urls(batch, seen=seen)
+                
+                for url in batch:
+                    position = len(article_urls)
+                    article_urls.append(url)
+                    # Articles finished by an interrupted earlier run are read back from the checkpoint
+                    entry = journal.completed(url) if journal else None
+                    if entry:
+                        content = Path(entry['output']).read_bytes()
+                        if images:
+                            content = images.register(content.decode('utf-8'))
+                        finished[position] = ArticleRecord(url, entry['title'], content)
+                        resumed_count += 1
+                    else:
+                        # Bounded in-flight window: wait for articles to reach the book before taking more
+                        while len(futures) + len(finished) >= max_in_flight:
+                            collect(block=True)
+                        futures[executor.submit(run, _fetch_and_clean_article, url, position + 1, total,
+                                                rate_limiter, cache, chapter_store, parser, body_only,
+                                                page_revisions, client, metrics, clean_pool, images)] = position
+                collect(block=False)
+            
+            if len(article_urls) < requested_count:
+                print(f"[*] {requested_count - len(article_urls)} URLs point to an article already in the list, "
+                      f"{len(article_urls)} unique articles")
+            if resumed_count:
+                print(f"[*] Resuming: {resumed_count} articles already done, "
+                      f"{len(article_urls) - resumed_count} to go")
+            while futures:
+                collect(block=True)
+    except BaseException:
+        for writer in writers:
+            writer.abort()
+        raise
+    finally:
+        if clean_pool:
+            clean_pool.shutdown(cancel_futures=True)
+    
+    if chapter_store:
+        chapter_store.save()
+    processed_count = sum(writer.chapter_count for writer in writers) if writers else len(articles_data)
+    failed_count = len(article_urls) - processed_count
+    
+    print(f"\n[*] Successfully processed {processed_count} articles")
     if failed_count > 0:
         print(f"[!] Failed to process {failed_count} articles")
     
-    if articles_data:
-        success = compile_epub(articles_data, output_filename)
-        if success:
-            print(f"\n[+] Compilation complete! EPUB saved as: {output_filename}")
-            return True
+    if writers:
+        for duplicates in volume_duplicates:
+            duplicates.report()
+        success = _close_volume_writers(writers, volume_images, output_filename, stylesheet_item,
+                                        max_workers, metrics, images, split=budget is not None)
+    elif articles_data:
+        volumes = [articles_data]
+        if budget:
+            volumes = split_into_volumes(articles_data, volume_max_bytes, volume_max_chapters, images)
+        success = compile_volumes(volumes, output_filename, max_workers, metrics, images, compression)
+    else:
+        success = False
+    
+    volume_count = len(writers) if writers else len(volumes) if articles_data else 0
+    if success and volume_count > 1:
+        print(f"\n[+] Compilation complete! EPUB saved as {volume_count} volumes: "
+              f"{volume_filename(output_filename, 1)} to {volume_filename(output_filename, volume_count)}")
+        return True
+    if success:
+        print(f"\n[+] Compilation complete! EPUB saved as: {output_filename}")
+        return True
     
     print(f"\n[!] No articles were successfully processed!")
-    return False
\ No newline at end of file
+    return False
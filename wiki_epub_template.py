@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+import re
+from html import escape as _escape_html
+
+# Longest title part of a chapter file name; the chapter number keeps names unique anyway
+MAX_SLUG_LENGTH = 60
+
+_CHAPTER_SKELETON = (
+    "<?xml version='1.0' encoding='utf-8'?>\n<!DOCTYPE html>\n"
+    '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" '
+    'lang={language} xml:lang={language}>'
+    '<head><title>{{title}}</title><link href={stylesheet} rel="stylesheet" type="text/css"/></head>'
+    '<body><h1>{{title}}</h1>{{content}}</body></html>'
+)
+_SLOT_PATTERN = re.compile(r'\{(title|content)\}')
+
+_CSS_COMMENT_PATTERN = re.compile(r'/\*.*?\*/', re.S)
+_CSS_SPACE_PATTERN = re.compile(r'\s+')
+_CSS_PUNCTUATION_PATTERN = re.compile(r'\s*([{};:,>])\s*')
+_SLUG_PATTERN = re.compile(r'[^A-Za-z0-9]+')
+
+# xml.sax.saxutils would do the same, but it imports urllib.request and with it most of the network stack
+_ATTRIBUTE_ENTITIES = str.maketrans({'"': '&quot;', '\n': '&#10;', '\r': '&#13;', '\t': '&#9;'})
+
+def escape(text):
+    """Escapes &, < and > in XML character data, like xml.sax.saxutils.escape."""
+    return _escape_html(text, quote=False)
+
+def quoteattr(value):
+    """Escapes and double-quotes an XML attribute value."""
+    return '"' + escape(value).translate(_ATTRIBUTE_ENTITIES) + '"'
+
+def minify_css(css):
+    """
+    Removes comments and all whitespace CSS does not need.
+
+    Args:
+        css (str): Stylesheet source
+
+    Returns:
+        str: Equivalent stylesheet on one line
+    """
+    css = _CSS_COMMENT_PATTERN.sub('', css)
+    css = _CSS_SPACE_PATTERN.sub(' ', css)
+    css = _CSS_PUNCTUATION_PATTERN.sub(r'\1', css)
+    return css.replace(';}', '}').strip()
+
+def chapter_file_name(chapter_id, title):
+    """
+    Returns the file name of a chapter, like chapter_3_Goodhart_s_law.xhtml.
+
+    The title part only keeps ASCII letters and digits, so the name is valid on
+    every reader, and is cut to MAX_SLUG_LENGTH characters. Names stay unique
+    within a book even when titles come out the same, since every chapter of a
+    book has its own number.
+
+    Args:
+        chapter_id (int): Sequential chapter number within the book
+        title (str): Chapter title
+
+    Returns:
+        str: File name relative to the content folder
+    """
+    slug = _SLUG_PATTERN.sub('_', title)[:MAX_SLUG_LENGTH].strip('_')
+    return f"chapter_{chapter_id}_{slug}.xhtml" if slug else f"chapter_{chapter_id}.xhtml"
+
+class ChapterTemplate:
+    """
+    XHTML document every chapter is rendered into, compiled once into byte segments.
+
+    Rendering a chapter only escapes its title and joins the precompiled segments
+    with the title and the content, so no template is parsed or formatted per
+    chapter. The content is inserted as is, so it must already be well-formed:
+    cleaned articles are serialized by BeautifulSoup, and the cleaner drops the
+    <style> and <script> elements whose text it would leave unescaped.
+
+    Args:
+        stylesheet (str): Path of the shared stylesheet, relative to the chapters
+        language (str): Language code of the book
+    """
+
+    def __init__(self, stylesheet, language='en'):
+        skeleton = _CHAPTER_SKELETON.format(language=quoteattr(language), stylesheet=quoteattr(stylesheet))
+        parts = _SLOT_PATTERN.split(skeleton)
+        # Even entries are fixed markup, odd entries the slot names between them
+        self._segments = [part.encode('utf-8') for part in parts[0::2]]
+        self._slots = parts[1::2]
+
+    def render(self, title, content):
+        """
+        Renders one chapter.
+
+        Args:
+            title (str): Chapter title, as plain text
+            content (str or bytes): Cleaned HTML of the article, bytes in UTF-8
+
+        Returns:
+            bytes: The complete XHTML document, UTF-8 encoded
+        """
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        values = {'title': escape(title).encode('utf-8'), 'content': content}
+        pieces = [self._segments[0]]
+        for slot, segment in zip(self._slots, self._segments[1:]):
+            pieces.append(values[slot])
+            pieces.append(segment)
+        return b''.join(pieces)
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+
+import time
+import zipfile
+from wiki_epub_template import escape, quoteattr
+from wiki_epub_zip import ZipArchiveWriter
+
+# All book content lives under this folder inside the ZIP, like ebooklib's output
+CONTENT_FOLDER = 'EPUB'
+
+_CONTAINER_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="EPUB/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>
+'''
+
+class StreamingEpubWriter:
+    """
+    Writes an EPUB file chapter by chapter instead of building the whole book in memory.
+
+    Every chapter is handed to the ZIP's compression threads as soon as it is
+    added; only a small index of (id, file name, title) entries is kept to write
+    the navigation document, the NCX table of contents and the OPF manifest when
+    the book is closed.
+    A table of contents entry can also point at a chapter already in the book, so
+    identical chapters are only stored once.
+
+    Args:
+        output_filename (str): Path of the EPUB file to create
+        title (str): Book title
+        author (str): Book author
+        language (str): Book language code
+        compression (CompressionPolicy): Compression level per media type and compression threads
+        volume (int): Volume number appended to the book identifier, so the volumes of one
+            compilation are not merged by e-readers
+    """
+
+    def __init__(self, output_filename, title, author, language='en', compression=None, volume=None):
+        self.output_filename = output_filename
+        self.title = title
+        self.author = author
+        self.language = language
+        self.identifier = 'wikipedia_compilation_' + str(int(time.time())) + (f"_vol{volume}" if volume else '')
+        self._items = []     # (uid, file_name, media_type) for the OPF manifest
+        self._chapters = []  # (uid, file_name, title) for the TOC, one per chapter added or linked
+        self._spine = []     # uid of every chapter file, in reading order
+
+        self._zip = ZipArchiveWriter(output_filename, compression)
+        # The mimetype entry must come first and stay uncompressed
+        self._zip.writestr('mimetype', 'application/epub+zip', compress_type=zipfile.ZIP_STORED)
+        self._zip.writestr('META-INF/container.xml', _CONTAINER_XML)
+
+    @property
+    def chapter_count(self):
+        """Chapters in the table of contents, including links to an earlier chapter's file."""
+        return len(self._chapters)
+
+    @property
+    def chapters(self):
+        """(file_name, title) of every table of contents entry so far, in reading order."""
+        return [(file_name, title) for _, file_name, title in self._chapters]
+
+    def add_item(self, uid, file_name, media_type, content):
+        """
+        Writes a non-chapter resource (stylesheet, image, ...) into the book.
+
+        Args:
+            uid (str): Manifest ID of the item
+            file_name (str): Path of the item relative to the content folder
+            media_type (str): MIME type of the item
+            content (str or bytes): Item data
+        """
+        self._zip.writestr(f"{CONTENT_FOLDER}/{file_name}", content, media_type=media_type)
+        self._items.append((uid, file_name, media_type))
+
+    def add_chapter(self, title, file_name, content):
+        """
+        Writes a finished chapter into the book and appends it to the reading order.
+
+        Args:
+            title (str): Chapter title for the table of contents
+            file_name (str): Path of the chapter relative to the content folder
+            content (str or bytes): Complete XHTML document of the chapter
+        """
+        uid = f"chapter_{len(self._chapters) + 1}"
+        self.add_item(uid, file_name, 'application/xhtml+xml', content)
+        self._chapters.append((uid, file_name, title))
+        self._spine.append(uid)
+
+    def add_chapter_link(self, title, file_name):
+        """
+        Adds a table of contents entry for a chapter whose content is already in the book.
+
+        Args:
+            title (str): Chapter title for the table of contents
+            file_name (str): File of the earlier chapter with the same content
+        """
+        self._chapters.append((f"chapter_{len(self._chapters) + 1}", file_name, title))
+
+    def close(self):
+        """
+        Writes the navigation files and the package document, then finalizes the ZIP.
+
+        Returns:
+            bool: True if a book with at least one chapter was written
+        """
+        if not self._chapters:
+            self.abort()
+            return False
+
+        self._zip.writestr(f"{CONTENT_FOLDER}/nav.xhtml", self._nav_document())
+        self._zip.writestr(f"{CONTENT_FOLDER}/toc.ncx", self._ncx_document())
+        self._zip.writestr(f"{CONTENT_FOLDER}/content.opf", self._package_document())
+        self._zip.close()
+        return True
+
+    def abort(self):
+        """Closes the ZIP and deletes the partially written file."""
+        self._zip.abort()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.abort()
+        return False
+
+    def _nav_document(self):
+        entries = ''.join(
+            f'<li><a href={quoteattr(file_name)}>{escape(title)}</a></li>'
+            for _, file_name, title in self._chapters
+        )
+        return (
+            "<?xml version='1.0' encoding='utf-8'?>\n<!DOCTYPE html>\n"
+            f'<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" '
+            f'lang="{self.language}" xml:lang="{self.language}">'
+            f'<head><title>{escape(self.title)}</title></head>'
+            f'<body><nav epub:type="toc" id="id" role="doc-toc"><h2>{escape(self.title)}</h2>'
+            f'<ol>{entries}</ol></nav></body></html>'
+        )
+
+    def _ncx_document(self):
+        points = ''.join(
+            f'<navPoint id="{uid}"><navLabel><text>{escape(title)}</text></navLabel>'
+            f'<content src={quoteattr(file_name)}/></navPoint>'
+            for uid, file_name, title in self._chapters
+        )
+        return (
+            "<?xml version='1.0' encoding='utf-8'?>\n"
+            '<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">'
+            f'<head><meta content={quoteattr(self.identifier)} name="dtb:uid"/>'
+            '<meta content="1" name="dtb:depth"/><meta content="0" name="dtb:totalPageCount"/>'
+            '<meta content="0" name="dtb:maxPageNumber"/></head>'
+            f'<docTitle><text>{escape(self.title)}</text></docTitle>'
+            f'<navMap>{points}</navMap></ncx>'
+        )
+
+    def _package_document(self):
+        modified = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        manifest = ''.join(
+            f'<item href={quoteattr(file_name)} id="{uid}" media-type="{media_type}"/>'
+            for uid, file_name, media_type in self._items
+        )
+        spine = ''.join(f'<itemref idref="{uid}"/>' for uid in self._spine)
+        return (
+            "<?xml version='1.0' encoding='utf-8'?>\n"
+            '<package xmlns="http://www.idpf.org/2007/opf" unique-identifier="id" version="3.0">'
+            '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">'
+            f'<dc:identifier id="id">{escape(self.identifier)}</dc:identifier>'
+            f'<dc:title>{escape(self.title)}</dc:title>'
+            f'<dc:language>{self.language}</dc:language>'
+            f'<dc:creator id="creator">{escape(self.author)}</dc:creator>'
+            f'<meta property="dcterms:modified">{modified}</meta></metadata>'
+            '<manifest><item href="nav.xhtml" id="nav" media-type="application/xhtml+xml" properties="nav"/>'
+            f'<item href="toc.ncx" id="ncx" media-type="application/x-dtbncx+xml"/>{manifest}</manifest>'
+            f'<spine toc="ncx"><itemref idref="nav"/>{spine}</spine></package>'
+        )
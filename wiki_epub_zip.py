@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+
+import os
+import struct
+import time
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Deflate level of each media type, 0 stores the entry as is. Images are already
+# compressed, so deflating them again costs time and saves next to nothing
+DEFAULT_COMPRESSION_LEVELS = {
+    'application/xhtml+xml': 9,
+    'text/css': 9,
+    'application/x-dtbncx+xml': 9,
+    'application/oebps-package+xml': 9,
+    'image/*': 0,
+}
+# Level of every media type not listed, zlib's own default
+DEFAULT_COMPRESSION_LEVEL = 6
+DEFAULT_COMPRESSION_WORKERS = os.cpu_count() or 1
+# Smaller entries are compressed by the writing thread, handing them over would cost more than it saves
+PARALLEL_MIN_BYTES = 16 * 1024
+
+_MEDIA_TYPES = {
+    '.xhtml': 'application/xhtml+xml',
+    '.html': 'application/xhtml+xml',
+    '.css': 'text/css',
+    '.ncx': 'application/x-dtbncx+xml',
+    '.opf': 'application/oebps-package+xml',
+    '.xml': 'application/xml',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+    '.svg': 'image/svg+xml',
+}
+
+_LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+_CENTRAL_HEADER = struct.Struct('<IHHHHHHIIIHHHHHII')
+_END_RECORD = struct.Struct('<IHHHHIIH')
+_ZIP64_END_RECORD = struct.Struct('<IQHHIIQQQQ')
+_ZIP64_LOCATOR = struct.Struct('<IIQI')
+_ZIP64_LIMIT = 0xFFFFFFFF
+_ZIP64_COUNT_LIMIT = 0xFFFF
+_UTF8_NAME_FLAG = 0x800
+_UNIX_FILE_MODE = 0o644 << 16
+
+def media_type_of(name):
+    """Guesses the media type of an archive entry from its file extension."""
+    return _MEDIA_TYPES.get(os.path.splitext(name)[1].lower(), 'application/octet-stream')
+
+def parse_compression_levels(specs):
+    """
+    Reads MEDIA_TYPE=LEVEL settings, like the --compression command-line option takes them.
+
+    Args:
+        specs (list): Strings like 'application/xhtml+xml=9' or 'image/*=0'
+
+    Returns:
+        dict: Level of each media type
+
+    Raises:
+        ValueError: If a setting is malformed or its level is not between 0 and 9
+    """
+    levels = {}
+    for spec in specs or ():
+        media_type, separator, level = spec.partition('=')
+        if not separator or '/' not in media_type or not level.strip().isdigit():
+            raise ValueError(f"invalid compression setting '{spec}', expected MEDIA_TYPE=LEVEL like image/*=0")
+        levels[media_type.strip().lower()] = int(level)
+    return levels
+
+class CompressionPolicy:
+    """
+    How EPUB archives are compressed: a deflate level per media type and the number
+    of threads that compress entries.
+
+    Args:
+        levels (dict): Level (0-9, 0 stores uncompressed) of each media type, applied on top
+            of DEFAULT_COMPRESSION_LEVELS; 'image/*' style entries cover a whole category
+        workers (int): Threads compressing entries at the same time; 1 compresses in the writing thread
+
+    Raises:
+        ValueError: If a level is not between 0 and 9
+    """
+
+    def __init__(self, levels=None, workers=DEFAULT_COMPRESSION_WORKERS):
+        self.levels = {**DEFAULT_COMPRESSION_LEVELS, **(levels or {})}
+        for media_type, level in self.levels.items():
+            if not 0 <= level <= 9:
+                raise ValueError(f"compression level of {media_type} must be between 0 and 9, not {level}")
+        self.workers = max(1, workers or 1)
+
+    def level_for(self, media_type):
+        level = self.levels.get(media_type)
+        if level is None:
+            level = self.levels.get(media_type.split('/')[0] + '/*', DEFAULT_COMPRESSION_LEVEL)
+        return level
+
+def _compress(data, level):
+    """Returns (method, crc, size, payload) of one entry, deflated unless that does not make it smaller."""
+    crc = zlib.crc32(data)
+    if level:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        payload = compressor.compress(data) + compressor.flush()
+        if len(payload) < len(data):
+            return zipfile.ZIP_DEFLATED, crc, len(data), payload
+    return zipfile.ZIP_STORED, crc, len(data), data
+
+def _dos_date_time(timestamp):
+    local = time.localtime(timestamp)
+    date = (max(local.tm_year, 1980) - 1980) << 9 | local.tm_mon << 5 | local.tm_mday
+    return date, local.tm_hour << 11 | local.tm_min << 5 | local.tm_sec // 2
+
+class ZipArchiveWriter:
+    """
+    Writes a ZIP archive whose entries are deflated in parallel, each at the level of its media type.
+
+    zlib releases the GIL while it compresses, so entries handed to the thread pool
+    are compressed on several cores while the caller keeps adding more. Entries
+    are still written in the order they were added, so the first one (an EPUB's
+    uncompressed mimetype) stays first. Only a few entries wait for compression at
+    any time, which keeps memory bounded while a book is streamed. writestr()
+    matches zipfile.ZipFile.writestr, so ebooklib can write through this class too.
+
+    Args:
+        path (str): Path of the archive to create
+        compression (CompressionPolicy): Levels and threads; the defaults if omitted
+    """
+
+    def __init__(self, path, compression=None):
+        self.path = path
+        self.compression = compression or CompressionPolicy()
+        workers = self.compression.workers
+        self._executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        self._max_pending = 2 * workers
+        self._pending = deque()  # (name, future or finished entry), in the order they were added
+        self._entries = []       # (name, flags, method, crc, compressed size, size, offset)
+        self._date, self._time = _dos_date_time(time.time())
+        self._file = open(path, 'wb')
+        self._offset = 0
+
+    def writestr(self, name, data, compress_type=None, media_type=None):
+        """
+        Adds an entry to the archive.
+
+        Args:
+            name (str): Path of the entry inside the archive
+            data (str or bytes): Entry content; str is stored as UTF-8
+            compress_type (int): zipfile.ZIP_STORED stores the entry uncompressed whatever its media type
+            media_type (str): Media type choosing the level; guessed from the name if omitted
+        """
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        level = 0 if compress_type == zipfile.ZIP_STORED else \
+            self.compression.level_for(media_type or media_type_of(name))
+        if self._executor and level and len(data) >= PARALLEL_MIN_BYTES:
+            self._pending.append((name, self._executor.submit(_compress, data, level)))
+        else:
+            self._pending.append((name, _compress(data, level)))
+        self._write_pending(self._max_pending)
+
+    def close(self):
+        """Writes the remaining entries and the central directory, then closes the file."""
+        try:
+            self._write_pending(0)
+            self._write_central_directory()
+        finally:
+            self._shutdown()
+
+    def abort(self):
+        """Closes and deletes the partially written archive."""
+        self._pending.clear()
+        self._shutdown()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def _shutdown(self):
+        if self._executor:
+            self._executor.shutdown(cancel_futures=True)
+        self._file.close()
+
+    def _write_pending(self, limit):
+        """Writes finished entries in order, waiting for compression until at most `limit` are left."""
+        while self._pending:
+            name, entry = self._pending[0]
+            if not isinstance(entry, tuple):
+                if len(self._pending) <= limit and not entry.done():
+                    return
+                entry = entry.result()
+            self._pending.popleft()
+            self._write_entry(name, *entry)
+
+    def _write_entry(self, name, method, crc, size, payload):
+        if size > _ZIP64_LIMIT:
+            raise ValueError(f"{name} is larger than 4 GB")
+        encoded, flags = _encode_name(name)
+        self._file.write(_LOCAL_HEADER.pack(0x04034b50, 20, flags, method, self._time, self._date, crc,
+                                            len(payload), size, len(encoded), 0))
+        self._file.write(encoded)
+        self._file.write(payload)
+        self._entries.append((encoded, flags, method, crc, len(payload), size, self._offset))
+        self._offset += _LOCAL_HEADER.size + len(encoded) + len(payload)
+
+    def _write_central_directory(self):
+        start = self._offset
+        for encoded, flags, method, crc, compressed_size, size, offset in self._entries:
+            # Only an offset past 4 GB needs a ZIP64 extra field, single entries never get that large
+            extra = b''
+            if offset >= _ZIP64_LIMIT:
+                extra = struct.pack('<HHQ', 0x0001, 8, offset)
+                offset = _ZIP64_LIMIT
+            version = 45 if extra else 20
+            self._file.write(_CENTRAL_HEADER.pack(0x02014b50, 3 << 8 | version, version, flags, method,
+                                                  self._time, self._date, crc, compressed_size, size,
+                                                  len(encoded), len(extra), 0, 0, 0, _UNIX_FILE_MODE, offset))
+            self._file.write(encoded)
+            self._file.write(extra)
+            self._offset += _CENTRAL_HEADER.size + len(encoded) + len(extra)
+
+        count, size = len(self._entries), self._offset - start
+        if count >= _ZIP64_COUNT_LIMIT or start >= _ZIP64_LIMIT or size >= _ZIP64_LIMIT:
+            self._file.write(_ZIP64_END_RECORD.pack(0x06064b50, _ZIP64_END_RECORD.size - 12, 45, 45, 0, 0,
+                                                    count, count, size, start))
+            self._file.write(_ZIP64_LOCATOR.pack(0x07064b50, 0, self._offset, 1))
+            count, size, start = min(count, _ZIP64_COUNT_LIMIT), min(size, _ZIP64_LIMIT), min(start, _ZIP64_LIMIT)
+        self._file.write(_END_RECORD.pack(0x06054b50, 0, 0, count, count, size, start, 0))
+
+def _encode_name(name):
+    try:
+        return name.encode('ascii'), 0
+    except UnicodeEncodeError:
+        return name.encode('utf-8'), _UTF8_NAME_FLAG
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+
+import io
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+from wiki_lazy import lazy_import
+
+# Imported on the first request, so runs served entirely from the cache never load it
+requests = lazy_import('requests')
+
+# Politeness budget, enforced separately for each host (wikipedia.org, wikibooks.org, ...): one
+# request every 1.5 s, like the sequential downloader's sleep; higher rates are opt-in
+REQUESTS_PER_SECOND_PER_HOST = 1 / 1.5
+REQUEST_BURST = 1
+
+class HostRateLimiter:
+    """
+    Token-bucket rate limiter that gives every host its own request budget, so
+    en.wikipedia.org and en.wikibooks.org are throttled independently.
+
+    Args:
+        rate (float): Sustained number of requests per second allowed per host
+        burst (int): Number of requests a host may receive back-to-back before throttling
+    """
+
+    def __init__(self, rate, burst=1):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._buckets = {}  # host -> [available_tokens, last_refill_time]
+        self._lock = threading.Lock()
+
+    def acquire(self, url):
+        """
+        Blocks the calling thread until the host of `url` has a request token available.
+
+        Args:
+            url (str): URL about to be requested
+
+        Returns:
+            float: Number of seconds the caller had to wait
+        """
+        host = urlparse(url).netloc.lower()
+
+        with self._lock:
+            now = time.monotonic()
+            bucket = self._buckets.setdefault(host, [float(self.burst), now])
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+
+            # Reserve a token now; a negative balance is the queue of waiting callers
+            tokens -= 1
+            bucket[0], bucket[1] = tokens, now
+            wait = -tokens / self.rate if tokens < 0 else 0.0
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+# Responses worth retrying: throttling and transient server-side failures
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_SECONDS = 0.5
+MAX_BACKOFF_SECONDS = 30.0
+# Longest Retry-After the client will sit through before giving up on a request
+MAX_RETRY_AFTER_SECONDS = 120.0
+# Keep-alive connections kept open per host
+DEFAULT_POOL_SIZE = 10
+# Number of hosts whose connection pools are kept around
+DEFAULT_POOL_HOSTS = 10
+DEFAULT_TIMEOUT_SECONDS = 30
+
+def parse_retry_after(value):
+    """
+    Reads a Retry-After header, given either as delay-seconds or as an HTTP date.
+
+    Returns:
+        float: Seconds to wait, or None if the header is missing or malformed
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    from email.utils import parsedate_to_datetime
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+def backoff_delay(attempt, backoff=DEFAULT_BACKOFF_SECONDS, max_backoff=MAX_BACKOFF_SECONDS):
+    """
+    Exponential backoff with full jitter: a random delay in [0, backoff * 2**attempt],
+    capped at max_backoff, so workers that failed together do not retry together.
+
+    Args:
+        attempt (int): 0-based number of the retry
+    """
+    return random.uniform(0, min(max_backoff, backoff * (2 ** attempt)))
+
+class HttpClient:
+    """
+    Shared HTTP client with pooled keep-alive connections, optional HTTP/2 and retries.
+
+    One client is meant to be shared by all worker threads, so every request to a
+    host reuses an open connection instead of paying a new TCP and TLS handshake.
+    Requests that fail with a connection error or one of RETRY_STATUS_CODES are
+    retried with exponential backoff and jitter; a Retry-After header from the
+    server takes precedence over the computed delay.
+
+    Both transports hand back requests.Response objects and raise
+    requests.RequestException subclasses, so callers work the same either way.
+
+    Args:
+        headers (dict): Headers sent with every request
+        pool_size (int): Keep-alive connections kept per host
+        http2 (bool): Use httpx with HTTP/2 multiplexing (needs pip install httpx[http2])
+        max_retries (int): Retries after the first attempt, 0 disables retrying
+        backoff (float): Base delay of the exponential backoff, in seconds
+        timeout (float): Default timeout of a request, in seconds
+    """
+
+    def __init__(self, headers=None, pool_size=DEFAULT_POOL_SIZE, http2=False,
+                 max_retries=DEFAULT_MAX_RETRIES, backoff=DEFAULT_BACKOFF_SECONDS,
+                 timeout=DEFAULT_TIMEOUT_SECONDS):
+        self.headers = dict(headers or {})
+        self.http2 = http2
+        self.max_retries = max(0, int(max_retries))
+        self.backoff = backoff
+        self.timeout = timeout
+
+        if http2:
+            try:
+                import httpx
+                import h2  # noqa: F401
+            except ImportError:
+                raise ValueError("HTTP/2 needs the httpx package with HTTP/2 support (pip install httpx[http2])")
+            # Connection-specific headers are not allowed on HTTP/2 streams
+            self.headers.pop('Connection', None)
+            limits = httpx.Limits(max_connections=pool_size * DEFAULT_POOL_HOSTS,
+                                  max_keepalive_connections=pool_size * DEFAULT_POOL_HOSTS)
+            self._httpx = httpx
+            self._client = httpx.Client(http2=True, headers=self.headers, limits=limits)
+        else:
+            # The session is opened on the first request
+            self._client = None
+            self._pool_size = pool_size
+            self._session_lock = threading.Lock()
+
+    def get(self, url, params=None, headers=None, stream=False, timeout=None, rate_limiter=None):
+        """
+        Sends a GET request, retrying transient failures.
+
+        Args:
+            url (str): URL to request
+            params (dict): Optional query parameters
+            headers (dict): Extra headers for this request only
+            stream (bool): Leave the body unread so it can be copied from response.raw
+            timeout (float): Timeout of each attempt, defaults to the client's timeout
+            rate_limiter (HostRateLimiter): Optional limiter waited on before every attempt
+
+        Returns:
+            requests.Response: The final response; a retryable status is returned as-is
+                once the retries are used up
+
+        Raises:
+            requests.RequestException: If the last attempt fails to connect or times out
+        """
+        timeout = self.timeout if timeout is None else timeout
+        attempt = 0
+        while True:
+            if rate_limiter:
+                rate_limiter.acquire(url)
+            try:
+                response = self._send(url, params, headers, stream, timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                delay = backoff_delay(attempt, self.backoff)
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    return response
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                if retry_after is not None and retry_after > MAX_RETRY_AFTER_SECONDS:
+                    return response
+                delay = retry_after if retry_after is not None else backoff_delay(attempt, self.backoff)
+                response.close()
+
+            attempt += 1
+            print(f"   [*] Retrying {url} in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries + 1})")
+            time.sleep(delay)
+
+    def _send(self, url, params, headers, stream, timeout):
+        if not self.http2:
+            return self._session().get(url, params=params, headers=headers, stream=stream, timeout=timeout)
+
+        httpx = self._httpx
+        try:
+            response = self._client.get(url, params=params, headers=headers, timeout=timeout)
+        except httpx.TimeoutException as e:
+            raise requests.Timeout(str(e), request=requests.Request('GET', url, params=params).prepare())
+        except httpx.TransportError as e:
+            raise requests.ConnectionError(str(e), request=requests.Request('GET', url, params=params).prepare())
+        return _as_requests_response(response)
+
+    def _session(self):
+        with self._session_lock:
+            if self._client is None:
+                session = requests.Session()
+                # Retries are handled here so they can honor Retry-After and share the backoff policy
+                adapter = requests.adapters.HTTPAdapter(pool_connections=DEFAULT_POOL_HOSTS,
+                                                        pool_maxsize=self._pool_size, max_retries=0)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.headers.update(self.headers)
+                self._client = session
+            return self._client
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+def _as_requests_response(response):
+    """Wraps a fully read httpx response in a requests.Response."""
+    converted = requests.Response()
+    converted.status_code = response.status_code
+    converted.headers = requests.structures.CaseInsensitiveDict(response.headers.multi_items())
+    # httpx already decoded any Content-Encoding, so the body is final
+    converted.headers.pop('Content-Encoding', None)
+    converted._content = response.content
+    converted.raw = io.BytesIO(response.content)
+    converted.url = str(response.url)
+    converted.reason = response.reason_phrase
+    converted.encoding = response.encoding
+    return converted
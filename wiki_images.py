@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+
+import hashlib
+import io
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from html import unescape
+from pathlib import Path
+from urllib.parse import urljoin
+
+from wiki_http import HostRateLimiter, REQUESTS_PER_SECOND_PER_HOST, REQUEST_BURST
+from wiki_lazy import lazy_import
+
+requests = lazy_import('requests')
+
+DEFAULT_ASSET_DIR = '.wiki_assets'
+# E-readers are at most about this wide, larger images only cost space
+DEFAULT_IMAGE_MAX_WIDTH = 600
+DEFAULT_IMAGE_QUALITY = 60
+IMAGE_FORMATS = ('jpeg', 'webp')
+DEFAULT_IMAGE_FORMAT = 'jpeg'
+# Images downloaded at the same time, across all articles
+DEFAULT_IMAGE_WORKERS = 8
+# Folder inside the book the images are stored in, next to the chapters
+IMAGE_FOLDER = 'images'
+
+_EXTENSIONS = {'jpeg': '.jpg', 'webp': '.webp'}
+_MEDIA_TYPES = {'.jpg': 'image/jpeg', '.webp': 'image/webp'}
+
+# Cleaned chapters are serialized by BeautifulSoup, so attributes always use double quotes
+_IMG_TAG_PATTERN = re.compile(r'<img\b[^>]*>')
+_ATTRIBUTE_PATTERN = re.compile(r'\s([\w:-]+)="([^"]*)"')
+_EMBEDDED_PATTERN = re.compile(r'<img src="' + IMAGE_FOLDER + r'/([0-9a-f]+\.\w+)"')
+
+def check_image_support(image_format=DEFAULT_IMAGE_FORMAT):
+    """
+    Verifies that Pillow is installed and can write the requested format.
+
+    Raises:
+        ValueError: If the format is unknown or cannot be written
+    """
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"unknown image format '{image_format}', expected one of: {', '.join(IMAGE_FORMATS)}")
+    try:
+        from PIL import features
+    except ImportError:
+        raise ValueError("embedding images needs the Pillow package (pip install Pillow)")
+    if not features.check('jpg' if image_format == 'jpeg' else image_format):
+        raise ValueError(f"this Pillow build cannot write {image_format} images")
+
+class ImagePipeline:
+    """
+    Downloads the images of cleaned articles, recompresses them for e-ink readers
+    and points the <img> tags at the copies that go into the book.
+
+    Processed images are named after the hash of their content, so an image used
+    by several articles is stored and added to the book only once. The processed
+    files and the mapping from source URL to file are kept in the asset
+    directory, so later builds neither download nor recompress an image again.
+
+    Args:
+        client (HttpClient): Shared HTTP client
+        asset_dir (str): Directory for processed images
+        max_width (int): Wider images are scaled down to this width
+        quality (int): JPEG/WebP quality between 1 and 95
+        grayscale (bool): Store images in grayscale, which is all e-ink screens show
+        image_format (str): Output format, one of IMAGE_FORMATS
+        workers (int): Images downloaded at the same time
+        rate_limiter (HostRateLimiter): Per-host limiter for image downloads, usually the one the
+            article downloads share; one allowing REQUESTS_PER_SECOND_PER_HOST is created if omitted
+
+    Raises:
+        ValueError: If Pillow is missing or cannot write the format
+    """
+
+    def __init__(self, client, asset_dir=DEFAULT_ASSET_DIR, max_width=DEFAULT_IMAGE_MAX_WIDTH,
+                 quality=DEFAULT_IMAGE_QUALITY, grayscale=True, image_format=DEFAULT_IMAGE_FORMAT,
+                 workers=DEFAULT_IMAGE_WORKERS, rate_limiter=None):
+        check_image_support(image_format)
+        self.client = client
+        self.asset_dir = Path(asset_dir)
+        self.source_dir = self.asset_dir / 'sources'
+        self.source_dir.mkdir(parents=True, exist_ok=True)
+        self.max_width = max_width
+        self.quality = quality
+        self.grayscale = grayscale
+        self.image_format = image_format
+        self.rate_limiter = rate_limiter or HostRateLimiter(REQUESTS_PER_SECOND_PER_HOST, REQUEST_BURST)
+        # Identifies the processing settings; chapters built with other settings reference other files
+        self.fingerprint = f"{max_width}w-q{quality}-{'gray' if grayscale else 'color'}-{image_format}"
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers))
+        self._lock = threading.Lock()
+        self._used = {}  # file name -> None, in first-use order
+
+    @property
+    def image_count(self):
+        with self._lock:
+            return len(self._used)
+
+    def embed(self, content, page_url):
+        """
+        Replaces every <img> of a cleaned article by a recompressed copy for the book.
+
+        Images that cannot be downloaded or decoded are removed.
+
+        Args:
+            content (str): Cleaned HTML of the article
+            page_url (str): URL of the article, to resolve relative image sources
+
+        Returns:
+            str: The content with <img src="images/..."> tags
+        """
+        tags = set(_IMG_TAG_PATTERN.findall(content))
+        if not tags:
+            return content
+
+        sources = {}
+        for tag in tags:
+            src = dict(_ATTRIBUTE_PATTERN.findall(tag)).get('src')
+            sources[tag] = urljoin(page_url, unescape(src)) if src else None
+        futures = {url: self._executor.submit(self._asset_for, url) for url in set(sources.values()) if url}
+        files = {url: future.result() for url, future in futures.items()}
+
+        def replace(match):
+            tag = match.group(0)
+            file_name = files.get(sources[tag])
+            if not file_name:
+                return ''
+            alt = dict(_ATTRIBUTE_PATTERN.findall(tag)).get('alt', '')
+            return f'<img src="{IMAGE_FOLDER}/{file_name}" alt="{alt}"/>'
+
+        content = _IMG_TAG_PATTERN.sub(replace, content)
+        self.register(content)
+        return content
+
+    def register(self, content):
+        """
+        Marks the images a chapter refers to as part of the book, e.g. for a chapter
+        reused from an earlier build. References to missing files are removed.
+
+        Returns:
+            str: The content, without references to images that are no longer stored
+        """
+        missing = set()
+        for file_name in _EMBEDDED_PATTERN.findall(content):
+            if (self.asset_dir / file_name).exists():
+                with self._lock:
+                    self._used.setdefault(file_name)
+            else:
+                missing.add(file_name)
+        if missing:
+            def drop_missing(match):
+                embedded = _EMBEDDED_PATTERN.match(match.group(0))
+                return '' if embedded and embedded.group(1) in missing else match.group(0)
+            content = _IMG_TAG_PATTERN.sub(drop_missing, content)
+        return content
+
+    def referenced(self, content):
+        """Returns the file names of the embedded images a chapter refers to, in order and without repeats."""
+        return list(dict.fromkeys(_EMBEDDED_PATTERN.findall(content)))
+
+    def file_size(self, file_name):
+        """Returns the size in bytes of a processed image."""
+        try:
+            return (self.asset_dir / file_name).stat().st_size
+        except OSError:
+            return 0
+
+    def book_items(self, file_names=None):
+        """
+        Yields every image the registered chapters use, read from the asset directory.
+
+        Args:
+            file_names (iterable): Only yield these images, e.g. the ones of one volume
+
+        Yields:
+            tuple: (uid, file_name, media_type, content) with file_name relative to the chapters
+        """
+        with self._lock:
+            used = list(self._used)
+        if file_names is not None:
+            wanted = set(file_names)
+            used = [file_name for file_name in used if file_name in wanted]
+        for file_name in used:
+            stem, extension = os.path.splitext(file_name)
+            yield (f"img_{stem}", f"{IMAGE_FOLDER}/{file_name}", _MEDIA_TYPES[extension],
+                   (self.asset_dir / file_name).read_bytes())
+
+    def _asset_for(self, url):
+        """Returns the processed file for an image URL, downloading and converting it if needed."""
+        key = hashlib.sha256(f"{url}|{self.fingerprint}".encode('utf-8')).hexdigest()[:32]
+        source_path = self.source_dir / key
+        try:
+            file_name = source_path.read_text(encoding='utf-8').strip()
+            if (self.asset_dir / file_name).exists():
+                return file_name
+        except OSError:
+            pass
+
+        try:
+            response = self.client.get(url, rate_limiter=self.rate_limiter)
+            response.raise_for_status()
+            data = self._convert(response.content)
+        except requests.RequestException as e:
+            print(f"   [!] Could not download image {url}: {e}")
+            return None
+        except Exception as e:
+            print(f"   [!] Could not convert image {url}: {e}")
+            return None
+
+        file_name = hashlib.sha256(data).hexdigest()[:32] + _EXTENSIONS[self.image_format]
+        asset_path = self.asset_dir / file_name
+        if not asset_path.exists():
+            _write_atomically(asset_path, data)
+        _write_atomically(source_path, file_name.encode('utf-8'))
+        return file_name
+
+    def _convert(self, data):
+        """Downscales and recompresses one image."""
+        from PIL import Image
+
+        with Image.open(io.BytesIO(data)) as image:
+            # Flatten transparency onto white, as the page background of a reader
+            if image.mode in ('RGBA', 'LA', 'P', 'PA'):
+                image = image.convert('RGBA')
+                background = Image.new('RGBA', image.size, 'white')
+                background.alpha_composite(image)
+                image = background
+            image = image.convert('L' if self.grayscale else 'RGB')
+            if image.width > self.max_width:
+                height = max(1, round(image.height * self.max_width / image.width))
+                image = image.resize((self.max_width, height), Image.LANCZOS)
+            output = io.BytesIO()
+            image.save(output, self.image_format.upper(), quality=self.quality, optimize=True)
+        return output.getvalue()
+
+    def close(self):
+        self._executor.shutdown()
+
+def _write_atomically(path, data):
+    tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
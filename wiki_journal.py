@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+class CheckpointJournal:
+    """
+    Append-only JSONL journal recording the status of every URL of a long run.
+
+    Each line is one event: {"url", "status", "time", ...details}; the last line
+    for a URL wins. Finished outputs (cleaned chapters, downloaded PDFs) are kept
+    in a directory next to the journal so a resumed run can pick them up instead
+    of fetching the article again.
+
+    Args:
+        path (str): Journal file, e.g. wiki_compilation.epub.journal
+        resume (bool): Keep the existing journal and its outputs instead of starting over
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = Path(path)
+        self.output_dir = self.path.with_name(self.path.name + '.parts')
+        self._lock = threading.Lock()
+        self._entries = {}
+
+        if resume:
+            self._entries = self._load()
+        else:
+            self.discard()
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        if self._file.tell() and not self._ends_with_newline():
+            # End the line a crash cut short, so the next entry does not get glued onto it
+            self._file.write('\n')
+
+    @classmethod
+    def for_output(cls, output_filename, resume=False):
+        """Returns the journal that belongs to an output file (<output>.journal)."""
+        return cls(f"{output_filename}.journal", resume=resume)
+
+    def _load(self):
+        entries = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # A line cut short by a crash
+                    entries[entry['url']] = entry
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _ends_with_newline(self):
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def output_path(self, url, suffix):
+        """Returns the file a URL's finished output is stored in."""
+        return self.output_dir / (hashlib.sha256(url.encode('utf-8')).hexdigest()[:32] + suffix)
+
+    def completed(self, url):
+        """
+        Returns the journal entry of a URL that finished in an earlier run.
+
+        Returns:
+            dict: The 'done' entry, or None if the URL still has to be processed
+        """
+        with self._lock:
+            entry = self._entries.get(url)
+        if not entry or entry.get('status') != 'done':
+            return None
+        output = entry.get('output')
+        if output and not os.path.exists(output):
+            return None
+        return entry
+
+    @property
+    def completed_count(self):
+        with self._lock:
+            return sum(1 for entry in self._entries.values() if entry.get('status') == 'done')
+
+    def record(self, url, status, **details):
+        """
+        Appends a status event for a URL and flushes it to disk right away.
+
+        Args:
+            url (str): The URL the event is about
+            status (str): 'done' or 'failed'
+            **details: Extra JSON-serializable fields, e.g. title or output path
+        """
+        entry = {'url': url, 'status': status, 'time': time.time(), **details}
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._entries[url] = entry
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def discard(self):
+        """Deletes the journal and every stored output, e.g. once the run has finished."""
+        if hasattr(self, '_file') and not self._file.closed:
+            self.close()
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+        shutil.rmtree(self.output_dir, ignore_errors=True)
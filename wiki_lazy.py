@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+
+import importlib
+import sys
+
+class LazyModule:
+    """
+    Stand-in for a module that is only imported when one of its attributes is first used.
+
+    requests, bs4 and ebooklib take most of the compiler's startup time, yet a run
+    served from the cache never sends a request and a --check run neither parses
+    nor writes anything. Looked-up attributes are kept on the stand-in, so later
+    uses cost no more than on the module itself. The import goes through
+    importlib, whose import lock makes a first use from several threads safe.
+
+    Args:
+        name (str): Full module name, e.g. 'ebooklib.epub'
+    """
+
+    def __init__(self, name):
+        self.__name = name
+
+    def __getattr__(self, attribute):
+        value = getattr(importlib.import_module(self.__name), attribute)
+        setattr(self, attribute, value)
+        return value
+
+    def __repr__(self):
+        return f"<lazy module '{self.__name}'>"
+
+def lazy_import(name):
+    """Returns a LazyModule for `name`, or the module itself if it is already imported."""
+    module = sys.modules.get(name)
+    return module if module is not None else LazyModule(name)
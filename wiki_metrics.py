@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+
+import cProfile
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Pipeline stages in the order an article goes through them
+STAGES = ('download', 'parse', 'clean', 'render', 'write')
+REPORT_QUANTILES = (0.5, 0.95)
+METRIC_PREFIX = 'wiki_epub'
+
+def percentile(sorted_values, q):
+    """
+    Returns the q-th quantile of already sorted values, interpolating between neighbours.
+
+    Args:
+        sorted_values (list): Values in ascending order
+        q (float): Quantile between 0 and 1, e.g. 0.95
+
+    Returns:
+        float: The quantile, or 0.0 for an empty list
+    """
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+def peak_memory_bytes():
+    """Returns the peak resident set size of the process, or None where it cannot be read."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+def _summary(values):
+    values = sorted(values)
+    summary = {'count': len(values), 'total': sum(values), 'max': values[-1] if values else 0}
+    for q in REPORT_QUANTILES:
+        summary[f"p{int(q * 100)}"] = percentile(values, q)
+    return summary
+
+class PipelineMetrics:
+    """
+    Thread-safe collector of per-article, per-stage measurements for one run.
+
+    Workers time each stage with `stage()` and attach sizes with `count()`;
+    `report()` turns everything into per-stage p50/p95 summaries, and
+    `write_report()` saves it as JSON or as a Prometheus textfile.
+
+    Args:
+        trace_memory (bool): Also record the peak Python memory allocated by each
+            stage with tracemalloc. This slows the run down considerably, and the
+            peaks are only attributable to one stage when a single worker is used.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._lock = threading.Lock()
+        self._articles = {}  # article -> {stage or counter name: value}
+        self._started = time.perf_counter()
+        self._finished = None
+
+    @contextmanager
+    def stage(self, name, article):
+        """
+        Times a block of work as one stage of an article.
+
+        Args:
+            name (str): Stage name, one of STAGES
+            article (str): Article the work belongs to (its URL, or its title once only that is known)
+        """
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, article, time.perf_counter() - start)
+            if self.trace_memory:
+                allocated = tracemalloc.get_traced_memory()[1] - baseline
+                with self._lock:
+                    values = self._articles[article]
+                    values[f"{name}_memory"] = max(values.get(f"{name}_memory", 0), allocated)
+
+    def record(self, name, article, seconds):
+        """Adds `seconds` of wall time to a stage of an article."""
+        with self._lock:
+            values = self._articles.setdefault(article, {})
+            values[name] = values.get(name, 0.0) + seconds
+
+    def count(self, name, article, value):
+        """Records a size measurement of an article, e.g. 'bytes' downloaded or 'dom_nodes'."""
+        with self._lock:
+            self._articles.setdefault(article, {})[name] = value
+
+    def finish(self):
+        """Marks the end of the run, fixing its total wall time."""
+        self._finished = time.perf_counter()
+        if self.trace_memory:
+            tracemalloc.stop()
+
+    def report(self):
+        """
+        Summarizes the run.
+
+        Returns:
+            dict: Run totals, per-stage and DOM-size summaries (count, total, max, p50, p95)
+                and the raw per-article measurements
+        """
+        with self._lock:
+            articles = {article: dict(values) for article, values in self._articles.items()}
+        end = self._finished if self._finished is not None else time.perf_counter()
+
+        stages = {}
+        for name in STAGES:
+            values = [values[name] for values in articles.values() if name in values]
+            if values:
+                stages[name] = _summary(values)
+            memory = [values[f"{name}_memory"] for values in articles.values() if f"{name}_memory" in values]
+            if memory:
+                stages[name]['peak_memory_bytes'] = max(memory)
+        return {
+            'wall_seconds': end - self._started,
+            'articles': sum(1 for values in articles.values() if 'download' in values),
+            'bytes_downloaded': sum(values.get('bytes', 0) for values in articles.values()),
+            'peak_memory_bytes': peak_memory_bytes(),
+            'stages': stages,
+            'dom_nodes': _summary([values['dom_nodes'] for values in articles.values() if 'dom_nodes' in values]),
+            'per_article': [{'article': article, **values} for article, values in articles.items()],
+        }
+
+    def write_report(self, path):
+        """
+        Writes the report to `path`: a Prometheus textfile if it ends in .prom, JSON otherwise.
+        """
+        report = self.report()
+        with open(path, 'w', encoding='utf-8') as f:
+            if str(path).endswith('.prom'):
+                f.write(_prometheus_text(report))
+            else:
+                json.dump(report, f, indent=1)
+
+    def print_summary(self):
+        report = self.report()
+        print(f"\n[*] Timing: {report['wall_seconds']:.2f}s total, "
+              f"{report['bytes_downloaded'] / 1024:.0f} KB downloaded")
+        for name, summary in report['stages'].items():
+            line = (f"    {name:<9} total {summary['total']:8.3f}s   "
+                    f"p50 {summary['p50'] * 1000:8.1f} ms   p95 {summary['p95'] * 1000:8.1f} ms")
+            if 'peak_memory_bytes' in summary:
+                line += f"   peak {summary['peak_memory_bytes'] / 1024 / 1024:7.1f} MB"
+            print(line)
+
+def _prometheus_text(report):
+    """Formats a report in the Prometheus text exposition format, e.g. for node_exporter's textfile collector."""
+    lines = [
+        f"# HELP {METRIC_PREFIX}_stage_seconds Wall time per article spent in each pipeline stage.",
+        f"# TYPE {METRIC_PREFIX}_stage_seconds summary",
+    ]
+    for name, summary in report['stages'].items():
+        for q in REPORT_QUANTILES:
+            lines.append(f'{METRIC_PREFIX}_stage_seconds{{stage="{name}",quantile="{q}"}} '
+                         f'{summary[f"p{int(q * 100)}"]}')
+        lines.append(f'{METRIC_PREFIX}_stage_seconds_sum{{stage="{name}"}} {summary["total"]}')
+        lines.append(f'{METRIC_PREFIX}_stage_seconds_count{{stage="{name}"}} {summary["count"]}')
+
+    memory = {name: summary['peak_memory_bytes'] for name, summary in report['stages'].items()
+              if 'peak_memory_bytes' in summary}
+    if memory:
+        lines += [
+            f"# HELP {METRIC_PREFIX}_stage_peak_memory_bytes Largest Python allocation peak of one article in each stage.",
+            f"# TYPE {METRIC_PREFIX}_stage_peak_memory_bytes gauge",
+        ]
+        lines += [f'{METRIC_PREFIX}_stage_peak_memory_bytes{{stage="{name}"}} {value}'
+                  for name, value in memory.items()]
+
+    dom = report['dom_nodes']
+    lines += [
+        f"# HELP {METRIC_PREFIX}_dom_nodes Elements in the parsed tree of each article.",
+        f"# TYPE {METRIC_PREFIX}_dom_nodes summary",
+    ]
+    for q in REPORT_QUANTILES:
+        lines.append(f'{METRIC_PREFIX}_dom_nodes{{quantile="{q}"}} {dom[f"p{int(q * 100)}"]}')
+    lines.append(f'{METRIC_PREFIX}_dom_nodes_sum {dom["total"]}')
+    lines.append(f'{METRIC_PREFIX}_dom_nodes_count {dom["count"]}')
+
+    gauges = [
+        ('run_seconds', "Wall time of the whole run.", report['wall_seconds']),
+        ('articles', "Articles downloaded or read from the cache.", report['articles']),
+        ('downloaded_bytes', "Bytes of article HTML received.", report['bytes_downloaded']),
+        ('peak_memory_bytes', "Peak resident set size of the process.", report['peak_memory_bytes']),
+    ]
+    for name, help_text, value in gauges:
+        if value is None:
+            continue
+        lines += [f"# HELP {METRIC_PREFIX}_{name} {help_text}", f"# TYPE {METRIC_PREFIX}_{name} gauge",
+                  f"{METRIC_PREFIX}_{name} {value}"]
+    return '\n'.join(lines) + '\n'
+
+class RunProfiler:
+    """
+    cProfile for a multithreaded run.
+
+    cProfile only sees the thread that enabled it, so every worker task is run
+    under a profiler of its own thread via `runcall()`, and all of them are
+    merged when the stats are written. On Python 3.12+, where one profiler
+    already sees every thread, worker tasks simply run under the main one.
+    """
+
+    def __init__(self):
+        self._main = cProfile.Profile()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._workers = []
+
+    def __enter__(self):
+        self._main.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._main.disable()
+        return False
+
+    def runcall(self, func, *args, **kwargs):
+        """Calls func(*args, **kwargs) under the calling thread's profiler."""
+        profile = getattr(self._local, 'profile', None)
+        if profile is False:  # The main profiler already covers this thread
+            return func(*args, **kwargs)
+        first_call = profile is None
+        if first_call:
+            profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:  # Another profiler is active and already covers this thread
+            self._local.profile = False
+            return func(*args, **kwargs)
+        if first_call:
+            # Only profiles that could be enabled hold stats pstats can merge
+            self._local.profile = profile
+            with self._lock:
+                self._workers.append(profile)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+
+    def stats(self):
+        import pstats
+
+        stats = pstats.Stats(self._main)
+        with self._lock:
+            workers = list(self._workers)
+        for profile in workers:
+            stats.add(profile)
+        return stats
+
+    def dump(self, path, top=25):
+        """Writes the merged stats to `path` (readable with pstats or snakeviz) and prints the top entries."""
+        stats = self.stats()
+        stats.dump_stats(path)
+        print(f"\n[*] Profile written to {path}, top {top} by cumulative time:")
+        stats.sort_stats('cumulative').print_stats(top)
@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+"""
+Long-running compilation service: a local HTTP API with a job queue in front of
+process_wikipedia_articles.
+
+All jobs share one HTTP connection pool, rate limiter and on-disk cache (and,
+with --incremental, one chapter store), so articles that several jobs ask for
+are only downloaded and cleaned once, and no job pays the interpreter, import
+or connection startup cost. Jobs run one at a time, each with the usual pool of
+fetch workers, so they also share one request budget per host.
+
+Endpoints:
+    POST   /jobs                   {"urls": [...], "stream": false, "fetch_backend": "html", ...} -> 202 {"id": ...}
+    GET    /jobs                   status of every job
+    GET    /jobs/<id>              status of one job, with the files it produced
+    GET    /jobs/<id>/progress     the job's progress output, streamed until it finishes
+    GET    /jobs/<id>/epub         the finished EPUB (or /jobs/<id>/files/<name> for volumes)
+    DELETE /jobs/<id>              forget a finished job and delete its files
+
+Usage:
+    python wiki_service.py --port 8765
+    curl -d '{"urls": ["https://en.wikipedia.org/wiki/Data_dredging"]}' localhost:8765/jobs
+    curl localhost:8765/jobs/1/progress
+    curl -o book.epub localhost:8765/jobs/1/epub
+"""
+
+import argparse
+import io
+import itertools
+import json
+import queue
+import shutil
+import sys
+import threading
+import time
+from contextlib import redirect_stdout
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from urllib.parse import urlparse, unquote
+from wiki_epub_compiler import (
+    process_wikipedia_articles, DEFAULT_FETCH_WORKERS, PARSER_BACKENDS, DEFAULT_PARSER_BACKEND,
+    FETCH_BACKENDS, DEFAULT_FETCH_BACKEND, REQUEST_HEADERS, REQUESTS_PER_SECOND_PER_HOST, REQUEST_BURST,
+    check_parser_backend
+)
+from wiki_http import HttpClient, HostRateLimiter
+from wiki_cache import HttpCache, DEFAULT_CACHE_DIR
+from wiki_chapter_store import ChapterStore, DEFAULT_BUILD_DIR
+from wiki_crawler import ArticleCrawler
+
+DEFAULT_OUTPUT_DIR = '.wiki_jobs'
+OUTPUT_NAME = 'wiki_compilation.epub'
+# Largest accepted job request body
+MAX_REQUEST_BYTES = 1024 * 1024
+
+# Options a job may set, with their types; anything else in a request is rejected
+JOB_OPTIONS = {
+    'stream': bool,
+    'fetch_backend': str,
+    'resolve_redirects': bool,
+    'crawl': bool,
+    'volume_max_mb': (int, float),
+    'volume_max_chapters': int,
+}
+
+class Job:
+    """
+    One queued compilation: its URLs, options, state and captured progress output.
+
+    The state goes from 'queued' to 'running' and ends as 'done' or 'failed'.
+    """
+
+    def __init__(self, job_id, urls, options, output_dir):
+        self.id = job_id
+        self.urls = urls
+        self.options = options
+        self.output_dir = Path(output_dir)
+        self.state = 'queued'
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._lines = []
+        self._partial = ''
+        self._changed = threading.Condition()
+
+    @property
+    def done(self):
+        return self.state in ('done', 'failed')
+
+    def files(self):
+        """Names of the EPUB files the job produced, e.g. one book or its volumes."""
+        if self.state != 'done':
+            return []
+        return sorted(path.name for path in self.output_dir.glob('*.epub'))
+
+    def write(self, text):
+        """Appends progress output; complete lines become visible to progress readers."""
+        with self._changed:
+            lines = (self._partial + text).split('\n')
+            self._partial = lines.pop()
+            if lines:
+                self._lines.extend(lines)
+                self._changed.notify_all()
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def finish(self, state, error=None):
+        with self._changed:
+            if self._partial:
+                self._lines.append(self._partial)
+                self._partial = ''
+            self.state = state
+            self.error = error
+            self.finished = time.time()
+            self._changed.notify_all()
+
+    def follow(self):
+        """Yields every progress line, waiting for new ones until the job has finished."""
+        position = 0
+        while True:
+            with self._changed:
+                while position == len(self._lines) and not self.done:
+                    self._changed.wait()
+                lines = self._lines[position:]
+                position += len(lines)
+                finished = self.done and position == len(self._lines)
+            yield from lines
+            if finished:
+                return
+
+    def status(self, queue_position=None):
+        status = {
+            'id': self.id,
+            'state': self.state,
+            'articles': len(self.urls),
+            'options': self.options,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'files': self.files(),
+        }
+        if queue_position is not None:
+            status['queue_position'] = queue_position
+        if self.error:
+            status['error'] = self.error
+        return status
+
+class _Tee(io.TextIOBase):
+    """Writes to the job's progress log and to the service's own output."""
+
+    def __init__(self, job, stream):
+        self.job = job
+        self.stream = stream
+
+    def write(self, text):
+        self.stream.write(text)
+        return self.job.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+def _last_job_id(output_dir):
+    """Returns the highest job ID that has a directory in `output_dir`, 0 if there is none."""
+    try:
+        return max((int(path.name) for path in Path(output_dir).iterdir()
+                    if path.is_dir() and path.name.isdigit()), default=0)
+    except OSError:
+        return 0
+
+class CompilationService:
+    """
+    Job queue that runs compilations one after the other on warm shared state.
+
+    Args:
+        client (HttpClient): Connection pool shared by every job
+        cache (HttpCache): Optional HTTP cache shared by every job
+        chapter_store (ChapterStore): Optional chapter store shared by every job
+        output_dir (str): Directory the jobs' EPUB files are written to, one subdirectory per job
+        max_workers (int): Articles fetched and cleaned at the same time within a job
+        parser (str): HTML parser backend, one of PARSER_BACKENDS
+        body_only (bool): Only parse the title heading and article body
+        rate_limiter (HostRateLimiter): Request budget per host shared by every job; one allowing
+            REQUESTS_PER_SECOND_PER_HOST is created if omitted
+    """
+
+    def __init__(self, client, cache=None, chapter_store=None, output_dir=DEFAULT_OUTPUT_DIR,
+                 max_workers=DEFAULT_FETCH_WORKERS, parser=DEFAULT_PARSER_BACKEND, body_only=False,
+                 rate_limiter=None):
+        self.client = client
+        self.cache = cache
+        self.chapter_store = chapter_store
+        self.output_dir = Path(output_dir)
+        self.max_workers = max_workers
+        self.parser = parser
+        self.body_only = body_only
+        # One request budget per host for all jobs, the crawler included
+        self.rate_limiter = rate_limiter or HostRateLimiter(REQUESTS_PER_SECOND_PER_HOST, REQUEST_BURST)
+        self._jobs = {}
+        self._pending = []  # Queued job IDs in order, for queue positions
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        # Continue after the job directories an earlier run left behind, so a new job never
+        # picks up another job's books
+        self._ids = itertools.count(_last_job_id(self.output_dir) + 1)
+        self._runner = threading.Thread(target=self._run, daemon=True)
+        self._runner.start()
+
+    def submit(self, urls, options):
+        """
+        Queues a compilation.
+
+        Args:
+            urls (list): Article URLs in book order
+            options (dict): Job options, see JOB_OPTIONS
+
+        Returns:
+            Job: The queued job
+
+        Raises:
+            ValueError: If the URLs or options are invalid
+        """
+        if not isinstance(urls, list) or not urls or not all(isinstance(url, str) and url.strip() for url in urls):
+            raise ValueError("'urls' must be a non-empty list of article URLs")
+        for name, value in options.items():
+            expected = JOB_OPTIONS.get(name)
+            if expected is None:
+                raise ValueError(f"unknown option '{name}', expected one of: {', '.join(JOB_OPTIONS)}")
+            if not isinstance(value, expected) or (expected is int and isinstance(value, bool)):
+                raise ValueError(f"invalid value for '{name}': {value!r}")
+        if options.get('fetch_backend', DEFAULT_FETCH_BACKEND) not in FETCH_BACKENDS:
+            raise ValueError(f"'fetch_backend' must be one of: {', '.join(FETCH_BACKENDS)}")
+        for name in ('volume_max_mb', 'volume_max_chapters'):
+            if name in options and options[name] <= 0:
+                raise ValueError(f"'{name}' must be positive")
+
+        with self._lock:
+            job_id = str(next(self._ids))
+            job = Job(job_id, urls, options, self.output_dir / job_id)
+            self._jobs[job_id] = job
+            self._pending.append(job_id)
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def status(self, job):
+        with self._lock:
+            position = self._pending.index(job.id) + 1 if job.id in self._pending else None
+        return job.status(position)
+
+    def jobs(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [self.status(job) for job in jobs]
+
+    def delete(self, job_id):
+        """
+        Forgets a finished job and deletes its files.
+
+        Returns:
+            bool: False if the job is still queued or running
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or not job.done:
+                return False
+            del self._jobs[job_id]
+        shutil.rmtree(job.output_dir, ignore_errors=True)
+        return True
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                self._pending.remove(job.id)
+            try:
+                self._compile(job)
+            except Exception as e:
+                job.finish('failed', f"{type(e).__name__}: {e}")
+
+    def _compile(self, job):
+        job.state = 'running'
+        job.started = time.time()
+        # Job.files() lists every EPUB in the directory, so start from an empty one
+        shutil.rmtree(job.output_dir, ignore_errors=True)
+        job.output_dir.mkdir(parents=True)
+        options = job.options
+        # Jobs run one at a time, so everything printed meanwhile belongs to this job
+        with redirect_stdout(_Tee(job, sys.__stdout__)):
+            print(f"[*] Job {job.id}: {len(job.urls)} URLs")
+            urls = job.urls
+            if options.get('crawl'):
+                urls = ArticleCrawler(self.client, self.rate_limiter, self.cache).crawl(urls)
+            volume_max_mb = options.get('volume_max_mb')
+            success = process_wikipedia_articles(
+                urls, str(job.output_dir / OUTPUT_NAME), max_workers=self.max_workers,
+                rate_limiter=self.rate_limiter, cache=self.cache, chapter_store=self.chapter_store,
+                parser=self.parser, body_only=self.body_only, stream=options.get('stream', False),
+                fetch_backend=options.get('fetch_backend', DEFAULT_FETCH_BACKEND),
+                resolve_redirects=options.get('resolve_redirects', False), client=self.client,
+                volume_max_bytes=int(volume_max_mb * 1024 * 1024) if volume_max_mb else None,
+                volume_max_chapters=options.get('volume_max_chapters'),
+            )
+        job.finish('done' if success else 'failed', None if success else "no articles were compiled")
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """Maps the /jobs endpoints onto the server's CompilationService."""
+
+    def log_message(self, format, *args):
+        pass  # Job progress is the interesting output
+
+    def do_POST(self):
+        if urlparse(self.path).path.rstrip('/') != '/jobs':
+            self._send_json(404, {'error': 'not found'})
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_REQUEST_BYTES:
+            self._send_json(413, {'error': 'request too large'})
+            return
+        try:
+            request = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(request, dict):
+                raise ValueError("the request must be a JSON object")
+            urls = request.pop('urls', None)
+            job = self.server.service.submit(urls, request)
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        self._send_json(202, self.server.service.status(job), location=f"/jobs/{job.id}")
+
+    def do_GET(self):
+        service = self.server.service
+        parts = [unquote(part) for part in urlparse(self.path).path.strip('/').split('/')]
+        if parts == ['jobs']:
+            self._send_json(200, service.jobs())
+            return
+        job = service.get(parts[1]) if len(parts) >= 2 and parts[0] == 'jobs' else None
+        if job is None:
+            self._send_json(404, {'error': 'no such job'})
+        elif len(parts) == 2:
+            self._send_json(200, service.status(job))
+        elif parts[2:] == ['progress']:
+            self._stream_progress(job)
+        elif parts[2:] == ['epub'] or (len(parts) == 4 and parts[2] == 'files'):
+            self._send_file(job, parts[3] if len(parts) == 4 else None)
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_DELETE(self):
+        parts = urlparse(self.path).path.strip('/').split('/')
+        if len(parts) != 2 or parts[0] != 'jobs' or self.server.service.get(parts[1]) is None:
+            self._send_json(404, {'error': 'no such job'})
+        elif self.server.service.delete(parts[1]):
+            self._send_json(200, {'deleted': parts[1]})
+        else:
+            self._send_json(409, {'error': 'the job has not finished yet'})
+
+    def _stream_progress(self, job):
+        # Without a Content-Length the body simply ends when the connection closes
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        try:
+            for line in job.follow():
+                self.wfile.write(line.encode('utf-8') + b'\n')
+                self.wfile.flush()
+            self.wfile.write(f"[*] Job {job.id} {job.state}\n".encode('utf-8'))
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client stopped listening
+        self.close_connection = True
+
+    def _send_file(self, job, name):
+        files = job.files()
+        if not job.done:
+            self._send_json(409, {'error': f"the job is {job.state}"})
+            return
+        if name is None:
+            if len(files) != 1:
+                self._send_json(409, {'error': 'the job produced several volumes, fetch them from /files/<name>',
+                                      'files': files})
+                return
+            name = files[0]
+        if name not in files:
+            self._send_json(404, {'error': 'no such file'})
+            return
+        body = (job.output_dir / name).read_bytes()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/epub+zip')
+        self.send_header('Content-Disposition', f'attachment; filename="{name}"')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, data, location=None):
+        body = json.dumps(data, indent=1).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if location:
+            self.send_header('Location', location)
+        self.end_headers()
+        self.wfile.write(body)
+
+def start_service(service, host='127.0.0.1', port=0):
+    """
+    Serves a CompilationService on a background thread.
+
+    Returns:
+        tuple: (server, base_url); call server.shutdown() to stop it
+    """
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.service = service
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile Wikipedia articles into EPUBs as a local job service.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=DEFAULT_FETCH_WORKERS,
+                        help=f"articles fetched and cleaned concurrently within a job (default: {DEFAULT_FETCH_WORKERS})")
+    parser.add_argument('--parser', choices=PARSER_BACKENDS, default=DEFAULT_PARSER_BACKEND,
+                        help=f"HTML parser backend (default: {DEFAULT_PARSER_BACKEND})")
+    parser.add_argument('--body-only', action='store_true',
+                        help="only parse the article body (mw-parser-output) instead of the whole page")
+    parser.add_argument('--requests-per-second', type=float, default=REQUESTS_PER_SECOND_PER_HOST,
+                        help="requests per second sent to each host (default: one every 1.5 s)")
+    parser.add_argument('--burst', type=int, default=REQUEST_BURST,
+                        help=f"requests a host may receive back-to-back (default: {REQUEST_BURST})")
+    parser.add_argument('--http2', action='store_true',
+                        help="fetch over HTTP/2 (needs httpx[http2])")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f"directory of the shared HTTP cache (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument('--no-cache', action='store_true', help="do not cache downloads between jobs")
+    parser.add_argument('--incremental', action='store_true',
+                        help="share cleaned chapters between jobs through a chapter store")
+    parser.add_argument('--build-dir', default=DEFAULT_BUILD_DIR,
+                        help=f"where --incremental keeps its chapters (default: {DEFAULT_BUILD_DIR})")
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR,
+                        help=f"where finished books are kept, one directory per job (default: {DEFAULT_OUTPUT_DIR})")
+    args = parser.parse_args()
+
+    try:
+        check_parser_backend(args.parser)
+        rate_limiter = HostRateLimiter(args.requests_per_second, args.burst)
+        client = HttpClient(REQUEST_HEADERS, pool_size=max(1, args.workers), http2=args.http2)
+    except ValueError as e:
+        print(f"[!] {e}")
+        sys.exit(1)
+    cache = None if args.no_cache else HttpCache(args.cache_dir)
+    chapter_store = ChapterStore(args.build_dir) if args.incremental else None
+    service = CompilationService(client, cache, chapter_store, args.output_dir, max_workers=args.workers,
+                                 parser=args.parser, body_only=args.body_only, rate_limiter=rate_limiter)
+
+    server = ThreadingHTTPServer((args.host, args.port), ServiceHandler)
+    server.service = service
+    server.daemon_threads = True
+    print(f"[*] Accepting compilation jobs at http://{args.host}:{args.port}/jobs")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        client.close()
+
+if __name__ == "__main__":
+    main()
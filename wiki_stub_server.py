@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for a MediaWiki site, for running the compiler without network access.
+
+Serves saved article pages from a fixture directory, both as rendered pages
+(/wiki/<Title>) and through the parts of the Action API the compiler uses
+(/w/api.php with action=query for revisions, category members and links, and
+action=parse for whole pages, single sections and section lists). Each fixture is a saved
+desktop page named <Title>.html, with the title percent-encoded like
+urllib.parse.quote(title, safe=''). A fixture containing just
+"#REDIRECT [[Other title]]" is served as a redirect to that page. Category
+members are read from the mw-pages and mw-subcategories lists of a saved
+category page.
+
+Usage:
+    python wiki_stub_server.py fixtures/ --port 8080
+    python main.py ...  # with URLs like http://127.0.0.1:8080/wiki/Data_dredging
+"""
+
+import argparse
+import json
+import re
+import threading
+import zlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs, quote, unquote
+from bs4 import BeautifulSoup
+from wiki_epub_compiler import article_body_span
+
+_REVISION_PATTERN = re.compile(rb'"wgRevisionId"\s*:\s*(\d+)')
+_TITLE_PATTERN = re.compile(rb'<h1[^>]*class="[^"]*firstHeading[^"]*"[^>]*>(.*?)</h1>', re.S)
+_TAG_PATTERN = re.compile(rb'<[^>]+>')
+_REDIRECT_PATTERN = re.compile(rb'^\s*#REDIRECT\s*\[\[([^\]]+)\]\]', re.I)
+# Results per list=categorymembers / prop=links response for limit=max, as for regular clients
+LIST_LIMIT = 500
+
+def fixture_path(fixture_dir, title):
+    """Returns the fixture file that holds the page with the given title."""
+    return Path(fixture_dir) / (quote(title.replace(' ', '_'), safe='') + '.html')
+
+def _extract_body(html):
+    """Returns the mw-parser-output div of a saved page, cut out exactly like the compiler does."""
+    span = article_body_span(html)
+    return html[span[0]:span[1]] if span else b''
+
+def _sections(body):
+    """
+    Lists the headings of an article body the way action=parse&prop=sections does.
+
+    Returns:
+        tuple: (soup, root, sections), where root is the mw-parser-output div and each
+            section is a dict with the API's fields plus the heading element ('node')
+            and the top-level element it sits in ('block')
+    """
+    soup = BeautifulSoup(body, 'html.parser')
+    root = soup.find('div', class_='mw-parser-output') or soup
+    sections = []
+    for block in root.find_all(True, recursive=False):
+        heading = block if re.fullmatch(r'h[2-6]', block.name) else block.find(re.compile(r'^h[2-6]$'))
+        if heading is None or (heading is not block and 'mw-heading' not in block.get('class', ())):
+            continue
+        headline = heading.find('span', class_='mw-headline')
+        anchor = heading.get('id') or (headline.get('id') if headline else None)
+        if not anchor:
+            continue
+        index = str(len(sections) + 1)
+        sections.append({'toclevel': int(heading.name[1]) - 1, 'level': heading.name[1],
+                         'line': heading.get_text().strip(), 'number': index, 'index': index,
+                         'anchor': anchor, 'linkAnchor': anchor, 'node': heading, 'block': block})
+    return soup, root, sections
+
+def _section_html(body, index):
+    """Returns the wrapper div holding only section `index` of an article body, with its subsections."""
+    soup, root, sections = _sections(body)
+    section = next((section for section in sections if section['index'] == index), None)
+    if section is None:
+        return None
+    keep = False
+    for block in list(root.children):
+        if block is section['block']:
+            keep = True
+        elif keep and any(other['block'] is block and other['level'] <= section['level'] for other in sections):
+            keep = False
+        if not keep:
+            block.extract()
+    return str(root)
+
+def _display_title(html, fallback):
+    match = _TITLE_PATTERN.search(html)
+    if not match:
+        return fallback
+    return _TAG_PATTERN.sub(b'', match.group(1)).decode('utf-8').strip()
+
+class StubWikiHandler(BaseHTTPRequestHandler):
+    """Answers /wiki/<Title> and /w/api.php requests from the server's fixture directory."""
+
+    def log_message(self, format, *args):
+        pass  # Keep the compiler's own progress output readable
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if parsed.path.startswith('/wiki/'):
+            self._serve_page(unquote(parsed.path[len('/wiki/'):]))
+        elif parsed.path == '/w/api.php':
+            params = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+            action = params.get('action')
+            if action == 'query' and params.get('list') == 'categorymembers':
+                self._send_json(self._category_members(params))
+            elif action == 'query' and params.get('prop') == 'links':
+                self._send_json(self._links(params))
+            elif action == 'query':
+                self._send_json(self._query(params.get('titles', '').split('|')))
+            elif action == 'parse':
+                title = self._title_of_revision(params['oldid']) if 'oldid' in params else params.get('page', '')
+                self._parse(title, params.get('prop', ''), params.get('section'))
+            else:
+                self._send_json({'error': {'code': 'badvalue', 'info': f"Unsupported action: {action}"}})
+        else:
+            self.send_error(404)
+
+    def _load(self, title):
+        try:
+            return fixture_path(self.server.fixture_dir, title).read_bytes()
+        except OSError:
+            return None
+
+    def _title_of_revision(self, revision):
+        """Finds the fixture holding the given revision, the way action=parse&oldid= names a page."""
+        for path in Path(self.server.fixture_dir).glob('*.html'):
+            match = _REVISION_PATTERN.search(path.read_bytes())
+            if match and match.group(1).decode('ascii') == revision:
+                return unquote(path.stem)
+        return ''
+
+    def _resolve(self, title):
+        """Follows a redirect fixture: returns (title, html) of the page it leads to."""
+        html = self._load(title)
+        redirect = _REDIRECT_PATTERN.match(html) if html else None
+        if redirect:
+            title = redirect.group(1).decode('utf-8')
+            html = self._load(title)
+        return title, html
+
+    def _serve_page(self, title):
+        _, html = self._resolve(title)
+        if html is None:
+            self.send_error(404)
+            return
+        self._send(200, 'text/html; charset=UTF-8', html)
+
+    def _query(self, titles):
+        normalized, redirects, pages = [], [], []
+        for title in titles:
+            display = title.replace('_', ' ')
+            if display != title:
+                normalized.append({'fromencoded': False, 'from': title, 'to': display})
+            target, html = self._resolve(title)
+            if target != title:
+                redirects.append({'from': display, 'to': target.replace('_', ' ')})
+                display = target.replace('_', ' ')
+            if html is None:
+                pages.append({'ns': 0, 'title': display, 'missing': True})
+                continue
+            revision = _REVISION_PATTERN.search(html)
+            pages.append({
+                'pageid': zlib.crc32(display.encode('utf-8')), 'ns': 0, 'title': display,
+                'revisions': [{'revid': int(revision.group(1)) if revision else 0}],
+            })
+        return {'batchcomplete': True,
+                'query': {'normalized': normalized, 'redirects': redirects, 'pages': pages}}
+
+    def _category_members(self, params):
+        html = self._load(params.get('cmtitle', ''))
+        if html is None:
+            return {'batchcomplete': True, 'query': {'categorymembers': []}}
+        soup = BeautifulSoup(html, 'html.parser')
+        members = []
+        for list_id, namespace in (('mw-subcategories', 14), ('mw-pages', 0)):
+            block = soup.find(id=list_id)
+            for link in block.find_all('a', href=True) if block else ():
+                if link['href'].startswith('/wiki/'):
+                    title = unquote(link['href'][len('/wiki/'):]).replace('_', ' ')
+                    members.append({'pageid': zlib.crc32(title.encode('utf-8')), 'ns': namespace, 'title': title})
+        return self._list_page(members, params, 'cm', {})
+
+    def _links(self, params):
+        pages, links = [], []
+        for title in params.get('titles', '').split('|'):
+            target, html = self._resolve(title)
+            display = target.replace('_', ' ')
+            if html is None:
+                pages.append({'ns': 0, 'title': display, 'missing': True})
+                continue
+            soup = BeautifulSoup(_extract_body(html), 'html.parser')
+            titles = sorted({unquote(link['href'][len('/wiki/'):].split('#')[0]).replace('_', ' ')
+                             for link in soup.find_all('a', href=True)
+                             if link['href'].startswith('/wiki/') and ':' not in link['href']})
+            links += [(display, linked) for linked in titles]
+            pages.append({'pageid': zlib.crc32(display.encode('utf-8')), 'ns': 0, 'title': display})
+        return self._list_page(links, params, 'pl', {'pages': pages})
+
+    def _list_page(self, items, params, prefix, query):
+        """Cuts one page out of a list result, continuing at the offset in <prefix>continue."""
+        offset = int(params.get(f'{prefix}continue', 0))
+        limit = params.get(f'{prefix}limit', 'max')
+        limit = LIST_LIMIT if limit == 'max' else int(limit)
+        page = items[offset:offset + limit]
+        if prefix == 'cm':
+            query['categorymembers'] = page
+        else:
+            for entry in query['pages']:
+                entry['links'] = [{'ns': 0, 'title': linked} for title, linked in page if title == entry['title']]
+        result = {'batchcomplete': True, 'query': query}
+        if offset + limit < len(items):
+            result['continue'] = {f'{prefix}continue': str(offset + limit), 'continue': '-||'}
+        return result
+
+    def _parse(self, title, prop='', section=None):
+        title, html = self._resolve(title)
+        if html is None:
+            self._send_json({'error': {'code': 'missingtitle', 'info': "The page you specified doesn't exist."}})
+            return
+        revision = _REVISION_PATTERN.search(html)
+        display = _display_title(html, title.replace('_', ' '))
+        result = {'title': display, 'pageid': zlib.crc32(display.encode('utf-8'))}
+        body = _extract_body(html).decode('utf-8')
+
+        if prop == 'sections':
+            _, _, sections = _sections(body)
+            result['sections'] = [{key: value for key, value in section.items() if key not in ('node', 'block')}
+                                  for section in sections]
+        else:
+            if section is not None:
+                body = _section_html(body, section)
+                if body is None:
+                    self._send_json({'error': {'code': 'nosuchsection', 'info': f"There is no section {section}."}})
+                    return
+            result.update({'revid': int(revision.group(1)) if revision else 0, 'displaytitle': display,
+                           'text': body})
+        self._send_json({'parse': result})
+
+    def _send_json(self, data):
+        self._send(200, 'application/json; charset=utf-8', json.dumps(data).encode('utf-8'))
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def start_stub_server(fixture_dir, host='127.0.0.1', port=0):
+    """
+    Starts the stub server on a background thread.
+
+    Args:
+        fixture_dir (str): Directory with saved <Title>.html pages
+        host (str): Interface to bind
+        port (int): Port to bind, 0 picks a free one
+
+    Returns:
+        tuple: (server, base_url); call server.shutdown() to stop it
+    """
+    server = ThreadingHTTPServer((host, port), StubWikiHandler)
+    server.fixture_dir = Path(fixture_dir)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve saved Wikipedia pages like a local MediaWiki site.")
+    parser.add_argument('fixture_dir', help="directory with saved <Title>.html pages")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), StubWikiHandler)
+    server.fixture_dir = Path(args.fixture_dir)
+    print(f"[*] Serving {args.fixture_dir} at http://{args.host}:{args.port}/wiki/<Title>")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()